@@ -0,0 +1,191 @@
+# -*- coding: utf-8 -*-
+"""
+Functions to decode the sdmx-json attributes of OECD data (unit, power code, reference period, observation status)
+into integer codes. Codes are kept in one lookup per dataset, so that they are the same in all requests, and the
+attributes of each series (e.g. units of AUS_601) are cached per dataset, so that they can be looked up without
+downloading the data again. Please consult documentation of individual functions below for further information.
+"""
+import os
+import json
+import threading
+from OECDCodes import lazy_import
+
+pd = lazy_import('pandas')
+np = lazy_import('numpy')
+
+# Series attributes are the same for all observations of a series, observation attributes (e.g. OBS_STATUS) are
+# not. Power code (POWERCODE) is the exponent of the unit multiplier, e.g. 6 for millions.
+series_attributes = ['UNIT', 'POWERCODE', 'REFERENCEPERIOD']
+
+_lock = threading.Lock()
+# Per dataset: lookup of codes ({attribute: {'ids': [...], 'names': [...]}}) and attributes of series
+# ({series: {attribute: id}})
+_lookups = {}
+_series = {}
+
+def encode(dataset, attribute, values):
+    # Codes of the values of an attribute in a response (list of dicts with id and name). Codes are positions in
+    # the lookup of the dataset, values that are not in the lookup yet are added. The last entry of the output is
+    # -1, so that a missing value (position -1) is mapped to -1.
+    with _lock:
+        table = _lookups.setdefault(dataset, {}).setdefault(attribute, {'ids': [], 'names': []})
+        codes = []
+        for item in values:
+            if item.get('id') not in table['ids']:
+                table['ids'].append(item.get('id'))
+                table['names'].append(item.get('name'))
+            codes.append(table['ids'].index(item.get('id')))
+    return np.array(codes + [-1], dtype=np.int16)
+
+def _positions(items, k):
+    # Positions of attribute values in list of k attributes, -1 if missing
+    out = [-1] * k
+    for i, x in enumerate((items or [])[:k]):
+        if x is not None:
+            out[i] = x
+    return out
+
+def decode(responseJson, dataset):
+    # Codes of all attributes of each observation in a sdmx-json response, without the values of observations
+
+    # =============== INPUT
+    # responseJson: sdmx-json response (dict)
+    # dataset: name of dataset (e.g. MEI_ARCHIVE)
+
+    # =============== OUTPUT
+    # names: ids of attributes (series attributes followed by observation attributes)
+    # codes: integer array with one row per observation (in the order of the series and their observations in
+    #        the response) and one column per attribute, -1 where an attribute is missing
+
+    structure = responseJson.get('structure').get('attributes') or {}
+    attr_s = structure.get('series') or []
+    attr_o = structure.get('observation') or []
+    maps = [encode(dataset, item.get('id'), item.get('values') or []) for item in attr_s + attr_o]
+    series = responseJson.get('dataSets')[0].get('series')
+    obs = [item.get('observations') for item in series.values()]
+    n = [len(item) for item in obs]
+
+    local_s = np.array([_positions(item.get('attributes'), len(attr_s)) for item in series.values()], dtype=int)
+    local_s = np.repeat(local_s.reshape(len(series), len(attr_s)), n, axis=0)
+    local_o = np.array([_positions(v[1:], len(attr_o)) for item in obs for v in item.values()], dtype=int)
+    local_o = local_o.reshape(sum(n), len(attr_o))
+    local = np.hstack([local_s, local_o])
+
+    codes = np.empty(local.shape, dtype=np.int16)
+    for a in range(len(maps)):
+        codes[:, a] = maps[a][local[:, a]]
+    return [item.get('id') for item in attr_s + attr_o], codes
+
+def cells(names, codes, shape, row, col, dataset):
+    # Attributes aligned with a DataFrame of observations
+
+    # =============== INPUT
+    # names, codes: attributes of observations, see decode
+    # shape: shape of DataFrame (periods, series)
+    # row, col: position of each observation in DataFrame
+
+    # =============== OUTPUT
+    # dict with dataset, attributes (names) and codes (integer array of shape (periods, series, attributes),
+    # -1 where there is no observation)
+
+    out = np.full(tuple(shape) + (len(names),), -1, dtype=np.int16)
+    out[row, col] = codes
+    return {'dataset': dataset, 'attributes': list(names), 'codes': out}
+
+def register(meta, columns):
+    # Save the series attributes of the columns of a DataFrame (latest observation of each column) to the cache
+    # of the dataset
+
+    # =============== INPUT
+    # meta: attributes aligned with DataFrame, see cells
+    # columns: columns of DataFrame
+
+    dataset = meta['dataset']
+    ids = [i for i, a in enumerate(meta['attributes']) if a in series_attributes]
+    codes = meta['codes']
+    has_obs = (codes >= 0).any(axis=2)
+    last = codes.shape[0] - 1 - np.argmax(has_obs[::-1], axis=0)
+    with _lock:
+        lookup = _lookups.get(dataset, {})
+        cache = _series.setdefault(dataset, {})
+        for c, column in enumerate(columns):
+            if has_obs[:, c].any():
+                entry = cache.setdefault(column, {})
+                for i in ids:
+                    code = codes[last[c], c, i]
+                    if code >= 0:
+                        entry[meta['attributes'][i]] = lookup[meta['attributes'][i]]['ids'][code]
+
+def labels(dataset, attribute, names=False):
+    # Ids (e.g. IDX) or names (e.g. Index) of the codes of an attribute, code i is in position i
+    table = _lookups.get(dataset, {}).get(attribute, {'ids': [], 'names': []})
+    return list(table['names'] if names else table['ids'])
+
+def get_series_attributes(dataset, columns=None, cache_dir=None):
+    # Series attributes (unit, power code, reference period) of all series of a dataset that have been downloaded
+
+    # =============== INPUT
+    # dataset: name of dataset (e.g. MEI_ARCHIVE)
+    # columns: list of series (e.g. ['AUS_601']), None for all
+    # cache_dir: folder of saved attributes (see save_attributes), None to use only attributes in memory
+
+    # =============== OUTPUT
+    # DataFrame with series as index and one column per attribute (ids of attribute values)
+
+    if cache_dir is not None:
+        load_attributes(dataset, cache_dir)
+    with _lock:
+        cache = dict(_series.get(dataset, {}))
+    if columns is None:
+        columns = list(cache)
+    df = pd.DataFrame([cache.get(c, {}) for c in columns], index=pd.Index(columns, name='Series'))
+    return df.reindex(columns=series_attributes)
+
+def power(meta):
+    # Multiplier of each observation (10 to the power code), 1 where there is no power code
+
+    # =============== INPUT
+    # meta: attributes aligned with DataFrame, see cells
+
+    codes = meta['codes']
+    if 'POWERCODE' not in meta['attributes']:
+        return np.ones(codes.shape[:2])
+    exponent = np.array([float(item) for item in labels(meta['dataset'], 'POWERCODE')] + [0.0])
+    return 10.0 ** exponent[codes[:, :, meta['attributes'].index('POWERCODE')]]
+
+def scale(df, meta):
+    # Values of DataFrame in units (e.g. AUS_601 in US dollars instead of multiples of the power code)
+
+    # =============== INPUT
+    # df: DataFrame with observations
+    # meta: attributes aligned with df, see cells
+
+    return df * power(meta)
+
+def save_attributes(dataset, cache_dir='.oecd_cache'):
+    # Save lookup and series attributes of dataset to cache_dir/attributes_<dataset>.json, merging with the file
+    # that is already there
+    load_attributes(dataset, cache_dir)
+    with _lock:
+        content = {'lookup': _lookups.get(dataset, {}), 'series': _series.get(dataset, {})}
+        text = json.dumps(content)
+    os.makedirs(cache_dir, exist_ok=True)
+    file = os.path.join(cache_dir, 'attributes_' + dataset + '.json')
+    with open(file + '.tmp', 'w') as f:
+        f.write(text)
+    os.replace(file + '.tmp', file)
+
+def load_attributes(dataset, cache_dir='.oecd_cache'):
+    # Add lookup and series attributes of dataset saved in cache_dir to memory. Codes of values that are already
+    # in memory do not change, series attributes in memory are kept.
+    file = os.path.join(cache_dir, 'attributes_' + dataset + '.json')
+    if not os.path.exists(file):
+        return
+    with open(file) as f:
+        content = json.load(f)
+    for attribute, table in content.get('lookup', {}).items():
+        encode(dataset, attribute, [{'id': i, 'name': n} for i, n in zip(table['ids'], table['names'])])
+    with _lock:
+        cache = _series.setdefault(dataset, {})
+        for column, entry in content.get('series', {}).items():
+            cache[column] = dict(entry, **cache.get(column, {}))
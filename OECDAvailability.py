@@ -0,0 +1,228 @@
+# -*- coding: utf-8 -*-
+"""
+Index of the country x variable x edition combinations that exist in a dataset and their first and last period,
+built from requests for series keys only (detail=serieskeysonly) and from the parsed observations of downloaded
+data (see OECDData._observations), and cached in
+.oecd_cache/availability_<dataset>.json. Fetch planning uses the index to leave out countries without data and to
+skip requests that would return no results. Please consult documentation of individual functions below for
+further information.
+"""
+import os
+import json
+import threading
+from OECDCodes import lazy_import, request, get_data_url, get_edition_dates, join_codes, NoResultsError
+
+np = lazy_import('numpy')
+
+# Position of country, variable, edition and frequency in the series keys of each dataset (None if not a dimension)
+DATASETS = {
+    'MEI_ARCHIVE': {'country': 0, 'variable': 1, 'edition': 2, 'frequency': 3},
+    'MEI_BTS_COS': {'country': 1, 'variable': 0, 'edition': None, 'frequency': 3},
+    'MEI_FIN': {'country': 1, 'variable': 0, 'edition': None, 'frequency': 2},
+}
+
+_lock = threading.Lock()
+# Per dataset: entries {'COUNTRY|VARIABLE|EDITION|FREQUENCY': [first period, last period]} and queries that were
+# answered (combinations of a query that are not in entries have no data)
+_index = {}
+
+def _key(country, variable, edition, frequency):
+    return '|'.join([str(country), str(variable), '' if edition is None else str(edition), str(frequency)])
+
+def _codes(codes):
+    # Codes as list of strings, None for all codes (empty list)
+    if codes is None or codes == []:
+        return None
+    return join_codes(codes)[0].split('+')
+
+def _get(dataset):
+    return _index.setdefault(dataset, {'entries': {}, 'queries': []})
+
+def record(dataset, responseJson, countries, variables, editions, frequency, startDate, endDate, observations=None):
+    # Add series of a sdmx-json response to the index and record the query as answered
+
+    # =============== INPUT
+    # dataset: name of dataset (key of DATASETS)
+    # responseJson: sdmx-json response (dict), None if there were no results
+    # countries, variables, editions: requested codes ([] for all), editions None for datasets without editions
+    # frequency: requested frequency
+    # startDate, endDate: requested time periods
+    # observations: (dims, t) of the observations in the response (see OECDData._observations), so that first and
+    #               last periods are found without going through the observations again. None for responses with
+    #               series keys only (detail=serieskeysonly), whose periods are not known.
+
+    entries = {}
+    if responseJson is not None:
+        position = DATASETS[dataset]
+        dims_json = responseJson.get('structure').get('dimensions')
+        ids = [[item.get('id') for item in d.get('values')] for d in dims_json.get('series')]
+        names = [name for name in ['country', 'variable', 'edition', 'frequency'] if position[name] is not None]
+        cols = [position[name] for name in names]
+        if observations is None:
+            series = responseJson.get('dataSets')[0].get('series')
+            keys = np.array([[int(x) for x in key.split(':')] for key in series], dtype=int)
+            keys = np.unique(keys.reshape(len(series), -1)[:, cols], axis=0)
+            first, last = [None] * len(keys), [None] * len(keys)
+        else:
+            # First and last period of each series key, ordered by date (periods are not in order in the response)
+            dims, t = observations
+            dates = [item.get('id') for item in dims_json.get('observation')[0].get('values')]
+            order = np.argsort(np.asarray(dates, dtype=str), kind='stable')
+            rank = np.empty(len(dates), dtype=int)
+            rank[order] = np.arange(len(dates))
+            keys, inverse = np.unique(dims[:, cols].reshape(len(t), len(cols)), axis=0, return_inverse=True)
+            inverse = inverse.reshape(-1)
+            low = np.full(len(keys), len(dates), dtype=int)
+            high = np.full(len(keys), -1, dtype=int)
+            np.minimum.at(low, inverse, rank[t])
+            np.maximum.at(high, inverse, rank[t])
+            sorted_dates = [dates[i] for i in order]
+            first, last = [sorted_dates[i] for i in low], [sorted_dates[i] for i in high]
+        for k, key in enumerate(keys.tolist()):
+            code = {name: ids[col][key[j]] for j, (name, col) in enumerate(zip(names, cols))}
+            key = _key(code['country'], code['variable'], code.get('edition'), code['frequency'])
+            entries[key] = [first[k], last[k]]
+
+    query = {'countries': _codes(countries), 'variables': _codes(variables),
+             'editions': None if editions is None else [str(item) for item in editions],
+             'frequency': frequency, 'start': startDate, 'end': endDate}
+    with _lock:
+        index = _get(dataset)
+        for key, periods in entries.items():
+            old = index['entries'].get(key)
+            if old is not None and periods[0] is None:
+                # Series keys only: keep periods that are already known
+                periods = old
+            index['entries'][key] = periods
+        if query not in index['queries']:
+            index['queries'].append(query)
+
+def _covered(query, country, variable, frequency, startDate, endDate):
+    # True if country and variable were requested in query for the same frequency and (at least) the same periods
+    return (query['frequency'] == frequency and query['start'] <= startDate and query['end'] >= endDate and
+            (query['countries'] is None or country in query['countries']) and
+            (query['variables'] is None or variable in query['variables']))
+
+def plan(dataset, countries, variables, frequency, startDate, endDate, editions=None):
+    # Countries with data for each variable according to the index
+
+    # =============== INPUT
+    # dataset: name of dataset (key of DATASETS)
+    # countries, variables: list of codes
+    # frequency: 'M' for monthly and 'Q' for quarterly time series
+    # startDate, endDate: date in YYYY-MM (2000-01) or YYYY-QQ (2000-Q1) format
+    # editions: list of editions in YYYYMM format (MEI_ARCHIVE only)
+
+    # =============== OUTPUT
+    # dict with variables as keys and lists of countries with data in any of the editions as values. Countries
+    # that are not in the index (not requested for all editions yet) are kept, so that they are downloaded.
+
+    has_edition = DATASETS[dataset]['edition'] is not None
+    editions = [str(item) for item in editions] if has_edition else [None]
+    with _lock:
+        index = _get(dataset)
+        entries = index['entries']
+        queries = list(index['queries'])
+    out = {}
+    for variable in _codes(variables):
+        out[variable] = []
+        for country in _codes(countries):
+            if any(_key(country, variable, e, frequency) in entries for e in editions):
+                out[variable].append(country)
+                continue
+            answered = [q for q in queries if _covered(q, country, variable, frequency, startDate, endDate)]
+            known = set().union(*[set(q['editions'] or []) for q in answered]) if has_edition else set()
+            complete = len(answered) > 0 and (not has_edition or all(e in known for e in editions))
+            if not complete:
+                out[variable].append(country)
+    return out
+
+def build_index(dataset, countries, variables, frequency, startDate, endDate, startEDI=[], endEDI=[],
+                cache_dir='.oecd_cache'):
+    # Request series keys of all countries and variables in one request and add them to the index. Nothing is
+    # requested if the index already answers the request.
+
+    # =============== INPUT
+    # dataset: name of dataset (key of DATASETS)
+    # countries, variables: list of codes ([] for all variables)
+    # frequency: 'M' for monthly and 'Q' for quarterly time series
+    # startDate, endDate: date in YYYY-MM (2000-01) or YYYY-QQ (2000-Q1) format
+    # startEDI, endEDI: first and final edition (MEI_ARCHIVE only), see OECDCodes.get_edition_dates
+    # cache_dir: folder of the index, None to keep the index in memory only
+
+    # =============== OUTPUT
+    # Output of plan, None if all variables were requested ([])
+
+    if cache_dir is not None:
+        load_index(dataset, cache_dir)
+    editions = None
+    if DATASETS[dataset]['edition'] is not None:
+        editions = get_edition_dates(startDate, startEDI, endEDI, frequency)
+
+    if _codes(variables) is not None:
+        planned = plan(dataset, countries, variables, frequency, startDate, endDate, editions)
+        if not _unknown(dataset, planned, frequency, startDate, endDate, editions):
+            return planned
+
+    keys = {'country': countries, 'variable': variables, 'edition': editions, 'frequency': frequency}
+    position = DATASETS[dataset]
+    dims = sorted([name for name in position if position[name] is not None], key=lambda name: position[name])
+    key_list = [keys[name] for name in dims]
+    if dataset == 'MEI_BTS_COS':
+        # Measure (only BLSA is downloaded, see OECDData.get_series_MEI_BTS_COS)
+        key_list.insert(2, 'BLSA')
+    url = get_data_url(dataset, key_list, startDate, endDate) + '&detail=serieskeysonly'
+    try:
+        responseJson = request(url, 'series keys of ' + dataset).json()
+        if len(responseJson.get('dataSets')[0].get('series')) == 0:
+            responseJson = None
+    except NoResultsError:
+        responseJson = None
+    record(dataset, responseJson, countries, variables, editions, frequency, startDate, endDate)
+    if cache_dir is not None:
+        save_index(dataset, cache_dir)
+    if _codes(variables) is None:
+        return None
+    return plan(dataset, countries, variables, frequency, startDate, endDate, editions)
+
+def _unknown(dataset, planned, frequency, startDate, endDate, editions):
+    # True if any country in planned is kept only because it is not in the index
+    with _lock:
+        entries = _get(dataset)['entries']
+        for variable, countries in planned.items():
+            for country in countries:
+                if not any(_key(country, variable, e, frequency) in entries for e in (editions or [None])):
+                    return True
+    return False
+
+def available(dataset):
+    # Entries of the index as list of (country, variable, edition, frequency, first period, last period)
+    with _lock:
+        entries = dict(_get(dataset)['entries'])
+    return [tuple(key.split('|')) + tuple(periods) for key, periods in sorted(entries.items())]
+
+def save_index(dataset, cache_dir='.oecd_cache'):
+    # Save index of dataset to cache_dir/availability_<dataset>.json
+    with _lock:
+        text = json.dumps(_get(dataset))
+    os.makedirs(cache_dir, exist_ok=True)
+    file = os.path.join(cache_dir, 'availability_' + dataset + '.json')
+    with open(file + '.tmp', 'w') as f:
+        f.write(text)
+    os.replace(file + '.tmp', file)
+
+def load_index(dataset, cache_dir='.oecd_cache'):
+    # Add index of dataset saved in cache_dir to memory
+    file = os.path.join(cache_dir, 'availability_' + dataset + '.json')
+    if not os.path.exists(file):
+        return
+    with open(file) as f:
+        content = json.load(f)
+    with _lock:
+        index = _get(dataset)
+        for key, periods in content.get('entries', {}).items():
+            if index['entries'].get(key) is None or index['entries'][key][0] is None:
+                index['entries'][key] = periods
+        for query in content.get('queries', []):
+            if query not in index['queries']:
+                index['queries'].append(query)
@@ -0,0 +1,311 @@
+# -*- coding: utf-8 -*-
+"""
+Codelists (variables, countries) and URL utilities for the OECD datasets. This module does not import pandas and
+loads requests and lxml only when a codelist is downloaded, so that small lookups start quickly. Please consult
+documentation of individual functions below for further information.
+"""
+import sys
+import importlib
+import threading
+from datetime import datetime, timedelta
+import OECDScheduler
+
+url_data = "https://stats.oecd.org/sdmx-json/data/"
+url_structure = "https://stats.oecd.org/restsdmx/sdmx.ashx/GetDataStructure/"
+ns_message = "{http://www.SDMX.org/resources/SDMXML/schemas/v2_0/message}"
+ns_structure = "{http://www.SDMX.org/resources/SDMXML/schemas/v2_0/structure}"
+
+class _LazyModule:
+    # Module that is imported on first attribute access
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+        self._lock = threading.Lock()
+
+    def __getattr__(self, attr):
+        if self._module is None:
+            with self._lock:
+                if self._module is None:
+                    self._module = importlib.import_module(self._name)
+        return getattr(self._module, attr)
+
+def lazy_import(name):
+    # Return module if it is already imported, otherwise a proxy that imports it on first use
+    if name in sys.modules:
+        return sys.modules[name]
+    return _LazyModule(name)
+
+rq = lazy_import('requests')
+etree = lazy_import('lxml.etree')
+
+class OECDError(Exception):
+    # Base class of errors when downloading data from OECD
+    pass
+
+class NoResultsError(OECDError):
+    # Request is valid but there is no data (status code 404 or empty dataset)
+    pass
+
+class RequestError(OECDError):
+    # Request failed (no connection or status code other than 200 and 404). retryable is True if the same request
+    # may succeed later (no connection, 429 Too Many Requests or server error).
+    def __init__(self, message, status_code=None, url=None, retryable=False):
+        super().__init__(message)
+        self.status_code = status_code
+        self.url = url
+        self.retryable = retryable
+
+class MissingSeriesWarning(UserWarning):
+    # Some of the requested series (e.g. one country) have no data
+    pass
+
+class PartialDownloadWarning(MissingSeriesWarning):
+    # Some requests of a download failed (e.g. a chunk of editions), so that the data returned is incomplete and
+    # must not be kept as if it were complete (see OECDJob.checkpointed)
+    pass
+
+def _error(response, url, what):
+    # NoResultsError or RequestError for a response that failed, None if it succeeded
+    if response.status_code in [200, 206]:
+        return None
+    if response.status_code == 404:
+        return NoResultsError('Error: No results for ' + what)
+    return RequestError('Error: %s' % response.status_code + ' for ' + what + '. Check URL. Made request from: ' +
+                        url, status_code=response.status_code, url=url,
+                        retryable=response.status_code == 429 or response.status_code >= 500)
+
+def _range_start(response):
+    # First byte of a partial response (Content-Range: bytes 100-199/200), None if not given
+    try:
+        return int(response.headers.get('Content-Range', '').split(' ', 1)[1].split('-', 1)[0])
+    except (IndexError, ValueError):
+        return None
+
+def request(url, what, retries=3, file=None, chunk_size=1 << 20):
+    # Send GET request through the scheduler (see OECDScheduler) and return response, raising NoResultsError or
+    # RequestError if it fails. Requests that may succeed later (no connection, 429, server errors) are sent again
+    # up to retries times, after the time given in the Retry-After header or after 1, 2, 4, ... seconds.
+
+    # =============== INPUT
+    # url: URL of request
+    # what: description of requested data used in error messages
+    # retries: number of times a failed request is sent again
+    # file: None to read the response into memory, or file the response is streamed to in chunks (compressed
+    #       transfer). If the connection drops, the download resumes where it stopped if the server supports
+    #       ranges (the rest is requested uncompressed), otherwise it starts again.
+    # chunk_size: bytes per chunk written to file
+
+    written = 0
+    for attempt in range(retries + 1):
+        scheduler = OECDScheduler.scheduler
+        delay = None
+        headers = {'Accept-Encoding': 'gzip, deflate'}
+        if written > 0:
+            # Ranges refer to the transferred bytes, so the rest is requested uncompressed like the start
+            headers['Accept-Encoding'] = 'identity'
+            headers['Range'] = 'bytes=%d-' % written
+        resumable = False
+        response, error = None, None
+        try:
+            with scheduler.slot(url):
+                response = rq.get(url = url, params = {}, headers = headers, stream = file is not None)
+                delay = scheduler.feedback(url, response.status_code, response.headers.get('Retry-After'))
+                error = _error(response, url, what)
+                if error is None and file is not None:
+                    if response.status_code == 206 and _range_start(response) != written:
+                        # Partial response does not continue the file: download everything again
+                        written = 0
+                        delay = 0
+                        error = RequestError('Error: Range of ' + what + ' does not continue the download',
+                                             url=url, retryable=True)
+                    else:
+                        if response.status_code != 206:
+                            # Server sent the full response
+                            written = 0
+                        # Ranges refer to the transferred (compressed) bytes, so only uncompressed responses resume
+                        resumable = (response.headers.get('Accept-Ranges') == 'bytes' and
+                                     response.headers.get('Content-Encoding') in [None, 'identity'])
+                        with open(file, 'r+b' if written > 0 else 'wb') as f:
+                            f.seek(written)
+                            f.truncate()
+                            for chunk in response.iter_content(chunk_size):
+                                f.write(chunk)
+                                written += len(chunk)
+        except rq.RequestException as e:
+            if not resumable:
+                written = 0
+            error = RequestError('Error: Request for ' + what + ' failed: ' + str(e), url=url, retryable=True)
+            error.__cause__ = e
+        finally:
+            if response is not None and (file is not None or error is not None):
+                # Release the connection of streamed and failed responses
+                response.close()
+        if error is None:
+            return response
+        if not isinstance(error, RequestError) or not error.retryable or attempt == retries:
+            raise error
+        if delay is None:
+            # Scheduler holds back all requests to the host, not only this one
+            scheduler.pause(url, 2 ** attempt)
+
+# Parsed data structures (DSD) per dataset, shared by all threads of the process
+_structures = {}
+_structure_locks = {}
+_structures_lock = threading.Lock()
+
+def get_structure(dataset):
+    # Data structure of dataset, downloaded and parsed once per process. Calls for a dataset that is being
+    # downloaded by another thread wait for that download.
+    with _structures_lock:
+        lock = _structure_locks.setdefault(dataset, threading.Lock())
+    with lock:
+        if dataset not in _structures:
+            resp = request(url_structure + dataset, 'data structure of ' + dataset)
+            _structures[dataset] = etree.fromstring(resp.content)
+    return _structures[dataset]
+
+def prefetch_structures(datasets, max_workers=None):
+    # Download data structures of datasets concurrently (e.g. at the start of a job), so that the codelists of
+    # all datasets are available without waiting
+
+    # =============== INPUT
+    # datasets: list of datasets (e.g. ['MEI_ARCHIVE', 'MEI_BTS_COS', 'MEI_FIN'])
+    # max_workers: number of threads, None for one per dataset
+
+    # =============== OUTPUT
+    # dict with datasets that could not be downloaded as keys and errors as values. They are downloaded again
+    # when their codelists are requested.
+
+    from concurrent.futures import ThreadPoolExecutor
+    failed = {}
+    if len(datasets) == 0:
+        return failed
+    with ThreadPoolExecutor(max_workers=max_workers or len(datasets)) as pool:
+        futures = {dataset: pool.submit(get_structure, dataset) for dataset in datasets}
+    for dataset, future in futures.items():
+        if future.exception() is not None:
+            failed[dataset] = future.exception()
+    return failed
+
+def get_codelist(dataset, codelist):
+    # Codes of a codelist (e.g. CL_MEI_ARCHIVE_VAR) in the data structure of dataset
+    doc = get_structure(dataset)
+    root = ns_message + "CodeLists/*[@id='" + codelist + "']/"
+    # First two elements are the name and description of the codelist
+    return doc.findall(root)[2:]
+
+def get_var_codes_MEIArchive():
+    var_list = get_codelist('MEI_ARCHIVE', 'CL_MEI_ARCHIVE_VAR')
+    var_code = [int(item.get('value')) for item in var_list]
+    var_description = [item.findall(ns_structure + "Description")[0].text for item in var_list]
+    return var_code, var_description
+
+def get_country_codes_MEIArchive():
+    country_list = get_codelist('MEI_ARCHIVE', 'CL_MEI_ARCHIVE_LOCATION')
+    country_code = [item.get('value') for item in country_list]
+    return country_code
+
+def get_var_codes_MEI_BTS_COS():
+    var_list = get_codelist('MEI_BTS_COS', 'CL_MEI_BTS_COS_SUBJECT')
+    var_name = [item.get('value') for item in var_list]
+    var_description = [item[0].text for item in var_list]
+    return var_name, var_description
+
+def get_country_codes_MEI_BTS_COS():
+    country_list = get_codelist('MEI_BTS_COS', 'CL_MEI_BTS_COS_LOCATION')
+    country_code = [item.get('value') for item in country_list]
+    return country_code
+
+def get_var_codes_MEI_FIN():
+    var_list = get_codelist('MEI_FIN', 'CL_MEI_FIN_SUBJECT')
+    var_name = [item.get('value') for item in var_list]
+    var_description = [item[0].text for item in var_list]
+    return var_name, var_description
+
+def get_country_codes_MEI_FIN():
+    country_list = get_codelist('MEI_FIN', 'CL_MEI_FIN_LOCATION')
+    country_code = [item.get('value') for item in country_list]
+    return country_code
+
+def get_full_names_MEI_BTS_COS(keys, variable_list, variable_names):
+    # Full names of survey variables, combining the names of the sector (e.g. BS), the subject (e.g. BSPR) and
+    # the measure (e.g. BSPRTE), for example "Manufacturing  Production Tendency"
+
+    # =============== INPUT
+    # keys: list of variable codes (e.g. keys of output of get_series_MEI_BTS_COS)
+    # variable_list, variable_names: output of get_var_codes_MEI_BTS_COS
+
+    name = dict(zip(variable_list, variable_names))
+    full_names = []
+    for k in keys:
+        parts = list(dict.fromkeys([k[0:2], k[0:4], k]))
+        full_names.append(' '.join(name[item] for item in parts if item in name))
+    return full_names
+
+def join_codes(codes):
+    # Join list of codes for URL (e.g. ['AUS', 'CAN'] -> 'AUS+CAN') and return string and number of codes
+    if isinstance(codes, list):
+        return '+'.join(str(x) for x in codes), len(codes)
+    return str(codes), 1
+
+def parse_date(date, end=False):
+    # Month of date in YYYY-MM (2000-01) or YYYY-QQ (2000-Q1) format as datetime. For quarters, the first month of
+    # the quarter is returned, or the last month if end is True.
+    if 'Q' in date:
+        year, quarter = date.split('-Q')
+        return datetime(int(year), 3 * int(quarter) - (0 if end else 2), 1)
+    return datetime.strptime(date, '%Y-%m')
+
+def to_quarter(date):
+    # Quarter of date in YYYY-MM format, in YYYY-QQ format (e.g. 2000-02 -> 2000-Q1)
+    if 'Q' in date:
+        return date
+    return date[0:4] + '-Q' + str((int(date[5:7]) - 1) // 3 + 1)
+
+def get_edition_dates(startDate, startEDI, endEDI, frequency='M', quarter_end=True):
+    # Editions of MEI Archive in YYYYMM format. Editions are monthly from the first edition (startEDI, or
+    # startDate if no startEDI is given but not before 1999-02) up to, but excluding, endEDI (today if empty).
+    # For quarterly data (frequency 'Q') only the edition of the last month of each quarter is used, so that
+    # there is one edition per quarter (quarter-end vintages). With quarter_end False, all monthly editions from
+    # the first month of the first quarter are used instead, e.g. to find the edition in which a quarter was first
+    # published (often in the middle of the next quarter).
+
+    # =============== INPUT
+    # startDate: date in YYYY-MM (2000-01) or YYYY-QQ (2000-Q1) format
+    # startEDI: first edition in YYYY-MM or YYYY-QQ format or []
+    # endEDI: final edition in YYYY-MM or YYYY-QQ format or []
+    # frequency: 'M' for monthly and 'Q' for quarterly time series
+    # quarter_end: False for all monthly editions of quarterly data
+
+    quarterly = frequency == 'Q' and quarter_end
+    if startEDI == []:
+        start = max(parse_date(startDate, end=quarterly), datetime(1999, 2, 1))
+    else:
+        start = parse_date(startEDI, end=quarterly)
+    if endEDI == []:
+        end = datetime.now()
+    else:
+        end = parse_date(endEDI, end=frequency == 'Q')
+
+    # An edition is included if the last day of its month is not after the end date
+    edition_dates = []
+    year, month = start.year, start.month
+    while True:
+        next_year, next_month = (year + 1, 1) if month == 12 else (year, month + 1)
+        if datetime(next_year, next_month, 1) - timedelta(days=1) > end:
+            break
+        if not quarterly or month % 3 == 0:
+            edition_dates.append('%04d%02d' % (year, month))
+        year, month = next_year, next_month
+    return edition_dates
+
+def get_data_url(dataset, keys, startDate, endDate):
+    # URL of sdmx-json data request, e.g. get_data_url('MEI_FIN', ['IRLT', 'AUS', 'M'], '2000-01', '2001-01')
+
+    # =============== INPUT
+    # dataset: name of dataset (e.g. MEI_ARCHIVE)
+    # keys: list of dimension filters, each a code or list of codes
+    # startDate, endDate: date in YYYY-MM or YYYY-QQ format
+
+    key_str = '.'.join(join_codes(item)[0] for item in keys)
+    return url_data + dataset + "/" + key_str + "/all?" + "startTime=" + startDate + "&" + "endTime=" + endDate
@@ -3,40 +3,163 @@
 Created on Wed Mar 2 12:29:41 2022
 
 Functions to download data from OECD. Please consult documentation of individual functions below for further information.
+Functions raise NoResultsError if there is no data for a request and RequestError if the request fails (see OECDCodes).
+Series of single countries or variables without data are reported with a MissingSeriesWarning.
+Attributes of the data (unit, power code, reference period, observation status) are decoded with OECDAttributes.
 
 @author: Lars E. Spreng
 """
-import pandas as pd 
-from lxml import etree
-import requests as rq
-from functools import reduce
-import xmltodict
-from datetime import datetime
-
-def get_var_codes_MEIArchive():
-    url = "https://stats.oecd.org/restsdmx/sdmx.ashx/GetDataStructure/MEI_ARCHIVE"
-    resp = rq.get(url)
-    doc = etree.fromstring(resp.content)
-    
-    root ="{http://www.SDMX.org/resources/SDMXML/schemas/v2_0/message}CodeLists/*[@id='CL_MEI_ARCHIVE_VAR']/"
-    var_list = doc.findall(root)
-    var_code = [int(var_list[i].get('value')) for i in range(2,len(var_list))]
-    
-    root = "{http://www.SDMX.org/resources/SDMXML/schemas/v2_0/structure}Description"
-    
-    var_description = [var_list[i].findall(root)[0].text for i in range(2,len(var_list))]
-    return var_code, var_description
-
-def get_country_codes_MEIArchive():
-    url = "https://stats.oecd.org/restsdmx/sdmx.ashx/GetDataStructure/MEI_ARCHIVE"
-    resp = rq.get(url)
-    doc = etree.fromstring(resp.content)
-    
-    root ="{http://www.SDMX.org/resources/SDMXML/schemas/v2_0/message}CodeLists/*[@id='CL_MEI_ARCHIVE_LOCATION']/"
-    country_list = doc.findall(root)
-    country_code = [country_list[i].get('value') for i in range(2,len(country_list))]
-
-    return country_code
+import os
+import json
+import tempfile
+import warnings
+from OECDCodes import lazy_import, request, join_codes, get_edition_dates, get_data_url
+from OECDCodes import OECDError, NoResultsError, RequestError, MissingSeriesWarning, PartialDownloadWarning
+import OECDAttributes
+import OECDAvailability
+# Codelists are in OECDCodes, which does not import pandas
+from OECDCodes import (get_var_codes_MEIArchive, get_country_codes_MEIArchive, get_var_codes_MEI_BTS_COS,
+                       get_country_codes_MEI_BTS_COS, get_var_codes_MEI_FIN, get_country_codes_MEI_FIN,
+                       get_full_names_MEI_BTS_COS)
+
+# pandas and numpy are imported on first use
+pd = lazy_import('pandas')
+np = lazy_import('numpy')
+
+def _dimension(responseJson, position, i):
+    # Ids of the values of dimension i of the series keys (position 'series') or time periods ('observation')
+    temp = responseJson.get('structure').get('dimensions').get(position)[i].get('values')
+    return [item.get('id') for item in temp]
+
+def _observations(responseJson, dates, frequency, dataset, query=None):
+    # Flatten sdmx-json series into arrays with one row per observation, and add the series to the availability
+    # index if query is given (requested countries, variables, editions, frequency, start and end date, see
+    # OECDAvailability.record)
+
+    # =============== OUTPUT
+    # dims: integer array with the keys of the series of each observation (one column per series dimension)
+    # t: integer array with position of time period in dates
+    # values: float array with observations (nan if missing)
+    # names, codes: attributes and integer array with their codes (one row per observation), see
+    #               OECDAttributes.decode
+    # Observations of the wrong frequency (sometimes in there by accident) and missing observations are removed
+
+    series = responseJson.get('dataSets')[0].get('series')
+    obs = [item.get('observations') for item in series.values()]
+    n = [len(item) for item in obs]
+    dims = np.array([[int(x) for x in key.split(':')] for key in series.keys()], dtype=int)
+    dims = np.repeat(dims.reshape(len(series), -1), n, axis=0)
+    t = np.fromiter((int(k) for item in obs for k in item), dtype=int, count=sum(n))
+    values = np.array([v[0] for item in obs for v in item.values()], dtype=float)
+    names, codes = OECDAttributes.decode(responseJson, dataset)
+
+    if frequency == 'M':
+        keep_date = np.array(["Q" not in item for item in dates], dtype=bool)
+    elif frequency == 'Q':
+        keep_date = np.array(["Q" in item for item in dates], dtype=bool)
+    else:
+        keep_date = np.ones(len(dates), dtype=bool)
+    keep = keep_date[t] & ~np.isnan(values)
+    if query is not None:
+        OECDAvailability.record(dataset, responseJson, *query, observations=(dims[keep], t[keep]))
+    return dims[keep], t[keep], values[keep], names, codes[keep]
+
+def first_release(dims, t, values, editions, codes):
+    # Keep the first published observation of each series and time period (fast kernel for monthly and
+    # quarterly data)
+
+    # =============== INPUT
+    # dims, t, values, codes: observations and codes of their attributes, see _observations (edition in third
+    #                         column of dims)
+    # editions: editions in YYYYMM format in the order of the edition keys
+
+    if len(t) == 0:
+        return dims, t, values, codes
+    rank = np.argsort(np.argsort([int(item) for item in editions]))[dims[:, 2]]
+    # Sort by country, variable, period and edition; first row of each country/variable/period is first release
+    order = np.lexsort((rank, t, dims[:, 1], dims[:, 0]))
+    dims, t, values, codes = dims[order], t[order], values[order], codes[order]
+    new = np.r_[True, (np.diff(dims[:, 0]) != 0) | (np.diff(dims[:, 1]) != 0) | (np.diff(t) != 0)]
+    return dims[new], t[new], values[new], codes[new]
+
+def _to_frame(dims, t, values, countries, variables, dates, frequency, single_variable=False, all_dates=True):
+    # DataFrame with time periods as index and one column per country (COUNTRY_VARIABLE) from observations, and
+    # row and column of each observation in the DataFrame
+    # Rows: all time periods of the requested frequency, or only those with observations
+    if not all_dates:
+        date_ok = sorted(set(t.tolist()))
+    elif frequency == 'M':
+        date_ok = [i for i in range(len(dates)) if "Q" not in dates[i]]
+    elif frequency == 'Q':
+        date_ok = [i for i in range(len(dates)) if "Q" in dates[i]]
+    else:
+        date_ok = list(range(len(dates)))
+    row = np.full(len(dates), -1, dtype=int)
+    row[date_ok] = np.arange(len(date_ok))
+
+    # Columns in order of countries (and variables)
+    col_key = dims[:, 0] * len(variables) + dims[:, 1]
+    col_ids, col = np.unique(col_key, return_inverse=True)
+    if single_variable and len(variables) == 1:
+        names = [countries[k // len(variables)] for k in col_ids]
+    else:
+        names = [countries[k // len(variables)] + '_' + variables[k % len(variables)] for k in col_ids]
+
+    X = np.full((len(date_ok), len(col_ids)), np.nan)
+    X[row[t], col] = values
+    df = pd.DataFrame(X, index=pd.Index([dates[i] for i in date_ok], name=0), columns=names)
+    return df, (row[t], col)
+
+def _request_json(url, what, dataset, query):
+    # Download sdmx-json, raising NoResultsError if there are no series. Requests without results are added to
+    # the availability index (query: see _observations), series are added when they are parsed.
+    # Response is streamed to a temporary file and parsed from there
+    handle, file = tempfile.mkstemp(suffix='.json')
+    os.close(handle)
+    try:
+        request(url, what, file=file)
+        with open(file, 'rb') as f:
+            responseJson = json.load(f)
+    except NoResultsError:
+        OECDAvailability.record(dataset, None, *query)
+        raise
+    finally:
+        os.remove(file)
+    if len(responseJson.get('dataSets')[0].get('series')) == 0:
+        OECDAvailability.record(dataset, None, *query)
+        raise NoResultsError('Error: No results for requested ' + what)
+    return responseJson
+
+def _attributes(df, position, names, codes, dataset, columns=None):
+    # Attributes aligned with DataFrame (see OECDAttributes.cells), saved to the cache of the dataset under the
+    # names of the columns (COUNTRY_VARIABLE, unless other names are given)
+    meta = OECDAttributes.cells(names, codes, df.shape, *position, dataset)
+    OECDAttributes.register(meta, df.columns if columns is None else columns)
+    return meta
+
+def _by_variable(responseJson, frequency, dataset, query=None):
+    # One DataFrame (one column per country) and attributes per variable for datasets with variable and country
+    # in the first two positions of the series keys (MEI_BTS_COS, MEI_FIN). Series are added to the availability
+    # index if query is given (see _observations).
+    variables = _dimension(responseJson, 'series', 0)
+    countries = _dimension(responseJson, 'series', 1)
+    # All available time periods. Does NOT necessarily equal all time periods per country/variable
+    dates = _dimension(responseJson, 'observation', 0)
+
+    dims, t, values, names, codes = _observations(responseJson, dates, frequency, dataset, query)
+    # Columns of _to_frame are country and variable
+    dims = dims[:, [1, 0]]
+    df_all = dict.fromkeys(variables)
+    meta_all = dict.fromkeys(variables)
+    for j in range(len(variables)):
+        rows = dims[:, 1] == j
+        if not rows.any():
+            warnings.warn('No results for requested variable ' + variables[j], MissingSeriesWarning)
+        else:
+            df, position = _to_frame(dims[rows], t[rows], values[rows], countries, variables, dates, frequency)
+            df_all[variables[j]] = df
+            meta_all[variables[j]] = _attributes(df, position, names, codes[rows], dataset)
+    return df_all, meta_all
 
 def get_series_first_release_MEIArchive(country_list, variable_list, frequency,  startDate, endDate, startEDI, endEDI):     
     # Request data from OECD API and return pandas DataFrame
@@ -49,6 +172,9 @@ def get_series_first_release_MEIArchive(country_list, variable_list, frequency,
     # endDate: date in YYYY-MM (2000-01) or YYYY-QQ (2000-Q1) format, None for all observations
     # startEDI: Edition of data, i.e. when it was published in YYYYMM format
     # endEDI: Final edition in YYYYMM format
+    # For quarterly data, editions can be given in YYYY-QQ format. All monthly editions from the first month of
+    # startEDI are requested, since a quarter is often first published in the middle of the next quarter (e.g. Q1
+    # GDP in the May edition) and the quarter-end edition may already contain a revision.
     
     # =============== RAW DATA STRUCTURE
     # The dataset has a total of M series which are identified through four keys in the following format: 0:0:0:0
@@ -62,162 +188,56 @@ def get_series_first_release_MEIArchive(country_list, variable_list, frequency,
     # it is possible that t is not a consecutive series of values in which case observations are missing. 
     # Code accounts for differences in length of time series.
     # Real time data is extracted as the observations in the first published edition.
+
+    # =============== OUTPUT
+    # df: DataFrame with time periods as index and one column per country
+    # meta: attributes of the observations in df (unit, power code, reference period, observation status), see
+    #       OECDAttributes.cells. Use OECDAttributes.scale(df, meta) for values in units.
     
     # ============= Create URL
-    url_base = "https://stats.oecd.org/sdmx-json/data/MEI_ARCHIVE/"
+    variable_str, _ = join_codes(variable_list)
+    country_str, N = join_codes(country_list)
+    edition_dates = get_edition_dates(startDate, startEDI, endEDI, frequency, quarter_end=False)
     
-    if isinstance(variable_list,list) == True:
-        if len(variable_list) == 1:
-            variable_str = str(variable_list[0])
-        else:
-            variable_str = '+'.join(str(x) for x in variable_list)
-    else:
-        variable_str = str(variable_list)
-        
-    if isinstance(country_list,list) == True:
-        N = len(country_list)
-        if len(country_list) == 1:
-            country_str = country_list[0]
-        else:
-            country_str = '+'.join(str(x) for x in country_list)
-    else:
-        N = 1;
-        country_str = country_list
-    
-    startTime = "startTime=" + startDate
-    endTime = "endTime=" + endDate
-
-    if startEDI == [] and endEDI == []:
-        if float(startDate.replace('-','')) >= 199902:
-            edition_dates = pd.date_range(datetime.strptime(startDate, '%Y-%m'),datetime.now(),freq='m').strftime('%Y%m')
-        else:
-            edition_dates = pd.date_range(datetime.strptime('1999-02', '%Y-%m'),datetime.now(),freq='m').strftime('%Y%m')
-
-    elif endEDI == []:
-        edition_dates = pd.date_range(datetime.strptime(startEDI, '%Y-%m'),datetime.now(),freq='m').strftime('%Y%m')
-    elif startEDI == []:
-        edition_dates = pd.date_range(datetime.strptime(startDate, '%Y-%m'),datetime.strptime(endEDI, '%Y-%m'),freq='m').strftime('%Y%m')
-    else:
-        edition_dates = pd.date_range(datetime.strptime(startEDI, '%Y-%m'),datetime.strptime(endEDI, '%Y-%m'),freq='m').strftime('%Y%m')
-
-    edition_str = '+'.join(str(x) for x in edition_dates)
-    
-    url = url_base + country_str + "." + variable_str + "." + edition_str + "." + frequency + "/all?" + startTime + "&" + endTime 
+    url = get_data_url("MEI_ARCHIVE", [country_list, variable_list, edition_dates, frequency], startDate, endDate)
   
     # ============= Download Data
-    response = rq.get(url = url, params = {})
-
-    if (response.status_code == 200):
-        
-        responseJson = response.json()
-        # Get list of observations. This includes all revision to variables, not just real time vintages
-        series = responseJson.get('dataSets')[0].get('series')
-        filterKeys = lambda k: {x: series[x] for x in k}
-
-        if (len(series) > 0):
-            
-            # Countries in dataset
-            temp = responseJson.get('structure').get('dimensions').get('series')[0].get('values') 
-            countries = [temp[i].get('id') for i in range(len(temp))]
-            
-            # All available time periods. Does NOT necessarily equal all time periods per country
-            temp = responseJson.get('structure').get('dimensions').get('observation')[0].get('values')
-            dates = [temp[i].get('id') for i in range(len(temp))]
-            # Remove wrong frequency (sometimes in there by accident)
-            if  frequency == 'M':
-                dates = [item for item in dates if "Q" not in item]
-            elif frequency == 'Q':
-                dates = [item for item in dates if "M" not in item]
-            # All editions in dataset
-            temp = responseJson.get('structure').get('dimensions').get('series')[2].get('values')
-            editions = [temp[i].get('id') for i in range(len(temp))]
-            
-            # Units of variables
-            units = responseJson.get('structure').get('attributes').get('series')[1].get('values')
-
-            if N == 1:
-                temp = list(series.values())      
-                tempObs = [temp[i].get('observations') for i in range(len(temp))]  
-                tempKeys = [list(tempObs[i].keys()) for i in range(len(tempObs))]
-                
-                realObs = []
-                for i in range(len(tempObs)):
-                    if i == 0:
-                        realObs.extend([tempObs[0][j][0] for j in set(tempKeys[0])])
-                    else:
-                        newKey = set(tempKeys[i]) - set().union(*tempKeys[0:i]);
-                        if len(newKey) > 0:
-                            realObs.extend([tempObs[i][j][0] for j in newKey])
-                    
-                df = pd.DataFrame(dates)
-                df[countries[0]] = realObs
-                return df
-
-            elif len(countries) > 1:
-            
-                # Get all keys
-                key = list(series.keys())       
-                key_id = [key[i].split(':')[0] for i in range(len(key))]
-                # Create empty dataframe with all dates as index
-                df = pd.DataFrame(dates)
-                df.set_index(0, inplace=True)
-                
-                for j in range(len(countries)):
-                    # Get series per country
-                    splitKeys = [key[i] for i in range(len(key)) if key_id[i]==str(j)]
-                    tempseries = filterKeys(splitKeys)
-                    temp = list(tempseries.values())   
-                    
-                    if len(temp) == 0:
-                        
-                        print('Error: No results for requested variable no.' + variable_str + 'for country' + countries[j])
-                    
-                    else: 
-                        # All observations for each edition
-                        tempObs = [temp[i].get('observations') for i in range(len(temp))]  
-                        # Keys (t) to identify time periods
-                        tempKeys = [list(tempObs[i].keys()) for i in range(len(tempObs))]
-                        # Get real time data
-                        realObs = []
-                        for i in range(len(tempObs)):
-                            if i == 0:
-                                # All observations for first edition
-                                realObs.extend([tempObs[0][k][0] for k in set(tempKeys[0])])
-                            else:
-                                # Get keys for observations for time periods that have not been published before 
-                                # (i.e. have been revised)
-                                newKey = set(tempKeys[i]) - set().union(*tempKeys[0:i]);
-                                if len(newKey) > 0:
-                                # If current edition includes new observations, add to real time data
-                                    realObs.extend([tempObs[i][k][0] for k in newKey])
-                        # Get keys to identify dates corresponding to real time observations
-                        allKeys = [int(item) for item in list(set().union(*tempKeys))]
-                        allKeys.sort()
-                        # Get dates corresponding to real time observations
-                        tempDates = [dates[i] for i in allKeys]
-                        # Create dataframe for country j
-                        df_temp = pd.DataFrame(tempDates)
-                        df_temp.set_index(0, inplace=True)
-                        df_temp[countries[j]] = realObs
-                        # Combine with countries from previous iteration, fill missing dates with nan
-                        df = df.join(df_temp)
-                    
-                return df, units
-
-        else:
-            
-            print('Error: No results for requested variable no. ' + variable_str + ' for country ' + country_str)
-            
-    elif (response.status_code == 404):
-        
-          print('Error: No results for requested variable no. ' + variable_str + ' for country ' + country_str)
-
-    else:
-
-        print('Error: %s' % response.status_code)
-        print('Error: Check URL. Made request from: /r/n' + url)
-
-def get_series_all_releases_MEIArchive(country_list, variable_list, frequency,  startDate, endDate, startEDI, endEDI):     
+    # Series are added to the availability index, so that requests without results can be skipped next time
+    query = (country_list, variable_list, edition_dates, frequency, startDate, endDate)
+    responseJson = _request_json(url, 'variable no. ' + variable_str + ' for country ' + country_str, 'MEI_ARCHIVE',
+                                 query)
+
+    # Countries, variables and editions in dataset (editions not necessarily in chronological order!!)
+    countries = _dimension(responseJson, 'series', 0)
+    variables = _dimension(responseJson, 'series', 1)
+    editions = _dimension(responseJson, 'series', 2)
+    # All available time periods. Does NOT necessarily equal all time periods per country
+    dates = _dimension(responseJson, 'observation', 0)
+    
+    # One row per observation: keys of series (country, variable, edition, frequency), period, value and codes
+    # of attributes
+    dims, t, values, names, codes = _observations(responseJson, dates, frequency, 'MEI_ARCHIVE', query)
+    if len(t) == 0:
+        # All observations are missing or of another frequency
+        raise NoResultsError('Error: No results for requested variable no. ' + variable_str + ' for country ' +
+                             country_str)
+    # Real time data: observation in the first edition that publishes a period
+    dims, t, values, codes = first_release(dims, t, values, editions, codes)
+    df, position = _to_frame(dims, t, values, countries, variables, dates, frequency, single_variable=True)
+    meta = _attributes(df, position, names, codes, 'MEI_ARCHIVE',
+                       [item + '_' + variables[0] for item in df.columns] if len(variables) == 1 else None)
+    
+    # Requested countries without observations (countries without any data are not in the response)
+    present = [countries[j] for j in set(dims[:, 0])]
+    for country in join_codes(country_list)[0].split('+'):
+        if country not in present:
+            warnings.warn('No results for requested variable no. ' + variable_str + ' for country ' + country,
+                          MissingSeriesWarning)
+    
+    return df, meta
+
+def get_series_all_releases_MEIArchive(country_list, variable_list, frequency,  startDate, endDate, startEDI, endEDI,
+                                       attributes=False, edition_chunk=None):     
     # Request data from OECD API and return pandas DataFrame
     
     # =============== INPUT 
@@ -228,6 +248,14 @@ def get_series_all_releases_MEIArchive(country_list, variable_list, frequency,
     # endDate: date in YYYY-MM (2000-01) or YYYY-QQ (2000-Q1) format, None for all observations
     # startEDI: Edition of data, i.e. when it was published in YYYYMM format
     # endEDI: Final edition in YYYYMM format
+    # For quarterly data, editions can be given in YYYY-QQ format and only the edition of the last month of each
+    # quarter is requested (see OECDCodes.get_edition_dates)
+    # attributes: True to also return the attributes of the observations (dict with editions as keys, see
+    #             OECDAttributes.cells). Series attributes are saved to the cache of MEI_ARCHIVE in any case.
+    # edition_chunk: number of editions per request, None for one request. Each chunk is downloaded (and retried)
+    #                on its own, which keeps responses small on unreliable connections. If a chunk fails, the
+    #                editions of the other chunks are returned and a PartialDownloadWarning names the missing
+    #                editions (RequestError if all chunks fail).
     
     # =============== RAW DATA STRUCTURE
     # The dataset has a total of M series which are identified through four keys in the following format: 0:0:0:0
@@ -243,161 +271,86 @@ def get_series_all_releases_MEIArchive(country_list, variable_list, frequency,
     # Real time data is extracted as the observations in the first published edition.
     
     # ============= Create URL
-    url_base = "https://stats.oecd.org/sdmx-json/data/MEI_ARCHIVE/"
-    
-    if isinstance(variable_list,list) == True:
-        if len(variable_list) == 1:
-            variable_str = str(variable_list[0])
-        else:
-            variable_str = '+'.join(str(x) for x in variable_list)
-    else:
-        variable_str = str(variable_list)
-        
-    if isinstance(country_list,list) == True:
-        N = len(country_list)
-        if len(country_list) == 1:
-            country_str = country_list[0]
-        else:
-            country_str = '+'.join(str(x) for x in country_list)
-    else:
-        N = 1;
-        country_str     = country_list
+    variable_str, _ = join_codes(variable_list)
+    country_str, N = join_codes(country_list)
+    edition_dates = get_edition_dates(startDate, startEDI, endEDI, frequency)
     
-    startTime = "startTime=" + startDate
-    endTime = "endTime=" + endDate
-
-    if startEDI == [] and endEDI == []:
-        if float(startDate.replace('-','')) >= 199902:
-            edition_dates = pd.date_range(datetime.strptime(startDate, '%Y-%m'),datetime.now(),freq='m').strftime('%Y%m')
-        else:
-            edition_dates = pd.date_range(datetime.strptime('1999-02', '%Y-%m'),datetime.now(),freq='m').strftime('%Y%m')
-
-    elif endEDI == []:
-        edition_dates = pd.date_range(datetime.strptime(startEDI, '%Y-%m'),datetime.now(),freq='m').strftime('%Y%m')
-    elif startEDI == []:
-        edition_dates = pd.date_range(datetime.strptime(startDate, '%Y-%m'),datetime.strptime(endEDI, '%Y-%m'),freq='m').strftime('%Y%m')
-    else:
-        edition_dates = pd.date_range(datetime.strptime(startEDI, '%Y-%m'),datetime.strptime(endEDI, '%Y-%m'),freq='m').strftime('%Y%m')
-
-    edition_str = '+'.join(str(x) for x in edition_dates)
-    
-    url = url_base + country_str + "." + variable_str + "." + edition_str + "." + frequency + "/all?" + startTime + "&" + endTime 
+    chunks = [edition_dates]
+    if edition_chunk is not None:
+        chunks = [edition_dates[i:i + edition_chunk] for i in range(0, len(edition_dates), edition_chunk)]
   
-    # ============= Download Data
-    response = rq.get(url = url, params = {})
-
-    if (response.status_code == 200):
-        
-        responseJson = response.json()
-        # Get list of observations. This includes all revision to variables, not just real time vintages
-        series = responseJson.get('dataSets')[0].get('series')
-        filterKeys = lambda k: {x: series[x] for x in k}
-
-        if (len(series) > 0):
-            
-            # Countries in dataset
-            temp = responseJson.get('structure').get('dimensions').get('series')[0].get('values') 
-            countries = [temp[i].get('id') for i in range(len(temp))]
-            
-            # Variables in dataset
-            temp = responseJson.get('structure').get('dimensions').get('series')[1].get('values') 
-            variables = [temp[i].get('id') for i in range(len(temp))]
-            
-            # All available time periods. Does NOT necessarily equal all time periods per country
-            temp = responseJson.get('structure').get('dimensions').get('observation')[0].get('values')
-            dates = [temp[i].get('id') for i in range(len(temp))]
-            # Remove wrong frequency (sometimes in there by accident)
-            if  frequency == 'M':
-                dates = [item for item in dates if "Q" not in item]
-            elif frequency == 'Q':
-                dates = [item for item in dates if "M" not in item]
-            # All editions in dataset (not necessarily in chronological order!!)
-            temp = responseJson.get('structure').get('dimensions').get('series')[2].get('values')
-            editions = [temp[i].get('id') for i in range(len(temp))]
-            editions_sort = [int(item) for item in editions]
-            editions_sort.sort()
-            # Units of variables
-            units = responseJson.get('structure').get('attributes').get('series')[1].get('values')            
-            # Get all keys 
-            key = list(series.keys())       
-            key_id = [key[i].split(':')[2] for i in range(len(key))]
-            # Create empty dict with all editions as index
-            df_all = dict.fromkeys(editions_sort)
-            for j in range(len(editions)):
-                # Get editions per country
-                splitKeys = [key[i] for i in range(len(key)) if key_id[i]==str(j)]
-                tempseries = filterKeys(splitKeys)
-                    
-                if len(tempseries) == 0:
-                        
-                    print('Error: No results for requested variable no.' + variable_str + 'for country' + countries[j])
-                    
-                else: 
-                    # Vintage for each country
-                    tempVintage = [tempseries[item].get('observations') for item in splitKeys] 
-                    # Keys to identify time periods
-                    tempVintageKeys = [list(tempVintage[i].keys()) for i in range(len(tempVintage))]
-                    # Keys to identify countries
-                    tempCountryKeys = [item.split(':')[0] for item in splitKeys] 
-                        
-                    # Get all vintages
-                    for i in range(len(tempVintage)):
-                        if i == 0: 
-                            tempDates = [dates[int(k)] for k in tempVintageKeys[i]]
-                            df = pd.DataFrame(tempDates)
-                            df.set_index(0, inplace=True)
-                            tempname = countries[int(tempCountryKeys[i])] + '_' + variables[0]
-                            df[tempname] = [tempVintage[i][k][0] for k in tempVintageKeys[i]]
-                        else:
-                            tempDates = [dates[int(k)] for k in tempVintageKeys[i]]
-                            df_temp = pd.DataFrame(tempDates)
-                            df_temp.set_index(0, inplace=True)
-                            tempname = countries[int(tempCountryKeys[i])] + '_' + variables[0]
-                            df_temp[tempname] = [tempVintage[i][k][0] for k in tempVintageKeys[i]]
-                            if len(df_temp) > len(df):
-                                df = df.join(df_temp,how='right')
-                            else:
-                                df = df.join(df_temp)
-                    df_all[int(editions[j])] = df    
-                    
-            return df_all
-
-        else:
-            
-            print('Error: No results for requested variable no. ' + variable_str + ' for country ' + country_str)
+    # ============= Download Data (one request per chunk of editions, newest editions first)
+    df_all, meta_all = {}, {}
+    failed, error = [], None
+    for chunk in reversed(chunks):
+        url = get_data_url("MEI_ARCHIVE", [country_list, variable_list, chunk, frequency], startDate, endDate)
+        # Series are added to the availability index, so that requests without results can be skipped next time
+        query = (country_list, variable_list, chunk, frequency, startDate, endDate)
+        try:
+            responseJson = _request_json(url, 'variable no. ' + variable_str + ' for country ' + country_str,
+                                         'MEI_ARCHIVE', query)
+        except NoResultsError:
+            if len(chunks) == 1:
+                raise
+            continue
+        except RequestError as e:
+            if len(chunks) == 1:
+                raise
+            failed += chunk
+            error = e
+            continue
+        df_chunk, meta_chunk = _all_releases(responseJson, frequency, query)
+        df_all.update(df_chunk)
+        meta_all.update(meta_chunk)
+    if len(df_all) == 0:
+        if error is not None:
+            raise error
+        raise NoResultsError('Error: No results for requested variable no. ' + variable_str + ' for country ' +
+                             country_str)
+    if len(failed) > 0:
+        warnings.warn('Editions ' + ', '.join(sorted(failed)) + ' of variable no. ' + variable_str + ' for country ' +
+                      country_str + ' could not be downloaded: ' + str(error), PartialDownloadWarning)
+    df_all = {e: df_all[e] for e in sorted(df_all)}
+    meta_all = {e: meta_all[e] for e in sorted(meta_all)}
             
-    elif (response.status_code == 404):
-        
-          print('Error: No results for requested variable no. ' + variable_str + ' for country ' + country_str)
-
-    else:
-
-        print('Error: %s' % response.status_code)
-        print('Error: Check URL. Made request from: /r/n' + url)
-
-def get_var_codes_MEI_BTS_COS():
-    url = "https://stats.oecd.org/restsdmx/sdmx.ashx/GetDataStructure/MEI_BTS_COS"
-    resp = rq.get(url)
-    doc = etree.fromstring(resp.content)
-    
-    root = "{http://www.SDMX.org/resources/SDMXML/schemas/v2_0/message}CodeLists/*[@id='CL_MEI_BTS_COS_SUBJECT']/"
-    var_list = doc.findall(root)
-    var_name = [var_list[i].get('value') for i in range(2,len(var_list))]
-    var_description = [var_list[i][0].text for i in range(2,len(var_list))]
-    return var_name, var_description
-
-def get_country_codes_MEI_BTS_COS():
-    url = "https://stats.oecd.org/restsdmx/sdmx.ashx/GetDataStructure/MEI_BTS_COS"
-    resp = rq.get(url)
-    doc = etree.fromstring(resp.content)
-    
-    root ="{http://www.SDMX.org/resources/SDMXML/schemas/v2_0/message}CodeLists/*[@id='CL_MEI_BTS_COS_LOCATION']/"
-    country_list = doc.findall(root)
-    country_code = [country_list[i].get('value') for i in range(2,len(country_list))]
-
-    return country_code
-
-def get_series_MEI_BTS_COS(country_list, variable_list, frequency,  startDate, endDate):     
+    if attributes:
+        return df_all, meta_all
+    return df_all
+
+def _all_releases(responseJson, frequency, query=None):
+    # One DataFrame and attributes per edition from sdmx-json response of MEI_ARCHIVE (series are added to the
+    # availability index if query is given, see _observations)
+
+    # Countries, variables and editions in dataset (editions not necessarily in chronological order!!)
+    countries = _dimension(responseJson, 'series', 0)
+    variables = _dimension(responseJson, 'series', 1)
+    editions = _dimension(responseJson, 'series', 2)
+    # All available time periods. Does NOT necessarily equal all time periods per country
+    dates = _dimension(responseJson, 'observation', 0)
+    
+    # One row per observation: keys of series (country, variable, edition, frequency), period and value
+    dims, t, values, names, codes = _observations(responseJson, dates, frequency, 'MEI_ARCHIVE', query)
+    
+    # Create dict with all editions as keys and one DataFrame per edition
+    editions_sort = sorted(int(item) for item in editions)
+    df_all = dict.fromkeys(editions_sort)
+    meta_all = dict.fromkeys(editions_sort)
+    # Sort by edition in chronological order, so that the cache holds the series attributes of the latest edition
+    rank = np.argsort(np.argsort([int(item) for item in editions]))[dims[:, 2]]
+    order = np.argsort(rank, kind='stable')
+    dims, t, values, codes = dims[order], t[order], values[order], codes[order]
+    bounds = np.flatnonzero(np.diff(dims[:, 2])) + 1
+    for rows in np.split(np.arange(len(t)), bounds):
+        if len(rows) > 0:
+            df, position = _to_frame(dims[rows], t[rows], values[rows], countries, variables, dates, frequency,
+                                     all_dates=False)
+            edition = int(editions[dims[rows[0], 2]])
+            df_all[edition] = df
+            meta_all[edition] = _attributes(df, position, names, codes[rows], 'MEI_ARCHIVE')
+
+    return df_all, meta_all
+
+def get_series_MEI_BTS_COS(country_list, variable_list, frequency,  startDate, endDate, attributes=False):     
     # Request data from OECD API and return pandas DataFrame
     
     # =============== INPUT 
@@ -406,6 +359,8 @@ def get_series_MEI_BTS_COS(country_list, variable_list, frequency,  startDate, e
     # frequency: 'M' for monthly and 'Q' for quarterly time series
     # startDate: date in YYYY-MM (2000-01) or YYYY-QQ (2000-Q1) format, None for all observations
     # endDate: date in YYYY-MM (2000-01) or YYYY-QQ (2000-Q1) format, None for all observations
+    # attributes: True to also return the attributes of the observations (dict with variables as keys, see
+    #             OECDAttributes.cells). Series attributes are saved to the cache of MEI_BTS_COS in any case.
    
     # =============== RAW DATA STRUCTURE
     # The dataset has a total of M series which are identified through four keys in the following format: 0:0:0:0
@@ -420,165 +375,26 @@ def get_series_MEI_BTS_COS(country_list, variable_list, frequency,  startDate, e
     # Code accounts for differences in length of time series.
     
     # ============= Create URL
-    url_base = "https://stats.oecd.org/sdmx-json/data/MEI_BTS_COS/"
-    
-    if isinstance(variable_list,list) == True:
-        if len(variable_list) == 1:
-            variable_str = str(variable_list[0])
-        else:
-            variable_str = '+'.join(str(x) for x in variable_list)
-    else:
-        variable_str = str(variable_list)
-        
-    if isinstance(country_list,list) == True:
-        N = len(country_list)
-        if len(country_list) == 1:
-            country_str = country_list[0]
-        else:
-            country_str = '+'.join(str(x) for x in country_list)
-    else:
-        N = 1;
-        country_str = country_list
-    
-    startTime = "startTime=" + startDate
-    endTime = "endTime=" + endDate
+    variable_str, _ = join_codes(variable_list)
+    country_str, N = join_codes(country_list)
     measure = "BLSA"
     
-    url = url_base + variable_str + "." + country_str + "." + measure + "." + frequency + "/all?" + startTime + "&" + endTime 
+    url = get_data_url("MEI_BTS_COS", [variable_list, country_list, measure, frequency], startDate, endDate)
   
     # ============= Download Data
-    response = rq.get(url = url, params = {})
-
-    if (response.status_code == 200):
-        
-        responseJson = response.json()
-        # Get list of observations. This includes all revision to variables, not just real time vintages
-        series = responseJson.get('dataSets')[0].get('series')
-        filterKeys = lambda k: {x: series[x] for x in k}
-
-        if (len(series) > 0):
-            
-            # All variables in dataset
-            temp = responseJson.get('structure').get('dimensions').get('series')[0].get('values') 
-            variables = [temp[i].get('id') for i in range(len(temp))]
-            
-            # All available time periods. Does NOT necessarily equal all time periods per country/variable
-            temp = responseJson.get('structure').get('dimensions').get('observation')[0].get('values')
-            dates = [temp[i].get('id') for i in range(len(temp))]
-            dates = [item for item in dates if "Q" not in item]
-            
-            # All measure (all the same)
-            temp = responseJson.get('structure').get('dimensions').get('series')[2].get('values')
-            measure = [temp[i].get('id') for i in range(len(temp))]
-            
-            # Countries 
-            temp = responseJson.get('structure').get('dimensions').get('series')[1].get('values') 
-            countries = [temp[i].get('id') for i in range(len(temp))]
-
-            if N == 1:
-                temp = list(series.values())      
-                tempObs = [temp[i].get('observations') for i in range(len(temp))]  
-                tempKeys = [list(tempObs[i].keys()) for i in range(len(tempObs))]
-                
-                realObs = []
-                for i in range(len(tempObs)):
-                    if i == 0:
-                        realObs.extend([tempObs[0][j][0] for j in set(tempKeys[0])])
-                    else:
-                        newKey = set(tempKeys[i]) - set().union(*tempKeys[0:i]);
-                        if len(newKey) > 0:
-                            realObs.extend([tempObs[i][j][0] for j in newKey])
-                    
-                df = pd.DataFrame(dates)
-                df[countries[0]] = realObs
-                return df
-
-            elif len(variables) > 1:
-            
-                # Get all keys
-                key = list(series.keys())       
-                var_key_id = [key[i].split(':')[0] for i in range(len(key))]
-                # Create empty dataframe with all dates as index
-                df = pd.DataFrame(dates)
-                df.set_index(0, inplace=True)
-                
-                # Combine Data per variable for each country
-                df_all = dict.fromkeys(variables)
-                for j in range(len(variables)):
-                    
-                    df = pd.DataFrame(dates)
-                    df.set_index(0, inplace=True)
-                
-                    # Get series per country
-                    splitKeys = [key[i] for i in range(len(key)) if var_key_id[i]==str(j)]
-                    tempseries = filterKeys(splitKeys)
-                    temp = list(tempseries.values())   
-                    
-                    if len(temp) == 0:
-                        
-                        print('Error: No results for requested variable' + variable_list[j])
-                    
-                    else: 
-                         # Get country keys
-                        subkey = list(tempseries.keys())       
-                        country_key_id = [subkey[i].split(':')[1] for i in range(len(subkey))]
-                        # All observations for each country
-                        tempObs = [temp[i].get('observations') for i in range(len(temp))]  
-                        # Keys (t) to identify time periods
-                        tempKeys = [list(tempObs[i].keys()) for i in range(len(tempObs))]
-                        for i in range(len(tempObs)):
-                            # Get Observations
-                            Obs = [item[0] for item in list(tempObs[i].values())]
-                            # Get dates for observations
-                            tempDates = [dates[int(x)] for x in tempKeys[i]]
-                            df_temp = pd.DataFrame(tempDates)
-                            df_temp.set_index(0, inplace=True)
-                            # Get country name
-                            tempname = countries[int(country_key_id[i])] + '_' + variables[j]
-                            df_temp[tempname] = Obs
-                            # Combine with countries from previous iteration, fill missing dates with nan
-                            df = df.join(df_temp)
-                        df_all[variables[j]] = df
-                return df_all
-
-        else:
-            
-            print('Error: No results for requested variable no. ' + variable_str + ' for country ' + country_str)
-            
-    elif (response.status_code == 404):
-        
-          print('Error: No results for requested variable no. ' + variable_str + ' for country ' + country_str)
+    query = (country_list, variable_list, None, frequency, startDate, endDate)
+    responseJson = _request_json(url, 'variable no. ' + variable_str + ' for country ' + country_str, 'MEI_BTS_COS', query)
 
-    else:
+    # One DataFrame per variable with all dates as index and one column per country
+    df_all, meta_all = _by_variable(responseJson, frequency, 'MEI_BTS_COS', query)
+    if attributes:
+        return df_all, meta_all
+    return df_all
 
-        print('Error: %s' % response.status_code)
-        print('Error: Check URL. Made request from: /r/n' + url)
         
         
 
-def get_var_codes_MEI_FIN():
-    url = "https://stats.oecd.org/restsdmx/sdmx.ashx/GetDataStructure/MEI_FIN"
-    resp = rq.get(url)
-    doc = etree.fromstring(resp.content)
-    
-    root = "{http://www.SDMX.org/resources/SDMXML/schemas/v2_0/message}CodeLists/*[@id='CL_MEI_FIN_SUBJECT']/"
-    var_list = doc.findall(root)
-    var_name = [var_list[i].get('value') for i in range(2,len(var_list))]
-    var_description = [var_list[i][0].text for i in range(2,len(var_list))]
-    return var_name, var_description
-
-def get_country_codes_MEI_FIN():
-    url = "https://stats.oecd.org/restsdmx/sdmx.ashx/GetDataStructure/MEI_FIN"
-    resp = rq.get(url)
-    doc = etree.fromstring(resp.content)
-    
-    root ="{http://www.SDMX.org/resources/SDMXML/schemas/v2_0/message}CodeLists/*[@id='CL_MEI_FIN_LOCATION']/"
-    country_list = doc.findall(root)
-    country_code = [country_list[i].get('value') for i in range(2,len(country_list))]
-
-    return country_code
-
-def get_series_MEI_FIN(country_list, variable_list, frequency,  startDate, endDate):     
+def get_series_MEI_FIN(country_list, variable_list, frequency,  startDate, endDate, attributes=False):     
     # Request data from OECD API and return pandas DataFrame
     
     # =============== INPUT 
@@ -587,6 +403,8 @@ def get_series_MEI_FIN(country_list, variable_list, frequency,  startDate, endDa
     # frequency: 'M' for monthly and 'Q' for quarterly time series
     # startDate: date in YYYY-MM (2000-01) or YYYY-QQ (2000-Q1) format, None for all observations
     # endDate: date in YYYY-MM (2000-01) or YYYY-QQ (2000-Q1) format, None for all observations
+    # attributes: True to also return the attributes of the observations (dict with variables as keys, see
+    #             OECDAttributes.cells). Series attributes are saved to the cache of MEI_FIN in any case.
    
     # =============== RAW DATA STRUCTURE
     # The dataset has a total of M series which are identified through four keys in the following format: 0:0:0:0
@@ -601,118 +419,21 @@ def get_series_MEI_FIN(country_list, variable_list, frequency,  startDate, endDa
     # Code accounts for differences in length of time series.
     
     # ============= Create URL
-    url_base = "https://stats.oecd.org/sdmx-json/data/MEI_FIN/"
-    
-    if isinstance(variable_list,list) == True:
-        if len(variable_list) == 1:
-            variable_str = str(variable_list[0])
-        else:
-            variable_str = '+'.join(str(x) for x in variable_list)
-    else:
-        variable_str = str(variable_list)
-        
-    if isinstance(country_list,list) == True:
-        N = len(country_list)
-        if len(country_list) == 1:
-            country_str = country_list[0]
-        else:
-            country_str = '+'.join(str(x) for x in country_list)
-    else:
-        N = 1;
-        country_str = country_list
-    
-    startTime = "startTime=" + startDate
-    endTime = "endTime=" + endDate
+    variable_str, _ = join_codes(variable_list)
+    country_str, N = join_codes(country_list)
     
-    url = url_base + variable_str + "." + country_str + "." + frequency + "/all?" + startTime + "&" + endTime 
+    url = get_data_url("MEI_FIN", [variable_list, country_list, frequency], startDate, endDate)
   
     # ============= Download Data
-    response = rq.get(url = url, params = {})
+    query = (country_list, variable_list, None, frequency, startDate, endDate)
+    responseJson = _request_json(url, 'variable no. ' + variable_str + ' for country ' + country_str, 'MEI_FIN', query)
 
-    if (response.status_code == 200):
-        
-        responseJson = response.json()
-        # Get list of observations. This includes all revision to variables, not just real time vintages
-        series = responseJson.get('dataSets')[0].get('series')
-        filterKeys = lambda k: {x: series[x] for x in k}
+    # One DataFrame per variable with all dates as index and one column per country
+    df_all, meta_all = _by_variable(responseJson, frequency, 'MEI_FIN', query)
+    if attributes:
+        return df_all, meta_all
+    return df_all
 
-        if (len(series) > 0):
-            
-            # All variables in dataset
-            temp = responseJson.get('structure').get('dimensions').get('series')[0].get('values') 
-            variables = [temp[i].get('id') for i in range(len(temp))]
-            
-            # All available time periods. Does NOT necessarily equal all time periods per country/variable
-            temp = responseJson.get('structure').get('dimensions').get('observation')[0].get('values')
-            dates = [temp[i].get('id') for i in range(len(temp))]
-            dates = [item for item in dates if "Q" not in item]
-            
-            # All measure (all the same)
-            temp = responseJson.get('structure').get('dimensions').get('series')[2].get('values')
-            measure = [temp[i].get('id') for i in range(len(temp))]
-            
-            # Countries 
-            temp = responseJson.get('structure').get('dimensions').get('series')[1].get('values') 
-            countries = [temp[i].get('id') for i in range(len(temp))]
-            
-            # Get all keys
-            key = list(series.keys())       
-            var_key_id = [key[i].split(':')[0] for i in range(len(key))]
-            # Create empty dataframe with all dates as index
-            df = pd.DataFrame(dates)
-            df.set_index(0, inplace=True)
-                
-            # Combine Data per variable for each country
-            df_all = dict.fromkeys(variables)
-            for j in range(len(variables)):
-                    
-                df = pd.DataFrame(dates)
-                df.set_index(0, inplace=True)
-                
-                # Get series per country
-                splitKeys = [key[i] for i in range(len(key)) if var_key_id[i]==str(j)]
-                tempseries = filterKeys(splitKeys)
-                temp = list(tempseries.values())   
-                    
-                if len(temp) == 0:
-                        
-                    print('Error: No results for requested variable' + variable_list[j])
-                    
-                else: 
-                    # Get country keys
-                    subkey = list(tempseries.keys())       
-                    country_key_id = [subkey[i].split(':')[1] for i in range(len(subkey))]
-                    # All observations for each country
-                    tempObs = [temp[i].get('observations') for i in range(len(temp))]  
-                    # Keys (t) to identify time periods
-                    tempKeys = [list(tempObs[i].keys()) for i in range(len(tempObs))]
-                    for i in range(len(tempObs)):
-                        # Get Observations
-                        Obs = [item[0] for item in list(tempObs[i].values())]
-                        # Get dates for observations
-                        tempDates = [dates[int(x)] for x in tempKeys[i]]
-                        df_temp = pd.DataFrame(tempDates)
-                        df_temp.set_index(0, inplace=True)
-                        # Get country name
-                        tempname = countries[int(country_key_id[i])] + '_' + variables[j]
-                        df_temp[tempname] = Obs
-                        # Combine with countries from previous iteration, fill missing dates with nan
-                        df = df.join(df_temp)
-                    df_all[variables[j]] = df
-            return df_all
-
-        else:
-            
-            print('Error: No results for requested variable no. ' + variable_str + ' for country ' + country_str)
-            
-    elif (response.status_code == 404):
-        
-          print('Error: No results for requested variable no. ' + variable_str + ' for country ' + country_str)
-
-    else:
-
-        print('Error: %s' % response.status_code)
-        print('Error: Check URL. Made request from: /r/n' + url)
         
 def merge_MEI_Vintage(MEI_ALL,transform):
     
@@ -773,6 +494,10 @@ def merge_MEI_Vintage(MEI_ALL,transform):
         return allVintages
 
 def merge(data):
+    # Variables without data (None) are left out, None if there are none
+    data = {k: v for k, v in data.items() if v is not None}
+    if len(data) == 0:
+        return None
     tempKeys = list(data.keys())
     for i in range(len(tempKeys)):
         if i == 0:
@@ -782,4 +507,37 @@ def merge(data):
                 data_new = data_new.join(data[tempKeys[i]],how='right')
             else:
                 data_new = data_new.join(data[tempKeys[i]])
-    return data_new
\ No newline at end of file
+    return data_new
+
+def vintage_panel(data):
+    # Stack vintages into one NumPy array without joining DataFrames
+    
+    # =============== INPUT 
+    # data: list of dicts with editions as keys and DataFrames as values (e.g. MEI_ALL), one dict per variable
+    
+    # =============== OUTPUT
+    # values: array of shape (editions, periods, series), nan where no observation is published
+    # editions: sorted list of all editions
+    # periods: sorted list of all time periods
+    # series: list of all series (columns), in order of first appearance
+    
+    editions = sorted(set().union(*[list(item.keys()) for item in data]))
+    periods = set()
+    series = {}
+    for x in data:
+        for df in x.values():
+            if df is not None:
+                periods.update(df.index)
+                series.update(dict.fromkeys(df.columns))
+    periods = pd.Index(sorted(periods))
+    series = pd.Index(list(series))
+    edition_id = {e: i for i, e in enumerate(editions)}
+    
+    values = np.full((len(editions), len(periods), len(series)), np.nan)
+    for x in data:
+        for e, df in x.items():
+            if df is not None:
+                rows = periods.get_indexer(df.index)
+                cols = series.get_indexer(df.columns)
+                values[edition_id[e], rows[:, None], cols[None, :]] = df.to_numpy(dtype=float)
+    return values, editions, list(periods), list(series)
@@ -0,0 +1,298 @@
+# -*- coding: utf-8 -*-
+"""
+Functions to compare an edition of the vintages saved with OECDExport.write_vintages with the previous edition and
+emit a change set (new periods, revised and deleted observations, added and removed series), so that only models
+that use changed series need to be updated. Editions are compared with hashes of blocks (one block per column and
+year) which are saved next to the editions, so that only blocks with different hashes are compared cell by cell.
+The shared non-vintage block is compared with its previous version. Please consult documentation of individual
+functions below for further information.
+"""
+import os
+import json
+import hashlib
+import tempfile
+import OECDExport
+from OECDCodes import lazy_import
+
+pd = lazy_import('pandas')
+np = lazy_import('numpy')
+
+def _blocks(index):
+    # Block of each row: year of the period (2000-01 and 2000-Q1 are in block 2000), other rows (e.g. Transform) are
+    # blocks of their own
+    return np.array([str(item)[0:4] if str(item)[0:4].isdigit() else str(item) for item in index], dtype=object)
+
+def block_hashes(df):
+    # Hash of the observations (periods and values) of each column and block, missing observations are left out
+
+    # =============== INPUT
+    # df: DataFrame with periods as index and one column per series
+
+    # =============== OUTPUT
+    # dict with columns as keys and dicts {block: sha1} as values
+
+    X = df.to_numpy(dtype=float)
+    valid = ~np.isnan(X)
+    index_hash = pd.util.hash_array(np.asarray(df.index.astype(str), dtype=object))
+    blocks, block_id = np.unique(_blocks(df.index), return_inverse=True)
+    rows_all = [np.flatnonzero(block_id == b) for b in range(len(blocks))]
+    hashes = {}
+    for j, column in enumerate(df.columns):
+        hashes[str(column)] = {}
+        for b, rows in enumerate(rows_all):
+            rows = rows[valid[rows, j]]
+            if len(rows) > 0:
+                hashes[str(column)][blocks[b]] = hashlib.sha1(index_hash[rows].tobytes() +
+                                                              X[rows, j].tobytes()).hexdigest()
+    return hashes
+
+def diff_hashes(old, new):
+    # Series and blocks that differ between two sets of block hashes (see block_hashes)
+
+    # =============== OUTPUT
+    # added: series in new only
+    # removed: series in old only
+    # changed: dict with series in both as keys and list of blocks that differ as values (changed series only)
+
+    added = [c for c in new if c not in old]
+    removed = [c for c in old if c not in new]
+    changed = {}
+    for c in new:
+        if c in old:
+            blocks = sorted(b for b in set(old[c]) | set(new[c]) if old[c].get(b) != new[c].get(b))
+            if len(blocks) > 0:
+                changed[c] = blocks
+    return added, removed, changed
+
+def diff_frames(old_df, new_df, changed):
+    # Cell by cell comparison of the blocks that changed
+
+    # =============== INPUT
+    # old_df, new_df: DataFrames of old and new edition
+    # changed: series and blocks to compare, see diff_hashes
+
+    # =============== OUTPUT
+    # new_periods: dict {series: {period: new value}} of observations in new but not in old edition
+    # revised: dict {series: {period: [old value, new value]}}
+    # deleted: dict {series: [periods]} of observations in old but not in new edition
+
+    new_periods, revised, deleted = {}, {}, {}
+    if len(changed) == 0:
+        return new_periods, revised, deleted
+    columns = list(changed)
+    blocks = set(b for item in changed.values() for b in item)
+    old_rows = old_df.index[np.isin(_blocks(old_df.index), list(blocks))]
+    new_rows = new_df.index[np.isin(_blocks(new_df.index), list(blocks))]
+    index = old_rows.union(new_rows)
+    old_df = old_df.copy()
+    new_df = new_df.copy()
+    old_df.columns = old_df.columns.astype(str)
+    new_df.columns = new_df.columns.astype(str)
+    A = old_df.reindex(index=index, columns=columns).to_numpy(dtype=float)
+    B = new_df.reindex(index=index, columns=columns).to_numpy(dtype=float)
+    periods = [str(item) for item in index]
+
+    for i, j in zip(*np.nonzero(np.isnan(A) & ~np.isnan(B))):
+        new_periods.setdefault(columns[j], {})[periods[i]] = float(B[i, j])
+    for i, j in zip(*np.nonzero(~np.isnan(A) & np.isnan(B))):
+        deleted.setdefault(columns[j], []).append(periods[i])
+    with np.errstate(invalid='ignore'):
+        different = ~np.isnan(A) & ~np.isnan(B) & (A != B)
+    for i, j in zip(*np.nonzero(different)):
+        revised.setdefault(columns[j], {})[periods[i]] = [float(A[i, j]), float(B[i, j])]
+    return new_periods, revised, deleted
+
+def _hash_file(path, name):
+    return os.path.join(path, "Historical_OECD", "hashes", str(name) + ".json")
+
+def _cached_hashes(path, name, content_hash, read):
+    # Block hashes of a saved file, from path/Historical_OECD/hashes/<name>.json if they were computed for the same
+    # content (hash of the file in the manifest, see OECDExport.write_vintages), otherwise computed from the
+    # DataFrame returned by read and saved
+
+    # =============== OUTPUT
+    # hashes: see block_hashes
+    # df: DataFrame that was read, None if the hashes were saved
+
+    file = _hash_file(path, name)
+    if content_hash is not None and os.path.exists(file):
+        with open(file) as f:
+            saved = json.load(f)
+        if saved.get('content') == content_hash:
+            return saved['blocks'], None
+    df = read()
+    hashes = block_hashes(df)
+    if content_hash is not None:
+        _write_json({'content': content_hash, 'blocks': hashes}, file)
+    return hashes, df
+
+def _edition_hashes(path, edition, df=None):
+    # Block hashes of the edition file (without the shared block) and the DataFrame if it was read
+    manifest = OECDExport.read_manifest(os.path.join(path, "Historical_OECD"))
+    read = lambda: df if df is not None else OECDExport.read_vintage(path, edition, shared=False)
+    return _cached_hashes(path, edition, manifest.get('hashes', {}).get(str(edition)), read)
+
+def get_block_hashes(path, edition, df=None):
+    # Block hashes of an edition saved with OECDExport.write_vintages (edition file only, without the shared
+    # block). Hashes are saved to path/Historical_OECD/hashes and computed again if the edition changed.
+
+    # =============== INPUT
+    # path: folder the dataset was saved to
+    # edition: edition in YYYYMM format
+    # df: DataFrame of the edition if it is already read, None to read it if needed
+
+    return _edition_hashes(path, edition, df)[0]
+
+def _write_json(content, file):
+    # Write json file atomically
+    folder = os.path.dirname(os.path.abspath(file))
+    os.makedirs(folder, exist_ok=True)
+    handle, temp_file = tempfile.mkstemp(dir=folder, suffix='.tmp')
+    with os.fdopen(handle, 'w') as f:
+        json.dump(content, f)
+    os.replace(temp_file, file)
+
+def saved_editions(path):
+    # Editions saved in path/Historical_OECD in chronological order
+    manifest_file = os.path.join(path, "Historical_OECD", OECDExport.MANIFEST_NAME)
+    with open(manifest_file) as f:
+        return sorted(json.load(f)['editions'], key=int)
+
+def _diff(old_hashes, new_hashes, read_old, read_new, old_df=None, new_df=None):
+    # Change set between two files from their block hashes. Files are only read if any block hashes differ.
+    added, removed, changed = diff_hashes(old_hashes, new_hashes)
+    if len(changed) > 0:
+        old_df = read_old() if old_df is None else old_df
+        new_df = read_new() if new_df is None else new_df
+        new_periods, revised, deleted = diff_frames(old_df, new_df, changed)
+    else:
+        new_periods, revised, deleted = {}, {}, {}
+    changed_series = sorted(set(new_periods) | set(revised) | set(deleted))
+    return {'added_series': added, 'removed_series': removed, 'changed_series': changed_series,
+            'new_periods': new_periods, 'revised': revised, 'deleted': deleted}
+
+def diff_shared(path):
+    # Changes of the shared non-vintage block (interest rates, surveys) since its previous version, which
+    # OECDExport.write_vintages keeps when the block changes
+
+    # =============== INPUT
+    # path: folder the dataset was saved to
+
+    # =============== OUTPUT
+    # dict with added, removed and changed series, new_periods, revised and deleted (see diff_editions), None if
+    # the shared block did not change in the last save
+
+    folder = os.path.join(path, "Historical_OECD")
+    manifest = OECDExport.read_manifest(folder)
+    if manifest.get('shared') is None or manifest.get('shared_previous') is None:
+        return None
+    reader = OECDExport.FORMATS[manifest['format']][2]
+    hashes = manifest.get('hashes', {})
+    read = {name: (lambda name=name: reader(os.path.join(folder, manifest[name])))
+            for name in ['shared', 'shared_previous']}
+    # Hashes are saved per content, so that the hashes of the current block are used again once it is the
+    # previous block
+    content = {name: hashes.get(key) for name, key in [('shared', OECDExport.SHARED_NAME),
+                                                       ('shared_previous', OECDExport.PREVIOUS_NAME)]}
+    names = {name: OECDExport.SHARED_NAME + '_' + (content[name] or '')[:16] for name in content}
+    new_hashes, new_df = _cached_hashes(path, names['shared'], content['shared'], read['shared'])
+    old_hashes, old_df = _cached_hashes(path, names['shared_previous'], content['shared_previous'],
+                                        read['shared_previous'])
+    # Hashes of older versions are not needed anymore
+    hash_folder = os.path.dirname(_hash_file(path, ''))
+    for item in os.listdir(hash_folder) if os.path.isdir(hash_folder) else []:
+        if item.startswith(OECDExport.SHARED_NAME) and os.path.splitext(item)[0] not in names.values():
+            os.remove(os.path.join(hash_folder, item))
+    return _diff(old_hashes, new_hashes, read['shared_previous'], read['shared'], old_df, new_df)
+
+def diff_editions(path, new_edition=None, old_edition=None, shared=True):
+    # Change set between two editions saved with OECDExport.write_vintages. Edition files are compared without
+    # the shared block, which is compared with its previous version instead (changes of the shared block would
+    # otherwise be the same in both editions and never be found). Editions are only read if their hashes are
+    # not saved yet or any block hashes differ.
+
+    # =============== INPUT
+    # path: folder the dataset was saved to
+    # new_edition: edition in YYYYMM format, None for the latest edition
+    # old_edition: edition in YYYYMM format, None for the edition before new_edition
+    # shared: True to include the changes of the shared block (see diff_shared)
+
+    # =============== OUTPUT
+    # dict with old and new edition, added, removed and changed series (series with new periods, revisions or
+    # deletions), new_periods, revised and deleted (see diff_frames) and the changes of the shared block (shared,
+    # None if it did not change)
+
+    editions = saved_editions(path)
+    if new_edition is None:
+        new_edition = editions[-1]
+    if old_edition is None:
+        earlier = [item for item in editions if int(item) < int(new_edition)]
+        if len(earlier) == 0:
+            raise ValueError('No edition before ' + str(new_edition) + ' in ' + path)
+        old_edition = earlier[-1]
+
+    new_hashes, new_df = _edition_hashes(path, new_edition)
+    old_hashes, old_df = _edition_hashes(path, old_edition)
+    changes = {'old_edition': str(old_edition), 'new_edition': str(new_edition)}
+    changes.update(_diff(old_hashes, new_hashes,
+                         lambda: OECDExport.read_vintage(path, old_edition, shared=False),
+                         lambda: OECDExport.read_vintage(path, new_edition, shared=False), old_df, new_df))
+    changes['shared'] = diff_shared(path) if shared else None
+    return changes
+
+def _rows(changes, block):
+    rows = [(c, None, 'added_series', np.nan, np.nan, block) for c in changes['added_series']]
+    rows += [(c, None, 'removed_series', np.nan, np.nan, block) for c in changes['removed_series']]
+    rows += [(c, p, 'new_period', np.nan, v, block) for c, item in changes['new_periods'].items()
+             for p, v in item.items()]
+    rows += [(c, p, 'revised', v[0], v[1], block) for c, item in changes['revised'].items() for p, v in item.items()]
+    rows += [(c, p, 'deleted', np.nan, np.nan, block) for c, item in changes['deleted'].items() for p in item]
+    return rows
+
+def changes_table(changes):
+    # Change set as DataFrame with one row per change (series, period, change, old and new value, block). Change is
+    # new_period, revised, deleted, added_series or removed_series (period and values empty). Block is vintage for
+    # changes between the editions and shared for changes of the shared block.
+    rows = _rows(changes, 'vintage')
+    if changes.get('shared') is not None:
+        rows += _rows(changes['shared'], 'shared')
+    df = pd.DataFrame(rows, columns=['series', 'period', 'change', 'old', 'new', 'block'])
+    df['old_edition'] = changes['old_edition']
+    df['new_edition'] = changes['new_edition']
+    return df
+
+def write_changes(changes, file, fmt='json'):
+    # Save change set as json (see diff_editions) or as table (see changes_table) in any format of
+    # OECDExport.FORMATS (e.g. parquet)
+    if fmt == 'json':
+        _write_json(changes, file)
+        return file
+    return OECDExport.write_atomic(changes_table(changes).set_index('series'), file, fmt)
+
+def _counts(changes):
+    return {'added_series': changes['added_series'], 'removed_series': changes['removed_series'],
+            'changed_series': changes['changed_series'],
+            'new_periods': sum(len(item) for item in changes['new_periods'].values()),
+            'revised': sum(len(item) for item in changes['revised'].values()),
+            'deleted': sum(len(item) for item in changes['deleted'].values())}
+
+def feed_editions(file):
+    # New editions of the change sets in feed file (see update_feed), empty list if there is no feed
+    if not os.path.exists(file):
+        return []
+    with open(file) as f:
+        return [json.loads(line)['new_edition'] for line in f if line.strip() != '']
+
+def update_feed(changes, file):
+    # Append summary of change set (one json line per edition) to feed file
+
+    # =============== OUTPUT
+    # Summary that was appended
+
+    summary = {'old_edition': changes['old_edition'], 'new_edition': changes['new_edition']}
+    summary.update(_counts(changes))
+    summary['shared'] = None if changes.get('shared') is None else _counts(changes['shared'])
+    os.makedirs(os.path.dirname(os.path.abspath(file)), exist_ok=True)
+    with open(file, 'a') as f:
+        f.write(json.dumps(summary) + '\n')
+    return summary
@@ -0,0 +1,248 @@
+# -*- coding: utf-8 -*-
+"""
+Functions to save the vintages produced by getOECDData.py. Editions are written in parallel and atomically
+(temporary file + rename) in any of the formats listed in FORMATS. Editions whose content did not change since the
+last run are not written again (hashes in the manifest). Please consult documentation of individual functions below
+for further information.
+"""
+import os
+import json
+import hashlib
+import tempfile
+import importlib.util
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor
+from OECDCodes import lazy_import
+
+pd = lazy_import('pandas')
+
+# Name of the file holding the non-vintage block (interest rates, surveys), of its version before the last change
+# (see OECDDiff.diff_shared) and of the manifest
+SHARED_NAME = "OECD_shared"
+PREVIOUS_NAME = "OECD_shared_previous"
+MANIFEST_NAME = "manifest.json"
+
+def _write_csv(df, file):
+    df.to_csv(file)
+
+def _write_parquet(df, file):
+    df.to_parquet(file)
+
+def _write_feather(df, file):
+    # Feather does not store an index
+    df.reset_index().to_feather(file)
+
+def _write_pickle(df, file):
+    df.to_pickle(file)
+
+def _read_csv(file):
+    return pd.read_csv(file, index_col=0)
+
+def _read_parquet(file):
+    return pd.read_parquet(file)
+
+def _read_feather(file):
+    df = pd.read_feather(file)
+    return df.set_index(df.columns[0])
+
+def _read_pickle(file):
+    return pd.read_pickle(file)
+
+# Output formats: name -> (file extension, writer, reader)
+FORMATS = {
+    'csv': ('.csv', _write_csv, _read_csv),
+    'parquet': ('.parquet', _write_parquet, _read_parquet),
+    'feather': ('.feather', _write_feather, _read_feather),
+    'pickle': ('.pkl', _write_pickle, _read_pickle),
+}
+
+# Packages needed by pandas for a format (any of them)
+ENGINES = {
+    'parquet': ['pyarrow', 'fastparquet'],
+    'feather': ['pyarrow'],
+}
+
+def check_format(fmt):
+    # Raise ValueError for unknown formats and ImportError if the package needed for a format is not installed
+    if fmt not in FORMATS:
+        raise ValueError('Unknown output format ' + str(fmt) + '. Choose one of ' + ', '.join(FORMATS))
+    engines = ENGINES.get(fmt, [])
+    if len(engines) > 0 and not any(importlib.util.find_spec(item) is not None for item in engines):
+        raise ImportError(' or '.join(engines) + ' is required to save ' + fmt + ' files. Install ' + engines[0] +
+                          ' or use another output format (e.g. csv).')
+
+def frame_hash(df):
+    # Hash of the index, columns and values of a DataFrame
+    h = hashlib.sha1(pd.util.hash_pandas_object(df, index=True).to_numpy().tobytes())
+    h.update('|'.join(str(item) for item in df.columns).encode())
+    return h.hexdigest()
+
+def write_atomic(df, file, fmt):
+    # Write DataFrame to a temporary file in the target folder and rename it, so that readers never see
+    # a partially written file
+
+    # =============== INPUT
+    # df: pandas DataFrame
+    # file: full path of the output file
+    # fmt: output format, key of FORMATS
+
+    temp_file = _write_temp(df, file, fmt)
+    try:
+        os.replace(temp_file, file)
+    except BaseException:
+        os.remove(temp_file)
+        raise
+    return file
+
+def _write_temp(df, file, fmt):
+    # Write DataFrame to a temporary file next to file and return its path
+    writer = FORMATS[fmt][1]
+    folder = os.path.dirname(os.path.abspath(file))
+    handle, temp_file = tempfile.mkstemp(dir=folder, prefix='.' + os.path.basename(file), suffix='.tmp')
+    os.close(handle)
+    try:
+        writer(df, temp_file)
+    except BaseException:
+        os.remove(temp_file)
+        raise
+    return temp_file
+
+# Non-vintage block, set once per worker process by the pool initializer instead of pickled for every task
+_shared_data = None
+
+def _init_worker(Data):
+    global _shared_data
+    _shared_data = Data
+
+def _write_edition(edition, df, folder, fmt):
+    if _shared_data is not None:
+        df = df.join(_shared_data)
+    file = os.path.join(folder, str(edition) + FORMATS[fmt][0])
+    return write_atomic(df, file, fmt)
+
+def write_vintages(MEI_new, Data, path, fmt='csv', n_jobs=None, shared=True):
+    # Save one file per edition in path/Historical_OECD using a process pool
+
+    # =============== INPUT
+    # MEI_new: dict of DataFrames with editions as keys (output of merge_MEI_Vintage)
+    # Data: DataFrame with the non-vintage block (interest rates and surveys), None to save vintages only
+    # path: folder to save dataset
+    # fmt: output format, key of FORMATS
+    # n_jobs: number of worker processes, None for number of CPUs
+    # shared: True to write Data once to path/OECD_shared and reference it in Historical_OECD/manifest.json,
+    #         False to join Data into every edition file
+
+    # =============== OUTPUT
+    # List of files written (editions and shared block that did not change since the last run are not written)
+
+    check_format(fmt)
+    ext = FORMATS[fmt][0]
+
+    folder = os.path.join(path, "Historical_OECD")
+    os.makedirs(folder, exist_ok=True)
+    manifest_file = os.path.join(folder, MANIFEST_NAME)
+    old = read_manifest(folder)
+    old_hashes = old.get('hashes', {}) if old.get('format') == fmt else {}
+    hashes = {}
+    files = []
+    shared_file = None
+    previous_file = None
+
+    if shared and Data is not None:
+        shared_file = os.path.join(path, SHARED_NAME + ext)
+        hashes[SHARED_NAME] = frame_hash(Data)
+        if old_hashes.get(SHARED_NAME) != hashes[SHARED_NAME] or not os.path.exists(shared_file):
+            # New block is written to a temporary file before the old block is moved, so that the old block is
+            # kept if writing fails. The version before the change is kept, so that changes of the shared block
+            # can be found.
+            temp_file = _write_temp(Data, shared_file, fmt)
+            try:
+                if os.path.exists(shared_file) and SHARED_NAME in old_hashes:
+                    previous_file = os.path.join(path, PREVIOUS_NAME + ext)
+                    os.replace(shared_file, previous_file)
+                    hashes[PREVIOUS_NAME] = old_hashes[SHARED_NAME]
+                os.replace(temp_file, shared_file)
+            except BaseException:
+                os.remove(temp_file)
+                raise
+            files.append(shared_file)
+        elif os.path.exists(os.path.join(path, PREVIOUS_NAME + ext)):
+            os.remove(os.path.join(path, PREVIOUS_NAME + ext))
+        # Workers only write the vintage block
+        Data = None
+
+    # Editions that changed (edition files joined with Data also change with Data)
+    data_hash = '' if Data is None else frame_hash(Data)
+    editions = list(MEI_new.keys())
+    changed = []
+    for i in editions:
+        hashes[str(i)] = hashlib.sha1((frame_hash(MEI_new[i]) + data_hash).encode()).hexdigest()
+        if old_hashes.get(str(i)) != hashes[str(i)] or not os.path.exists(os.path.join(folder, str(i) + ext)):
+            changed.append(i)
+
+    # Workers are started from a new process (forkserver, or spawn where it is not available): forking a process
+    # with running threads (e.g. the stages of OECDJob) can deadlock on locks held by those threads
+    methods = mp.get_all_start_methods()
+    context = mp.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+
+    if len(changed) > 0:
+        with ProcessPoolExecutor(max_workers=n_jobs, mp_context=context, initializer=_init_worker,
+                                 initargs=(Data,)) as pool:
+            futures = [pool.submit(_write_edition, i, MEI_new[i], folder, fmt) for i in changed]
+            files.extend([f.result() for f in futures])
+
+    manifest = {'format': fmt,
+                'editions': [str(i) for i in editions],
+                'shared': None if shared_file is None else os.path.relpath(shared_file, folder),
+                'shared_previous': None if previous_file is None else os.path.relpath(previous_file, folder),
+                'hashes': hashes}
+    write_manifest(manifest, manifest_file)
+
+    return files
+
+def read_manifest(folder):
+    # Manifest of the vintages in folder (path/Historical_OECD), empty dict if there is none
+    file = os.path.join(folder, MANIFEST_NAME)
+    if not os.path.exists(file):
+        return {}
+    with open(file) as f:
+        return json.load(f)
+
+def write_manifest(manifest, file):
+    # Write manifest atomically, merging the list of editions and their hashes with an existing manifest
+    if os.path.exists(file):
+        with open(file) as f:
+            old = json.load(f)
+        if old.get('format') == manifest['format']:
+            editions = set(old.get('editions', [])) | set(manifest['editions'])
+            manifest['editions'] = sorted(editions)
+            hashes = dict(old.get('hashes', {}))
+            hashes.update(manifest.get('hashes', {}))
+            # Shared block and its previous version are those of this save (the previous version is removed when
+            # the shared block did not change)
+            for name in [SHARED_NAME, PREVIOUS_NAME]:
+                if name not in manifest.get('hashes', {}):
+                    hashes.pop(name, None)
+            manifest['hashes'] = hashes
+    folder = os.path.dirname(os.path.abspath(file))
+    handle, temp_file = tempfile.mkstemp(dir=folder, suffix='.tmp')
+    with os.fdopen(handle, 'w') as f:
+        json.dump(manifest, f, indent=1)
+    os.replace(temp_file, file)
+
+def read_vintage(path, edition, shared=True):
+    # Read one edition saved with write_vintages and join the shared non-vintage block if it was saved separately
+
+    # =============== INPUT
+    # path: folder the dataset was saved to
+    # edition: edition in YYYYMM format
+    # shared: False to read the edition file only, without the shared block
+
+    folder = os.path.join(path, "Historical_OECD")
+    manifest = read_manifest(folder)
+    fmt = manifest.get('format', 'csv')
+    ext, writer, reader = FORMATS[fmt]
+    df = reader(os.path.join(folder, str(edition) + ext))
+    if shared and manifest.get('shared') is not None:
+        df = df.join(reader(os.path.join(folder, manifest['shared'])))
+    return df
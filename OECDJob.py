@@ -0,0 +1,537 @@
+# -*- coding: utf-8 -*-
+"""
+Command line entry point (oecd-data) to download the OECD datasets described in a job spec (TOML or YAML).
+The job is split into fetch, merge, documentation and save stages and independent stages (MEI, BTS_COS, MEI_FIN,
+FX) run concurrently. See jobs/Hillebrand2023.toml for an example of a job spec.
+
+Usage: python OECDJob.py jobs/Hillebrand2023.toml
+       oecd-data jobs/Hillebrand2023.toml (after pip install .)
+"""
+import os
+import sys
+import pickle
+import hashlib
+import argparse
+import warnings
+import threading
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from OECDCodes import OECDError, NoResultsError, MissingSeriesWarning, PartialDownloadWarning
+
+def load_job(file):
+    # Read job spec from TOML (.toml) or YAML (.yaml/.yml) file and return dict
+    if file.endswith(('.yaml', '.yml')):
+        try:
+            import yaml
+        except ImportError:
+            raise ImportError('PyYAML is required to read YAML job specs. Use a TOML job spec or install pyyaml.')
+        with open(file) as f:
+            job = yaml.safe_load(f)
+    else:
+        try:
+            import tomllib
+        except ImportError:
+            import tomli as tomllib
+        with open(file, 'rb') as f:
+            job = tomllib.load(f)
+
+    # Settings of the datasets default to the settings of the job
+    for name in ['MEI', 'BTS_COS', 'MEI_FIN', 'FX']:
+        if name in job:
+            for key in ['countries', 'frequency', 'start_date', 'end_date']:
+                job[name].setdefault(key, job.get(key))
+    return job
+
+class BatchResult:
+    # Outcome of a batch of stages: results of the stages that succeeded, errors of the stages that failed,
+    # stages that were skipped because a stage they depend on failed, stages that ran without the results of
+    # optional dependencies that failed (partial: {stage: [dependencies]}), series that were missing in the
+    # downloads of each stage (missing: {stage: [messages of MissingSeriesWarning]}) and stages whose downloads
+    # failed in part (incomplete, see PartialDownloadWarning)
+
+    def __init__(self):
+        self.results = {}
+        self.failures = {}
+        self.skipped = []
+        self.partial = {}
+        self.missing = {}
+        self.incomplete = []
+
+    @property
+    def ok(self):
+        return len(self.failures) == 0 and len(self.skipped) == 0
+
+    def summary(self):
+        lines = [str(len(self.results)) + ' stages succeeded, ' + str(len(self.failures)) + ' failed, ' +
+                 str(len(self.skipped)) + ' skipped']
+        lines.extend(['Failed: ' + name + ': ' + str(error) for name, error in self.failures.items()])
+        if len(self.skipped) > 0:
+            lines.append('Skipped: ' + ', '.join(self.skipped))
+        lines.extend(['Partial: ' + name + ' (without ' + ', '.join(deps) + ')' for name, deps in self.partial.items()])
+        lines.extend(['Missing: ' + name + ': ' + message for name, messages in self.missing.items()
+                      for message in messages])
+        if len(self.incomplete) > 0:
+            lines.append('Incomplete: ' + ', '.join(self.incomplete))
+        return '\n'.join(lines)
+
+    def raise_for_failures(self):
+        # Raise the error of the first stage that failed
+        for name, error in self.failures.items():
+            raise OECDError('Stage ' + name + ' failed. ' + self.summary()) from error
+
+def _stage_name(dependency):
+    # Name of the stage of a dependency (optional dependencies start with ?, complete dependencies with !)
+    return dependency[1:] if dependency.startswith(('?', '!')) else dependency
+
+def _required(deps):
+    return [_stage_name(d) for d in deps if not d.startswith('?')]
+
+def _incomplete(name, stages, batch):
+    # True if stage ran without the results of optional dependencies or with downloads that failed in part, or any
+    # stage it depends on did
+    if name in batch.partial or name in batch.incomplete:
+        return True
+    return any(_incomplete(_stage_name(d), stages, batch) for d in stages[name][1])
+
+# Name of the stage running in the current thread, so that its warnings are recorded for it, and whether its
+# downloads failed in part (incomplete)
+_current = threading.local()
+
+def _in_stage(function, name):
+    def run(*args):
+        _current.name = name
+        _current.incomplete = False
+        try:
+            return function(*args)
+        finally:
+            _current.name = None
+
+    return run
+
+def _blocked(deps, stages, batch):
+    # True if a stage with dependencies deps must be skipped
+    if any(d in batch.failures or d in batch.skipped for d in _required(deps)):
+        return True
+    complete = [d[1:] for d in deps if d.startswith('!')]
+    return any(d in batch.results and _incomplete(d, stages, batch) for d in complete)
+
+def run_stages(stages, concurrency):
+    # Run stages in a thread pool as soon as all stages they depend on are finished. A stage that fails does not
+    # stop the other stages; stages that depend on it are skipped. Missing series reported by the stages
+    # (MissingSeriesWarning) are recorded in the result.
+
+    # =============== INPUT
+    # stages: dict with stage names as keys and (function, list of dependencies) as values. Each function is
+    #         called with the results of its dependencies (in the order they are listed). Dependencies starting
+    #         with ? are optional: if they fail or are skipped, the stage runs with None as their result.
+    #         Dependencies starting with ! must be complete: the stage is also skipped if they (or any stage they
+    #         depend on) ran without an optional dependency, e.g. saves that would overwrite files with part of
+    #         the data.
+    # concurrency: maximum number of stages that run at the same time
+
+    # =============== OUTPUT
+    # BatchResult
+
+    missing = [_stage_name(d) for name in stages for d in stages[name][1] if _stage_name(d) not in stages]
+    if len(missing) > 0:
+        raise ValueError('Unknown stages: ' + ', '.join(missing))
+
+    batch = BatchResult()
+    results = batch.results
+    pending = dict(stages)
+    running = {}
+    finished = lambda d: any(_stage_name(d) in item for item in [results, batch.failures, batch.skipped])
+
+    # warnings.catch_warnings is not thread safe, so warnings are caught once for all stages and recorded for the
+    # stage running in the thread that issued them
+    with warnings.catch_warnings():
+        warnings.simplefilter('always', MissingSeriesWarning)
+        show = warnings.showwarning
+
+        def record(message, category, filename, lineno, file=None, line=None):
+            name = getattr(_current, 'name', None)
+            if name is not None and issubclass(category, MissingSeriesWarning):
+                batch.missing.setdefault(name, []).append(str(message))
+                if issubclass(category, PartialDownloadWarning):
+                    _current.incomplete = True
+                    if name not in batch.incomplete:
+                        batch.incomplete.append(name)
+            else:
+                show(message, category, filename, lineno, file, line)
+
+        warnings.showwarning = record
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            while len(pending) > 0 or len(running) > 0:
+                # Skip stages whose required dependencies failed or were skipped, or whose complete dependencies
+                # are incomplete
+                blocked = [name for name in pending if _blocked(pending[name][1], stages, batch)]
+                while len(blocked) > 0:
+                    for name in blocked:
+                        pending.pop(name)
+                        batch.skipped.append(name)
+                    blocked = [name for name in pending if _blocked(pending[name][1], stages, batch)]
+                ready = [name for name in pending if all(finished(d) for d in pending[name][1])]
+                if len(ready) == 0 and len(running) == 0:
+                    if len(pending) == 0:
+                        break
+                    raise ValueError('Circular dependencies between stages: ' + ', '.join(pending))
+                for name in ready:
+                    function, deps = pending.pop(name)
+                    lost = [_stage_name(d) for d in deps if _stage_name(d) not in results]
+                    if len(lost) > 0:
+                        batch.partial[name] = lost
+                    args = [results.get(_stage_name(d)) for d in deps]
+                    running[pool.submit(_in_stage(function, name), *args)] = name
+                done, _ = wait(list(running), return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    if future.exception() is not None:
+                        batch.failures[name] = future.exception()
+                    else:
+                        results[name] = future.result()
+    return batch
+
+def checkpointed(function, name, params, checkpoint_dir, restart=False):
+    # Wrap stage function so that its result is saved to checkpoint_dir and loaded instead of computed again
+    # when the job is run again with the same parameters (in the same month, so that new editions are fetched).
+    # Results of downloads that failed in part (PartialDownloadWarning in run_stages) are not saved, so that they
+    # are fetched again.
+
+    # =============== INPUT
+    # function: stage function
+    # name: name of stage
+    # params: parameters the result depends on (e.g. settings of the dataset in the job spec)
+    # checkpoint_dir: folder for checkpoints
+    # restart: True to ignore existing checkpoint (it is overwritten)
+
+    key = hashlib.sha1((name + '|' + repr(params) + '|' + datetime.today().strftime('%Y-%m')).encode()).hexdigest()
+    file = os.path.join(checkpoint_dir, name + '_' + key[:16] + '.pkl')
+
+    def run(*args):
+        if os.path.exists(file) and not restart:
+            with open(file, 'rb') as f:
+                return pickle.load(f)
+        result = function(*args)
+        if getattr(_current, 'incomplete', False):
+            return result
+        os.makedirs(checkpoint_dir, exist_ok=True)
+        with open(file + '.tmp', 'wb') as f:
+            pickle.dump(result, f)
+        os.replace(file + '.tmp', file)
+        return result
+
+    return run
+
+def _with_priority(function, value):
+    # Stage function that sends its requests with priority value (see OECDScheduler.priority)
+    import OECDScheduler
+
+    def run(*args):
+        with OECDScheduler.priority(value):
+            return function(*args)
+
+    return run
+
+def _categories(spec):
+    # DataFrame matching variables to categories, as in Data/OECD_categories.csv
+    import pandas as pd
+    categories = spec.get('categories', {})
+    df = pd.DataFrame({'Category': list(categories.values())}, index=list(categories.keys()))
+    df.index.name = 0
+    return df
+
+def _add_transform(df, transform):
+    # Add row with transformation code on top of DataFrame (None if there is no data)
+    import pandas as pd
+    if df is None:
+        return None
+    trans = pd.DataFrame([[transform] * len(df.columns)], columns=df.columns, index=['Transform'])
+    return pd.concat([trans, df])
+
+def _output(folder, file):
+    # Full path of output file, creating folder if needed
+    os.makedirs(folder, exist_ok=True)
+    return os.path.join(folder, file)
+
+def build_stages(job):
+    # Stages of a job spec, see run_stages
+    import OECDData as OECD
+    import OECDExport
+    import OECDReport
+    import OECDVintage
+    from OECDCodes import to_quarter
+
+    path = job.get('path', '.')
+    doc_path = job.get('documentation')
+    currentDate = datetime.today().strftime('%Y-%m-%d')
+    stages = {}
+
+    # ================= Monthly Economic Indicators (all releases, one stage per variable)
+    if 'MEI' in job:
+        spec = job['MEI']
+        variables = spec.get('variables', [])
+        args = (spec['countries'], spec['frequency'], spec['start_date'], spec['end_date'],
+                spec.get('start_edition', []), spec.get('end_edition', []))
+        def fetch_MEI(v, frequency, startDate, endDate, *planned):
+            # Variables without data in the MEI Archive are left out, as are countries without data according to
+            # the availability index (planned, see OECDAvailability.plan)
+            countries = args[0] if len(planned) == 0 or planned[0] is None else planned[0].get(str(v), args[0])
+            if len(countries) == 0:
+                return None
+            try:
+                return OECD.get_series_all_releases_MEIArchive(countries, v, frequency, startDate, endDate, *args[4:],
+                                                               edition_chunk=spec.get('edition_chunk'))
+            except NoResultsError:
+                return None
+
+        # Quarterly variables (e.g. GDP) are fetched at quarterly frequency and placed on quarter-end months
+        variables_Q = spec.get('quarterly_variables', [])
+        dates_Q = (to_quarter(spec['start_date']), to_quarter(spec['end_date']))
+        # Index of available series from one request for series keys of all variables (per frequency)
+        index_dir = job.get('availability')
+        index_M, index_Q = [], []
+        def index_MEI(variables, frequency, startDate, endDate):
+            # All countries are fetched if the index cannot be built
+            import OECDAvailability
+            try:
+                return OECDAvailability.build_index('MEI_ARCHIVE', args[0], variables, frequency, startDate, endDate,
+                                                    *args[4:], cache_dir=index_dir)
+            except OECDError:
+                return None
+
+        if index_dir is not None and len(variables) > 0:
+            index_M = ['index_MEI']
+            stages['index_MEI'] = (lambda: index_MEI(variables, *args[1:4]), [])
+        if index_dir is not None and len(variables_Q) > 0:
+            index_Q = ['index_MEI_Q']
+            stages['index_MEI_Q'] = (lambda: index_MEI(variables_Q, 'Q', *dates_Q), [])
+
+        for v in variables:
+            stages['fetch_MEI_' + str(v)] = (lambda *planned, v=v: fetch_MEI(v, *args[1:4], *planned), index_M)
+        for v in variables_Q:
+            stages['fetch_MEI_Q_' + str(v)] = (lambda *planned, v=v: fetch_MEI(v, 'Q', *dates_Q, *planned), index_Q)
+        fetch_M = ['fetch_MEI_' + str(v) for v in variables]
+        fetch_Q = ['fetch_MEI_Q_' + str(v) for v in variables_Q]
+
+        def merge_MEI(*x):
+            # Variables without data or whose fetch failed are left out
+            MEI_ALL = [item for item in x[:len(fetch_M)] if item is not None]
+            MEI_Q = [item for item in x[len(fetch_M):] if item is not None]
+            if len(MEI_ALL) == 0 and len(MEI_Q) == 0:
+                raise NoResultsError('Error: No results for any variable of the MEI Archive')
+            if len(MEI_Q) == 0:
+                return OECD.merge_MEI_Vintage(MEI_ALL, spec.get('transform', []))
+            panel = OECDVintage.mixed_frequency_panel(MEI_ALL, MEI_Q)
+            return OECDVintage.panel_to_dict(*panel, transform=spec.get('transform', []))
+
+        stages['merge_MEI'] = (merge_MEI, ['?' + name for name in fetch_M + fetch_Q])
+        if doc_path is not None and len(variables) > 0:
+            stages['codes_MEI'] = (OECD.get_var_codes_MEIArchive, [])
+
+            def doc_MEI(codes, *x):
+                MEI_ALL = [item for item in x if item is not None]
+                var_code, var_description = codes
+                names = [var_description[var_code.index(v)] if v in var_code else str(v) for v in variables]
+                cats = [spec.get('categories', {}).get(str(v), '') for v in variables]
+                OECDReport.write_vintage_documentation(
+                    MEI_ALL, variables, names, cats,
+                    _output(doc_path, 'MEI_Documentation_' + currentDate + '.tex'), currentDate,
+                    page_dir=os.path.join(doc_path, 'MEI_Pages'))
+                edition = spec.get('documentation_edition')
+                if edition is not None:
+                    data = {j: MEI_ALL[j][edition] for j in range(len(MEI_ALL))
+                            if MEI_ALL[j].get(edition) is not None}
+                    OECDReport.write_documentation(
+                        data, variables, names, cats,
+                        _output(doc_path, 'MEI_Documentation_' + str(edition) + '.tex'),
+                        'Main Economic Indicatiors')
+
+            stages['doc_MEI'] = (doc_MEI, ['codes_MEI'] + ['?fetch_MEI_' + str(v) for v in variables])
+
+    # ================= Business Tendency and Consumer Opinion Surveys
+    if 'BTS_COS' in job:
+        spec_BTS = job['BTS_COS']
+        stages['codes_BTS_COS'] = (OECD.get_var_codes_MEI_BTS_COS, [])
+
+        def fetch_BTS_COS(codes):
+            variables = spec_BTS.get('variables') or codes[0]
+            return OECD.get_series_MEI_BTS_COS(spec_BTS['countries'], variables, spec_BTS['frequency'],
+                                               spec_BTS['start_date'], spec_BTS['end_date'])
+
+        stages['fetch_BTS_COS'] = (fetch_BTS_COS, ['codes_BTS_COS'])
+        stages['merge_BTS_COS'] = (lambda x: _add_transform(OECD.merge(x), spec_BTS.get('transform', 5)),
+                                   ['fetch_BTS_COS'])
+        if doc_path is not None:
+            def doc_BTS_COS(codes, BTS_COS):
+                keys = list(BTS_COS.keys())
+                names = OECD.get_full_names_MEI_BTS_COS(keys, codes[0], codes[1])
+                cats = [spec_BTS.get('categories', {}).get(k, '') for k in keys]
+                OECDReport.write_documentation(
+                    BTS_COS, keys, names, cats,
+                    _output(doc_path, 'BTS_COS_Documentation_' + currentDate + '.tex'),
+                    'Business Tendency and Consumer Opinion Survey')
+
+            stages['doc_BTS_COS'] = (doc_BTS_COS, ['codes_BTS_COS', 'fetch_BTS_COS'])
+
+    # ================= Interest Rates
+    if 'MEI_FIN' in job:
+        spec_IR = job['MEI_FIN']
+        stages['fetch_MEI_FIN'] = (lambda: OECD.get_series_MEI_FIN(
+            spec_IR['countries'], spec_IR['variables'], spec_IR['frequency'],
+            spec_IR['start_date'], spec_IR['end_date']), [])
+        stages['merge_MEI_FIN'] = (lambda x: _add_transform(OECD.merge(x), spec_IR.get('transform', 2)),
+                                   ['fetch_MEI_FIN'])
+
+    # ================= Exchange Rates
+    if 'FX' in job:
+        spec_FX = job['FX']
+        stages['fetch_FX'] = (lambda: OECD.get_series_MEI_FIN(
+            spec_FX['countries'], spec_FX.get('variables', ['CCUS']), spec_FX['frequency'],
+            spec_FX['start_date'], spec_FX['end_date']), [])
+        stages['merge_FX'] = (lambda x: OECD.merge(x), ['fetch_FX'])
+        stages['save_FX'] = (lambda FX: FX.to_csv(_output(path, 'OECD_FX.csv')), ['merge_FX'])
+
+    # ================= Merge non-vintage block and save
+    blocks = [name for name in ['merge_MEI_FIN', 'merge_BTS_COS'] if name in stages]
+
+    def merge_data(*x):
+        # Longer DataFrame first, as in merge. Blocks that failed are left out (None if all failed).
+        Data = None
+        for df in sorted([item for item in x if item is not None], key=len, reverse=True):
+            Data = df if Data is None else Data.join(df)
+        return Data
+
+    stages['merge_data'] = (merge_data, ['?' + name for name in blocks])
+    # Saved editions and shared block are not overwritten with the data of a run in which downloads failed: the
+    # save is skipped (see run_stages) and the partial results are reported in the BatchResult only
+    if 'merge_MEI' in stages:
+        stages['save_vintages'] = (lambda MEI_new, Data: OECDExport.write_vintages(
+            MEI_new, Data, path, fmt=job.get('output_format', 'csv'), n_jobs=job.get('processes'),
+            shared=job.get('shared', True)), ['!merge_MEI', '!merge_data'])
+
+    # Long table of all observations in a SQL database (only editions that are not in the database yet, which
+    # are not written if any MEI download failed)
+    if job.get('sql') is not None:
+        vintage_stages = [name for name in ['merge_MEI'] if name in stages]
+        block_stages = [name for name in ['merge_BTS_COS', 'merge_MEI_FIN', 'merge_FX'] if name in stages]
+
+        def save_sql(*x):
+            import OECDSink
+            MEI_new = x[0] if len(vintage_stages) > 0 else None
+            blocks = {name[len('merge_'):]: df for name, df in zip(block_stages, x[len(vintage_stages):])
+                      if df is not None}
+            return OECDSink.write_sql(job['sql'], MEI_new, blocks, table=job.get('sql_table', 'oecd_observations'))
+
+        stages['save_sql'] = (save_sql, ['!' + name for name in vintage_stages] +
+                              ['?' + name for name in block_stages])
+
+    # Change set of the latest edition against the previous edition (new periods, revisions, added series)
+    if 'save_vintages' in stages and job.get('changes') is not None:
+        def diff_vintages(files):
+            import OECDDiff
+            editions = OECDDiff.saved_editions(path)
+            if len(editions) < 2:
+                return None
+            folder = os.path.join(path, 'Historical_OECD', 'changes')
+            feed = os.path.join(folder, 'feed.jsonl')
+            # Change set of an edition is emitted once, and again only if the edition or the shared block was
+            # written again in this run (revised)
+            saved = OECDExport.FORMATS[job.get('output_format', 'csv')][0]
+            written = [os.path.basename(item) for item in files]
+            revised = editions[-1] + saved in written or OECDExport.SHARED_NAME + saved in written
+            if editions[-1] in OECDDiff.feed_editions(feed) and not revised:
+                return None
+            changes = OECDDiff.diff_editions(path)
+            fmt = job['changes']
+            ext = '.json' if fmt == 'json' else OECDExport.FORMATS[fmt][0]
+            OECDDiff.write_changes(changes, _output(folder, changes['new_edition'] + ext), fmt)
+            return OECDDiff.update_feed(changes, feed)
+
+        stages['diff_vintages'] = (diff_vintages, ['save_vintages'])
+
+    def save_categories():
+        import pandas as pd
+        category_all = pd.concat([_categories(job[name]) for name in ['MEI', 'BTS_COS', 'MEI_FIN'] if name in job])
+        category_all.to_csv(_output(path, 'OECD_categories.csv'))
+
+    stages['save_categories'] = (save_categories, [])
+
+    # Series attributes (unit, power code, reference period) of all downloaded series, so that they can be looked
+    # up without downloading the data again (see OECDAttributes.get_series_attributes)
+    datasets = {'MEI': 'MEI_ARCHIVE', 'BTS_COS': 'MEI_BTS_COS', 'MEI_FIN': 'MEI_FIN', 'FX': 'MEI_FIN'}
+
+    # Availability index with the series of all downloads, so that requests without results are skipped next time
+    if 'MEI' in job and job.get('availability') is not None:
+        def save_index(*x):
+            import OECDAvailability
+            OECDAvailability.save_index('MEI_ARCHIVE', job['availability'])
+
+        stages['save_index'] = (save_index, ['?' + name for name in fetch_M + fetch_Q])
+
+    def save_attributes(*x):
+        import pandas as pd
+        import OECDAttributes
+        cache_dir = job.get('attribute_cache', '.oecd_cache')
+        names = list(dict.fromkeys(datasets[name] for name in datasets if name in job))
+        for dataset in names:
+            OECDAttributes.save_attributes(dataset, cache_dir)
+        attributes_all = pd.concat([OECDAttributes.get_series_attributes(dataset) for dataset in names],
+                                   keys=names, names=['Dataset', 'Series'])
+        attributes_all.to_csv(_output(path, 'OECD_attributes.csv'))
+
+    stages['save_attributes'] = (save_attributes, ['?' + name for name in stages if name.startswith('fetch_')])
+
+    # Data structures of all datasets with codelist stages are downloaded concurrently at the start, while the
+    # first data is downloaded (codelist stages use the same download)
+    structures = {'codes_MEI': 'MEI_ARCHIVE', 'codes_BTS_COS': 'MEI_BTS_COS', 'codes_MEI_FIN': 'MEI_FIN'}
+    structure_list = [structures[name] for name in stages if name in structures]
+    if len(structure_list) > 0:
+        from OECDCodes import prefetch_structures
+        stages = dict([('prefetch_structures', (lambda: prefetch_structures(structure_list), []))] +
+                      list(stages.items()))
+
+    # Requests of the index go first (they decide what is fetched), then data, then codelists (their latency is
+    # hidden behind the data downloads)
+    for name in stages:
+        if name.startswith(('index_', 'fetch_', 'prefetch_', 'codes_')):
+            priority = -1 if name.startswith('index_') else (0 if name.startswith('fetch_') else 1)
+            stages[name] = (_with_priority(stages[name][0], priority), stages[name][1])
+
+    # Downloads are saved as checkpoints, so that a job that is run again only fetches what is missing
+    checkpoint_dir = job.get('checkpoint')
+    if checkpoint_dir is not None:
+        for name in stages:
+            if name.startswith(('fetch_', 'codes_')):
+                section = [item for item in ['MEI_FIN', 'FX', 'BTS_COS', 'MEI'] if item in name][0]
+                stages[name] = (checkpointed(stages[name][0], name, job[section], checkpoint_dir,
+                                             job.get('restart', False)), stages[name][1])
+    return stages
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='oecd-data', description='Download OECD datasets described in a job spec.')
+    parser.add_argument('job', help='job spec (.toml, .yaml or .yml)')
+    parser.add_argument('--concurrency', type=int, default=None,
+                        help='maximum number of stages running at the same time (overrides job spec)')
+    parser.add_argument('--list-stages', action='store_true', help='print stages and dependencies and exit')
+    parser.add_argument('--restart', action='store_true', help='ignore checkpoints of previous runs')
+    args = parser.parse_args(argv)
+
+    job = load_job(args.job)
+    # Request budget per host (see OECDScheduler)
+    if any(key in job for key in ['rate_limit', 'burst', 'max_per_host', 'min_rate']):
+        import OECDScheduler
+        OECDScheduler.configure(job.get('rate_limit'), job.get('burst'), job.get('max_per_host'), job.get('min_rate'))
+    if args.restart:
+        job['restart'] = True
+    stages = build_stages(job)
+    if args.list_stages:
+        for name in stages:
+            print(name + ': ' + ', '.join(stages[name][1]))
+        return 0
+    concurrency = args.concurrency or job.get('concurrency', 4)
+    batch = run_stages(stages, concurrency)
+    print(batch.summary())
+    return 0 if batch.ok else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,378 @@
+# -*- coding: utf-8 -*-
+"""
+Profiling harness for jobs of OECDJob.py. A job is run once with network access while all HTTP responses are
+recorded to a cassette, and can then be replayed offline as often as needed with the same responses. Each replay
+runs the stages one at a time and writes per stage cProfile, line level (requires line_profiler) and memory
+(tracemalloc) reports, a flamegraph in folded stack format (for flamegraph.pl or speedscope) and a summary with wall
+time, peak RSS and library versions, which is appended to a history file to compare versions.
+
+Usage: python OECDProfile.py record jobs/Hillebrand2023.toml --cassette profile/cassette
+       python OECDProfile.py replay jobs/Hillebrand2023.toml --cassette profile/cassette --out profile/run
+"""
+import os
+import sys
+import io
+import json
+import gzip
+import time
+import shutil
+import tempfile
+import pstats
+import hashlib
+import cProfile
+import argparse
+import platform
+import threading
+import tracemalloc
+from datetime import datetime
+from contextlib import contextmanager
+import OECDCodes
+import OECDJob
+
+# Kernels profiled line by line if line_profiler is installed (module.function)
+LINE_FUNCTIONS = ['OECDData._observations', 'OECDData.first_release', 'OECDData._to_frame', 'OECDData._all_releases',
+                  'OECDData.merge_MEI_Vintage', 'OECDAttributes.decode', 'OECDReport.write_vintage_documentation',
+                  'OECDExport.write_vintages']
+
+# =============== Recording and replay of HTTP traffic
+class _Response:
+    # Recorded response with the parts of requests.Response used by OECDCodes.request
+    def __init__(self, status_code, headers, content):
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+
+    def json(self):
+        return json.loads(self.content)
+
+    def iter_content(self, chunk_size=1 << 20):
+        for i in range(0, len(self.content), chunk_size):
+            yield self.content[i:i + chunk_size]
+
+    def close(self):
+        pass
+
+class _NoException(Exception):
+    # Never raised: replayed requests do not fail with connection errors
+    pass
+
+class MissingResponseError(OECDCodes.RequestError):
+    # Request of a replay is not in the cassette (the job or the code changed since the recording). Stages fail
+    # with it like with any other failed request and it is not retried.
+    def __init__(self, url):
+        super().__init__('Error: No recorded response for ' + url + '. Record the job again.', url=url)
+
+class Cassette:
+    # Folder with recorded responses: index.json (URL -> status, headers, body file) and gzip compressed bodies
+
+    def __init__(self, folder):
+        self.folder = folder
+        self._lock = threading.Lock()
+        file = os.path.join(folder, 'index.json')
+        self.index = {'recorded': None, 'responses': {}}
+        if os.path.exists(file):
+            with open(file) as f:
+                self.index = json.load(f)
+
+    def _key(self, url):
+        return hashlib.sha1(url.encode()).hexdigest()
+
+    def save(self, url, response):
+        # Save response (full body, also if it was streamed)
+        key = self._key(url)
+        os.makedirs(self.folder, exist_ok=True)
+        with gzip.open(os.path.join(self.folder, key + '.gz'), 'wb') as f:
+            f.write(response.content)
+        headers = {k: v for k, v in response.headers.items() if k in ['Retry-After', 'Content-Type']}
+        with self._lock:
+            self.index['responses'][key] = {'url': url, 'status': response.status_code, 'headers': headers}
+            self.index['recorded'] = self.index['recorded'] or datetime.today().strftime('%Y-%m')
+            temp_file = os.path.join(self.folder, 'index.json.tmp')
+            with open(temp_file, 'w') as f:
+                json.dump(self.index, f, indent=1)
+            os.replace(temp_file, os.path.join(self.folder, 'index.json'))
+
+    def load(self, url):
+        key = self._key(url)
+        if key not in self.index['responses']:
+            raise MissingResponseError(url)
+        item = self.index['responses'][key]
+        with gzip.open(os.path.join(self.folder, key + '.gz'), 'rb') as f:
+            return _Response(item['status'], dict(item['headers']), f.read())
+
+class _Recorder:
+    # Sends requests with requests and saves responses to cassette
+    def __init__(self, cassette):
+        import requests
+        self.cassette = cassette
+        self.requests = requests
+        self.RequestException = requests.RequestException
+
+    def get(self, url, params=None, headers=None, stream=False):
+        # Full responses are recorded, so ranges are not requested
+        headers = {k: v for k, v in (headers or {}).items() if k != 'Range'}
+        response = self.requests.get(url=url, params=params, headers=headers)
+        self.cassette.save(url, response)
+        return response
+
+class _Player:
+    # Returns recorded responses
+    RequestException = _NoException
+
+    def __init__(self, cassette):
+        self.cassette = cassette
+
+    def get(self, url, params=None, headers=None, stream=False):
+        return self.cassette.load(url)
+
+@contextmanager
+def transport(client):
+    # Send the requests of OECDCodes.request with client
+    old = OECDCodes.rq
+    OECDCodes.rq = client
+    try:
+        yield
+    finally:
+        OECDCodes.rq = old
+
+# =============== Profiling of stages
+class _Sampler(threading.Thread):
+    # Samples the call stacks of threads running stages and counts folded stacks (stage;file:function;...)
+    def __init__(self, interval=0.005):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.active = {}
+        self.counts = {}
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            frames = sys._current_frames()
+            for thread_id, stage in list(self.active.items()):
+                frame = frames.get(thread_id)
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(os.path.basename(code.co_filename).replace('.py', '') + ':' + code.co_name)
+                    frame = frame.f_back
+                key = ';'.join([stage] + stack[::-1])
+                self.counts[key] = self.counts.get(key, 0) + 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+    def write(self, file):
+        # Folded stacks, one line per stack with number of samples
+        with open(file, 'w') as f:
+            for key, count in sorted(self.counts.items()):
+                f.write(key + ' ' + str(count) + '\n')
+
+def _line_profiler(functions):
+    # LineProfiler for functions (module.function), None if line_profiler is not installed
+    try:
+        from line_profiler import LineProfiler
+    except ImportError:
+        return None
+    import importlib
+    profiler = LineProfiler()
+    for name in functions:
+        module, function = name.rsplit('.', 1)
+        profiler.add_function(getattr(importlib.import_module(module), function))
+    return profiler
+
+def _profiled(name, function, out, report, sampler, memory, lines):
+    # Stage function that writes cProfile, line and memory reports of the stage to out
+    def run(*args):
+        profile = cProfile.Profile()
+        line_profiler = _line_profiler(lines) if lines else None
+        if memory:
+            tracemalloc.reset_peak()
+            start_memory = tracemalloc.get_traced_memory()[0]
+        sampler.active[threading.get_ident()] = name
+        start = time.perf_counter()
+        profile.enable()
+        if line_profiler is not None:
+            line_profiler.enable_by_count()
+        try:
+            return function(*args)
+        finally:
+            if line_profiler is not None:
+                line_profiler.disable_by_count()
+            profile.disable()
+            wall = time.perf_counter() - start
+            sampler.active.pop(threading.get_ident(), None)
+
+            profile.dump_stats(os.path.join(out, name + '.prof'))
+            stream = io.StringIO()
+            pstats.Stats(profile, stream=stream).sort_stats('cumulative').print_stats(30)
+            with open(os.path.join(out, name + '.txt'), 'w') as f:
+                f.write(stream.getvalue())
+            if line_profiler is not None:
+                with open(os.path.join(out, name + '.lines.txt'), 'w') as f:
+                    line_profiler.print_stats(stream=f, stripzeros=True)
+            report[name] = {'wall': wall}
+            if memory:
+                current, peak = tracemalloc.get_traced_memory()
+                report[name]['peak_memory'] = peak - start_memory
+                report[name]['memory'] = current - start_memory
+                top = tracemalloc.take_snapshot().statistics('lineno')[:10]
+                with open(os.path.join(out, name + '.memory.txt'), 'w') as f:
+                    f.write('Peak: %.1f MiB\n' % ((peak - start_memory) / 2 ** 20))
+                    f.writelines(str(item) + '\n' for item in top)
+
+    return run
+
+def _versions():
+    # Versions of Python and libraries used by the job
+    from importlib import metadata
+    versions = {'python': platform.python_version()}
+    for name in ['numpy', 'pandas', 'lxml', 'requests']:
+        try:
+            versions[name] = metadata.version(name)
+        except metadata.PackageNotFoundError:
+            versions[name] = None
+    return versions
+
+def _peak_rss():
+    # Peak resident set size of the process in MiB (None where resource is not available)
+    try:
+        import resource
+    except ImportError:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Bytes on macOS, kilobytes on Linux
+    return rss / 2 ** 20 if sys.platform == 'darwin' else rss / 2 ** 10
+
+def _clear_caches():
+    # Forget data structures, attribute codes and availability index of earlier runs in this process, so that
+    # record and replay send the same requests
+    import OECDAttributes
+    import OECDAvailability
+    OECDCodes._structures.clear()
+    OECDAttributes._lookups.clear()
+    OECDAttributes._series.clear()
+    OECDAvailability._index.clear()
+
+def _offline_job(job, out, recorded):
+    # Job writing to out, without checkpoints, database and caches of earlier runs, and with the editions of the
+    # recording (recorded: month of recording in YYYY-MM format)
+    job = dict(job)
+    job['path'] = os.path.join(out, 'Data')
+    if job.get('documentation') is not None:
+        job['documentation'] = os.path.join(out, 'Doc')
+    for key in ['checkpoint', 'sql']:
+        job.pop(key, None)
+    # The attribute cache defaults to .oecd_cache and is therefore always redirected
+    job['attribute_cache'] = os.path.join(out, 'cache')
+    if 'availability' in job:
+        job['availability'] = os.path.join(out, 'cache')
+    # Without an end edition, editions up to today are requested: use the month of the recording instead
+    if 'MEI' in job and recorded is not None:
+        job['MEI'] = dict(job['MEI'])
+        job['MEI'].setdefault('end_edition', recorded[0:4] + '-' + recorded[5:7])
+    return job
+
+def record(job_file, cassette_dir, concurrency=None):
+    # Run job with network access and save all responses to cassette_dir. The job runs as it is replayed (see
+    # _offline_job): with empty caches, without database and with its output in a temporary folder that is
+    # removed afterwards, so that every request of the replay is recorded and no output of the job is changed.
+
+    # =============== OUTPUT
+    # BatchResult of job (see OECDJob.run_stages)
+
+    cassette = Cassette(cassette_dir)
+    recorded = cassette.index.get('recorded') or datetime.today().strftime('%Y-%m')
+    out = tempfile.mkdtemp(prefix='oecd-record-')
+    try:
+        job = _offline_job(OECDJob.load_job(job_file), out, recorded)
+        _clear_caches()
+        with transport(_Recorder(cassette)):
+            stages = OECDJob.build_stages(job)
+            batch = OECDJob.run_stages(stages, concurrency or job.get('concurrency', 4))
+    finally:
+        shutil.rmtree(out, ignore_errors=True)
+    return batch
+
+def replay(job_file, cassette_dir, out, memory=True, lines=LINE_FUNCTIONS, history=None):
+    # Run job offline with the responses in cassette_dir, one stage at a time, and write reports to out
+
+    # =============== INPUT
+    # job_file: job spec, see OECDJob.load_job
+    # cassette_dir: folder of recording, see record
+    # out: folder for reports and output of job
+    # memory: True to trace memory allocations (slower)
+    # lines: functions (module.function) profiled line by line if line_profiler is installed, [] for none
+    # history: file the summary is appended to (json lines), None for out/../history.jsonl
+
+    # =============== OUTPUT
+    # Summary: wall time, peak RSS, versions and report per stage
+
+    cassette = Cassette(cassette_dir)
+    os.makedirs(out, exist_ok=True)
+    job = _offline_job(OECDJob.load_job(job_file), out, cassette.index.get('recorded'))
+    _clear_caches()
+
+    import OECDScheduler
+    old_scheduler = OECDScheduler.scheduler
+    # Replayed requests are not rate limited
+    OECDScheduler.scheduler = OECDScheduler.Scheduler(rate=1e9, burst=1e9, max_per_host=1e9)
+    report = {}
+    sampler = _Sampler()
+    if memory:
+        tracemalloc.start()
+    sampler.start()
+    start = time.perf_counter()
+    try:
+        with transport(_Player(cassette)):
+            stages = OECDJob.build_stages(job)
+            stages = {name: (_profiled(name, function, out, report, sampler, memory, lines), deps)
+                      for name, (function, deps) in stages.items()}
+            batch = OECDJob.run_stages(stages, 1)
+    finally:
+        wall = time.perf_counter() - start
+        sampler.stop()
+        if memory:
+            tracemalloc.stop()
+        OECDScheduler.scheduler = old_scheduler
+    sampler.write(os.path.join(out, 'flamegraph.folded'))
+
+    summary = {'job': os.path.basename(job_file), 'date': datetime.today().strftime('%Y-%m-%d %H:%M:%S'),
+               'wall': wall, 'peak_rss_mib': _peak_rss(), 'versions': _versions(), 'stages': report,
+               'failed': {name: str(error) for name, error in batch.failures.items()}}
+    with open(os.path.join(out, 'summary.json'), 'w') as f:
+        json.dump(summary, f, indent=1)
+    if history is None:
+        history = os.path.join(os.path.dirname(os.path.abspath(out)), 'history.jsonl')
+    with open(history, 'a') as f:
+        f.write(json.dumps(summary) + '\n')
+    return summary
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='oecd-profile', description='Record and replay jobs of OECDJob.py.')
+    parser.add_argument('mode', choices=['record', 'replay'])
+    parser.add_argument('job', help='job spec (.toml, .yaml or .yml)')
+    parser.add_argument('--cassette', default=os.path.join('profile', 'cassette'), help='folder of recording')
+    parser.add_argument('--out', default=None, help='folder for reports (replay), default profile/<date>')
+    parser.add_argument('--no-memory', action='store_true', help='do not trace memory allocations')
+    parser.add_argument('--lines', nargs='*', default=LINE_FUNCTIONS,
+                        help='functions (module.function) profiled line by line (requires line_profiler)')
+    parser.add_argument('--history', default=None, help='file the summary is appended to')
+    args = parser.parse_args(argv)
+
+    if args.mode == 'record':
+        batch = record(args.job, args.cassette)
+        print(batch.summary())
+        return 0 if batch.ok else 1
+    out = args.out or os.path.join('profile', datetime.today().strftime('%Y%m%d-%H%M%S'))
+    summary = replay(args.job, args.cassette, out, not args.no_memory, args.lines, args.history)
+    for name, item in summary['stages'].items():
+        print('%-24s %8.2f s' % (name, item['wall']) +
+              ('' if 'peak_memory' not in item else '  %8.1f MiB' % (item['peak_memory'] / 2 ** 20)))
+    print('Total %.2f s, peak RSS %s MiB' % (summary['wall'], summary['peak_rss_mib']))
+    for name, error in summary['failed'].items():
+        print('Failed: ' + name + ': ' + error)
+    return 0 if len(summary['failed']) == 0 else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+"""
+Functions to build exchange rate (CCUS) and interest rate panels from the monthly MEI_FIN data (e.g.
+Data/OECD_FX.csv) without downloading the data again: conversion to quarterly or annual frequency
+(end-of-period or period-average), cross rates against any base currency and a cache of derived panels.
+Please consult documentation of individual functions below for further information.
+"""
+import os
+import pickle
+import hashlib
+from OECDCodes import lazy_import
+
+pd = lazy_import('pandas')
+np = lazy_import('numpy')
+
+def read_rates(source):
+    # Read monthly panel (file saved by getOECDData.py or DataFrame), dropping the Transform row
+
+    # =============== INPUT
+    # source: path to csv file or DataFrame with dates in YYYY-MM format as index
+
+    if isinstance(source, str):
+        df = pd.read_csv(source, index_col=0)
+    else:
+        df = source
+    df = df.drop(index='Transform', errors='ignore')
+    df.index = pd.PeriodIndex(df.index.astype(str), freq='M')
+    return df.sort_index().astype(float)
+
+def resample(df, frequency, how='last', complete=True):
+    # Convert monthly panel to lower frequency, vectorized over all columns
+
+    # =============== INPUT
+    # df: DataFrame with monthly PeriodIndex (see read_rates)
+    # frequency: 'Q' for quarterly, 'A' for annual
+    # how: 'last' for end of period (last observation in period), 'first' for beginning of period,
+    #      'mean' for period average
+    # complete: True to drop periods that do not contain all months (e.g. the current quarter)
+
+    # =============== OUTPUT
+    # DataFrame with dates in YYYY-QQ (2000-Q1) or YYYY (2000) format as index
+
+    freq = {'Q': 'Q', 'A': 'Y', 'Y': 'Y'}[frequency]
+    months = {'Q': 3, 'Y': 12}[freq]
+    target = df.index.asfreq(freq)
+    # Start of each period (index is sorted)
+    codes = np.asarray(target.asi8)
+    starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+
+    X = df.to_numpy(dtype=float)
+    valid = ~np.isnan(X)
+    if how == 'mean':
+        total = np.add.reduceat(np.where(valid, X, 0), starts, axis=0)
+        count = np.add.reduceat(valid, starts, axis=0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            values = np.where(count > 0, total / count, np.nan)
+    elif how in ['last', 'first']:
+        rows = np.where(valid, np.arange(len(X))[:, None], -1 if how == 'last' else len(X))
+        if how == 'last':
+            pos = np.maximum.reduceat(rows, starts, axis=0)
+        else:
+            pos = np.minimum.reduceat(rows, starts, axis=0)
+        found = (pos >= 0) & (pos < len(X))
+        values = np.where(found, X[np.clip(pos, 0, len(X) - 1), np.arange(X.shape[1])], np.nan)
+    else:
+        raise ValueError("how must be 'last', 'first' or 'mean'")
+
+    index = target[starts]
+    if complete:
+        # Months in each period, counted from the first month of the period
+        keep = np.diff(np.r_[starts, len(X)]) == months
+        keep &= np.asarray(df.index[starts].asi8 - index.asfreq('M', how='start').asi8) == 0
+        values, index = values[keep], index[keep]
+
+    fmt = '%Y-Q%q' if freq == 'Q' else '%Y'
+    return pd.DataFrame(values, index=index.strftime(fmt), columns=df.columns)
+
+def cross_rates(df, base, variable='CCUS'):
+    # Exchange rates against base currency from rates against the US dollar
+
+    # =============== INPUT
+    # df: DataFrame with columns COUNTRY_CCUS (national currency per US dollar)
+    # base: country of base currency (e.g. 'EA19', 'GBR')
+    # variable: name of variable in columns
+
+    # =============== OUTPUT
+    # DataFrame with columns COUNTRY_CC<base> (national currency per unit of base currency), including the
+    # US dollar (USA_CC<base>)
+
+    suffix = '_' + variable
+    columns = [item for item in df.columns if item.endswith(suffix)]
+    countries = [item[:-len(suffix)] for item in columns]
+    if base not in countries:
+        raise ValueError('No exchange rate for base currency ' + base)
+    X = df[columns].to_numpy(dtype=float)
+    base_rate = X[:, [countries.index(base)]]
+    values = np.hstack([X / base_rate, 1 / base_rate])
+    names = [c + '_CC' + base for c in countries + ['USA']]
+    out = pd.DataFrame(values, index=df.index, columns=names)
+    return out.drop(columns=base + '_CC' + base)
+
+def _cache_key(source, params):
+    # Key of derived panel: file name, size and modification time (or content of DataFrame) and parameters
+    if isinstance(source, str):
+        stat = os.stat(source)
+        text = os.path.abspath(source) + '|' + str(stat.st_size) + '|' + str(stat.st_mtime_ns)
+    else:
+        text = str(pd.util.hash_pandas_object(source).sum()) + '|' + '|'.join(source.columns.astype(str))
+    return hashlib.sha1((text + '|' + repr(params)).encode()).hexdigest()
+
+def get_rate_panel(source, frequency='M', how='last', base=None, variable='CCUS', complete=True,
+                   cache_dir='.oecd_cache'):
+    # Exchange rate or interest rate panel at the requested frequency, cached on disk
+
+    # =============== INPUT
+    # source: path to csv file (e.g. Data/OECD_FX.csv) or DataFrame with monthly data
+    # frequency: 'M' for monthly, 'Q' for quarterly, 'A' for annual
+    # how: 'last' (end of period), 'first' or 'mean' (period average), see resample
+    # base: base currency for cross rates (e.g. 'EA19'), None to keep rates against the US dollar
+    # variable: exchange rate variable used for cross rates
+    # complete: drop incomplete periods, see resample
+    # cache_dir: folder for derived panels, None to disable cache. Panels are recomputed if the source changes.
+
+    params = (frequency, how, base, variable, complete)
+    if cache_dir is not None:
+        file = os.path.join(cache_dir, 'rates_' + _cache_key(source, params) + '.pkl')
+        if os.path.exists(file):
+            with open(file, 'rb') as f:
+                return pickle.load(f)
+
+    df = read_rates(source)
+    if base is not None:
+        df = cross_rates(df, base, variable)
+    if frequency == 'M':
+        panel = df.copy()
+        panel.index = panel.index.strftime('%Y-%m')
+    else:
+        panel = resample(df, frequency, how, complete)
+
+    if cache_dir is not None:
+        os.makedirs(cache_dir, exist_ok=True)
+        temp_file = file + '.tmp'
+        with open(temp_file, 'wb') as f:
+            pickle.dump(panel, f)
+        os.replace(temp_file, file)
+    return panel
@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+"""
+Functions to write the LaTeX documentation of the OECD datasets (OECD_Doc). First and last valid periods of all
+series and editions are computed in one pass over the vintage panel and tables are written to file page by page.
+Please consult documentation of individual functions below for further information.
+"""
+import os
+import re
+import json
+import hashlib
+import numpy as np
+import OECDData as OECD
+
+def valid_range(values):
+    # First and last valid period of every series in every edition
+
+    # =============== INPUT
+    # values: array of shape (editions, periods, series), see OECDData.vintage_panel
+
+    # =============== OUTPUT
+    # first, last: integer arrays of shape (editions, series) with position of first and last valid period,
+    #              -1 if the series has no observations in an edition
+
+    valid = ~np.isnan(values)
+    T = valid.shape[1]
+    has_obs = valid.any(axis=1)
+    first = np.where(has_obs, valid.argmax(axis=1), -1)
+    last = np.where(has_obs, T - 1 - valid[:, ::-1, :].argmax(axis=1), -1)
+    return first, last
+
+def escape(text):
+    # Escape LaTeX special characters
+    return re.sub(r'([&%$#_{}])|\\', lambda m: '\\' + m.group(1) if m.group(1) else '\\textbackslash{}', text)
+
+def _layout(series, row_codes):
+    # Position of each series in the documentation table (row = variable, column = country)
+    codes = [str(item) for item in row_codes]
+    series_country = [item.split('_', 1)[0] for item in series]
+    series_variable = [item.split('_', 1)[1] if '_' in item else '' for item in series]
+    countries = list(dict.fromkeys(series_country))
+    country_id = {c: i for i, c in enumerate(countries)}
+    code_id = {c: i for i, c in enumerate(codes)}
+    layout = {'countries': countries, 'shape': (len(codes), len(countries)),
+              'row': np.array([code_id.get(v, -1) for v in series_variable], dtype=int),
+              'col': np.array([country_id[c] for c in series_country], dtype=int)}
+    return layout
+
+def _cells(first, last, periods, layout, span):
+    # Text of each table cell for one edition, vectorized over series
+    periods = np.asarray(periods, dtype=object)
+    # Series whose variable is not documented are ignored
+    use = (layout['row'] >= 0) & (last >= 0)
+    text = 'to ' + periods[last[use]]
+    if span:
+        text = periods[first[use]] + ' ' + text
+    grid = np.full(layout['shape'], 'N/A', dtype=object)
+    present = np.zeros(layout['shape'], dtype=bool)
+    grid[layout['row'][use], layout['col'][use]] = text
+    present[layout['row'][use], layout['col'][use]] = True
+    return grid, present
+
+def _page_key(grid, present, row_names, categories, countries):
+    # Hash of what render_table writes for a table: cells and labels of the rows and columns with observations
+    rows = np.flatnonzero(present.any(axis=1))
+    cols = np.flatnonzero(present.any(axis=0))
+    content = [[str(row_names[i]) for i in rows], [str(categories[i]) for i in rows], [countries[j] for j in cols],
+               grid[np.ix_(rows, cols)].tolist()]
+    return hashlib.sha1(json.dumps(content).encode()).hexdigest()
+
+def render_table(f, grid, present, row_names, categories, countries, caption, row_title):
+    # Write one table to the open file f, keeping only variables and countries with observations
+    rows = np.flatnonzero(present.any(axis=1))
+    cols = np.flatnonzero(present.any(axis=0))
+    f.write('\\begin{table}\n\\centering\n\\caption{' + escape(caption) + '}\n')
+    f.write('\\begin{tabular}{@{}ll' + 'Y' * len(cols) + '@{}}\n\\toprule\n')
+    f.write(' & '.join([row_title, 'Cat.'] + [countries[j] for j in cols]) + ' \\\\\n\\midrule\n')
+    for i in rows:
+        line = [escape(str(row_names[i])), str(categories[i])] + list(grid[i, cols])
+        f.write(' & '.join(line) + ' \\\\\n')
+    f.write('\\bottomrule\n\\end{tabular}\n\\end{table}\n')
+
+def _preamble(f, title, author, date):
+    f.write('\\documentclass{article}\n\\usepackage[utf8]{inputenc}\n\\usepackage{booktabs}\n'
+            '\\usepackage{array}\n\\usepackage{pdflscape}\n'
+            '\\newcolumntype{Y}{>{\\centering\\arraybackslash}p{1.6cm}}\n')
+    f.write('\\title{' + title + '}\n\\author{' + author + '}\n\\date{' + date + '}\n')
+    f.write('\\begin{document}\n\\maketitle\n')
+
+def write_vintage_documentation(MEI_ALL, variable_list, variable_names, category_list, file, date,
+                                page_dir=None, author='Lars Spreng'):
+    # Write documentation of all editions of the MEI Archive (one table per edition)
+
+    # =============== INPUT
+    # MEI_ALL: list of dicts with editions as keys (output of get_series_all_releases_MEIArchive per variable)
+    # variable_list: variable codes (rows of the tables)
+    # variable_names: variable descriptions
+    # category_list: category of each variable
+    # file: output .tex file
+    # date: date shown on the title page
+    # page_dir: folder to keep the rendered table of each edition. Only editions that are new or whose table
+    #           changed since the last run are rendered again. None to render all.
+
+    values, editions, periods, series = OECD.vintage_panel(MEI_ALL)
+    first, last = valid_range(values)
+    del values
+    layout = _layout(series, variable_list)
+
+    index = {}
+    if page_dir is not None:
+        os.makedirs(page_dir, exist_ok=True)
+        index_file = os.path.join(page_dir, 'index.json')
+        if os.path.exists(index_file):
+            with open(index_file) as f:
+                index = json.load(f)
+
+    pages = []
+    for e in range(len(editions)):
+        if page_dir is None:
+            pages.append((e, None))
+            continue
+        # A page only changes if its own cells or the labels of its rows and columns change
+        grid, present = _cells(first[e], last[e], periods, layout, span=False)
+        key = _page_key(grid, present, variable_names, category_list, layout['countries'])
+        page = os.path.join(page_dir, str(editions[e]) + '.tex')
+        if index.get(str(editions[e])) != key or not os.path.exists(page):
+            with open(page, 'w') as f:
+                render_table(f, grid, present, variable_names, category_list, layout['countries'],
+                             'Edition: ' + str(editions[e]), 'Var.')
+            index[str(editions[e])] = key
+        pages.append((e, page))
+
+    if page_dir is not None:
+        with open(index_file, 'w') as f:
+            json.dump(index, f, indent=1)
+
+    with open(file, 'w') as f:
+        _preamble(f, 'OECD MEI Documentation', author, date)
+        f.write('\\section{MEI Data}\n\\begin{landscape}\n')
+        for e, page in pages:
+            f.write('\\clearpage\n')
+            if page is None:
+                grid, present = _cells(first[e], last[e], periods, layout, span=False)
+                render_table(f, grid, present, variable_names, category_list, layout['countries'],
+                             'Edition: ' + str(editions[e]), 'Var.')
+            else:
+                with open(page) as p:
+                    f.write(p.read())
+        f.write('\\end{landscape}\n\\end{document}\n')
+
+def write_documentation(data, variable_list, variable_names, category_list, file, caption):
+    # Write a single documentation table with the first and last period of each series
+
+    # =============== INPUT
+    # data: dict with variables as keys and DataFrames as values (e.g. output of get_series_MEI_BTS_COS,
+    #       or one edition of MEI_ALL)
+    # variable_list: variable codes (rows of the table)
+    # variable_names: variable descriptions
+    # category_list: category of each variable
+    # file: output .tex file
+    # caption: table caption
+
+    values, editions, periods, series = OECD.vintage_panel([{0: df} for df in data.values()])
+    first, last = valid_range(values)
+    layout = _layout(series, variable_list)
+    grid, present = _cells(first[0], last[0], periods, layout, span=True)
+    with open(file, 'w') as f:
+        render_table(f, grid, present, variable_names, category_list, layout['countries'], caption, 'Series')
@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+"""
+Scheduler for the requests to the OECD servers (see OECDCodes.request). Each host has a token bucket (requests per
+second with bursts), a limit of concurrent requests and a queue in which requests with a lower priority number go
+first. The rate is halved when the server answers 429 Too Many Requests or 503 Service Unavailable, requests wait as
+long as the Retry-After header asks, and the rate grows back after successful requests. Please consult
+documentation of individual functions below for further information.
+"""
+import time
+import heapq
+import itertools
+import threading
+from contextlib import contextmanager
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+
+class _Host:
+    # State of one host: token bucket, queue of waiting requests, running requests and pause (Retry-After)
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.tokens = burst
+        self.time = time.monotonic()
+        self.queue = []
+        self.active = 0
+        self.paused_until = 0.0
+
+class Scheduler:
+    # Token bucket per host with priorities and concurrency limit
+
+    # =============== INPUT
+    # rate: requests per second per host
+    # burst: maximum number of requests sent at once after a pause (size of bucket)
+    # max_per_host: maximum number of concurrent requests per host
+    # min_rate: lowest rate after repeated 429 responses
+
+    def __init__(self, rate=2.0, burst=4, max_per_host=4, min_rate=0.05):
+        self.max_rate = rate
+        self.burst = burst
+        self.max_per_host = max_per_host
+        self.min_rate = min_rate
+        self._hosts = {}
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+
+    def _host(self, host):
+        if host not in self._hosts:
+            self._hosts[host] = _Host(self.max_rate, self.burst)
+        return self._hosts[host]
+
+    def _refill(self, state, now):
+        state.tokens = min(self.burst, state.tokens + (now - state.time) * state.rate)
+        state.time = now
+
+    @contextmanager
+    def slot(self, url, priority=None):
+        # Wait until the request may be sent: first in the queue of its host, a token available, fewer than
+        # max_per_host requests running and no pause requested by the server
+        host = urlsplit(url).netloc
+        if priority is None:
+            priority = current_priority()
+        with self._cond:
+            state = self._host(host)
+            item = (priority, next(self._seq))
+            heapq.heappush(state.queue, item)
+            while True:
+                now = time.monotonic()
+                self._refill(state, now)
+                wait = None
+                if state.queue[0] == item and state.active < self.max_per_host:
+                    if now < state.paused_until:
+                        wait = state.paused_until - now
+                    elif state.tokens >= 1:
+                        break
+                    else:
+                        wait = (1 - state.tokens) / state.rate
+                self._cond.wait(wait)
+            heapq.heappop(state.queue)
+            state.tokens -= 1
+            state.active += 1
+            self._cond.notify_all()
+        try:
+            yield
+        finally:
+            with self._cond:
+                state.active -= 1
+                self._cond.notify_all()
+
+    def pause(self, url, seconds):
+        # Send no requests to the host of url for seconds
+        with self._cond:
+            state = self._host(urlsplit(url).netloc)
+            state.paused_until = max(state.paused_until, time.monotonic() + seconds)
+            self._cond.notify_all()
+
+    def feedback(self, url, status_code, retry_after=None):
+        # Adapt rate of host to response: halve it after 429 or 503 (and pause for Retry-After seconds), increase
+        # it again after a successful response
+
+        # =============== OUTPUT
+        # Seconds to wait before the request is sent again (Retry-After), None if not given
+
+        delay = parse_retry_after(retry_after)
+        with self._cond:
+            state = self._host(urlsplit(url).netloc)
+            if status_code in [429, 503]:
+                state.rate = max(self.min_rate, state.rate / 2)
+            elif status_code < 400:
+                state.rate = min(self.max_rate, state.rate + self.max_rate / 10)
+        if delay is not None:
+            self.pause(url, delay)
+        return delay
+
+def parse_retry_after(value):
+    # Seconds from Retry-After header (number of seconds or HTTP date), None if not given or invalid
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+# Priority of requests of the current thread (lower numbers go first)
+_local = threading.local()
+
+def current_priority():
+    return getattr(_local, 'priority', 0)
+
+@contextmanager
+def priority(value):
+    # Requests sent by the current thread inside the with block have priority value (lower numbers go first),
+    # e.g. with priority(-1): OECDData.get_series_all_releases_MEIArchive(...)
+    old = current_priority()
+    _local.priority = value
+    try:
+        yield
+    finally:
+        _local.priority = old
+
+# Scheduler used by OECDCodes.request
+scheduler = Scheduler()
+
+def configure(rate=None, burst=None, max_per_host=None, min_rate=None):
+    # Change settings of the scheduler used by OECDCodes.request (None to keep a setting)
+    global scheduler
+    scheduler = Scheduler(scheduler.max_rate if rate is None else rate,
+                          scheduler.burst if burst is None else burst,
+                          scheduler.max_per_host if max_per_host is None else max_per_host,
+                          scheduler.min_rate if min_rate is None else min_rate)
+    return scheduler
@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+"""
+Functions to load the vintages (MEI) and the non-vintage data (BTS_COS, MEI_FIN, FX) into a SQL database as one long
+table (dataset, edition, country, variable, period, value). Rows are written in batches (executemany for SQLite,
+COPY for PostgreSQL) and revised values replace existing rows (upsert). Editions that are already in the database
+are left out, so that only new editions are written. Databases are listed in SINKS. Please consult documentation of
+individual functions below for further information.
+"""
+import io
+import sqlite3
+from OECDCodes import lazy_import
+
+pd = lazy_import('pandas')
+np = lazy_import('numpy')
+
+COLUMNS = ['dataset', 'edition', 'country', 'variable', 'period', 'value']
+KEY = ['dataset', 'edition', 'country', 'variable', 'period']
+
+def long_table(data, dataset, edition=0):
+    # Long table with one row per observation, without the Transform row and missing observations
+
+    # =============== INPUT
+    # data: dict of DataFrames with editions as keys (e.g. output of merge_MEI_Vintage) or one DataFrame
+    # dataset: name of dataset saved in column dataset (e.g. MEI)
+    # edition: edition of a single DataFrame (0 for data without vintages)
+
+    # =============== OUTPUT
+    # DataFrame with columns dataset, edition, country, variable, period and value. Columns of the input
+    # (COUNTRY_VARIABLE) are split at the first underscore.
+
+    if not isinstance(data, dict):
+        data = {edition: data}
+    parts = []
+    for e, df in data.items():
+        if df is None:
+            continue
+        df = df.drop(index='Transform', errors='ignore')
+        X = df.to_numpy(dtype=float)
+        rows, cols = np.nonzero(~np.isnan(X))
+        names = [str(item).split('_', 1) for item in df.columns]
+        country = np.array([item[0] for item in names], dtype=object)
+        variable = np.array([item[1] if len(item) > 1 else '' for item in names], dtype=object)
+        parts.append(pd.DataFrame({'dataset': dataset, 'edition': int(e), 'country': country[cols],
+                                   'variable': variable[cols],
+                                   'period': np.asarray(df.index.astype(str), dtype=object)[rows],
+                                   'value': X[rows, cols]}))
+    if len(parts) == 0:
+        return pd.DataFrame(columns=COLUMNS)
+    return pd.concat(parts, ignore_index=True)
+
+def _create_sql(table):
+    # Table with primary key for upserts and index for queries by series
+    return ["CREATE TABLE IF NOT EXISTS " + table + " (dataset TEXT NOT NULL, edition INTEGER NOT NULL, "
+            "country TEXT NOT NULL, variable TEXT NOT NULL, period TEXT NOT NULL, value DOUBLE PRECISION, "
+            "PRIMARY KEY (" + ', '.join(KEY) + "))",
+            "CREATE INDEX IF NOT EXISTS " + table + "_series ON " + table + " (dataset, country, variable, period)"]
+
+def _upsert_sql(table, source, placeholders):
+    # Insert rows, replacing the value of rows that already exist (revisions)
+    if source is None:
+        values = "VALUES (" + ', '.join([placeholders] * len(COLUMNS)) + ")"
+    else:
+        values = "SELECT " + ', '.join(COLUMNS) + " FROM " + source
+    return ("INSERT INTO " + table + " (" + ', '.join(COLUMNS) + ") " + values +
+            " ON CONFLICT (" + ', '.join(KEY) + ") DO UPDATE SET value = excluded.value")
+
+# =============== SQLite
+def _connect_sqlite(url):
+    conn = sqlite3.connect(url[len('sqlite:///'):] if url.startswith('sqlite:///') else url)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    return conn
+
+def _load_sqlite(conn, table, df, batch_size):
+    sql = _upsert_sql(table, None, '?')
+    with conn:
+        for start in range(0, len(df), batch_size):
+            batch = df.iloc[start:start + batch_size]
+            conn.executemany(sql, zip(batch['dataset'], batch['edition'].astype(int).tolist(), batch['country'],
+                                      batch['variable'], batch['period'], batch['value'].tolist()))
+
+# =============== PostgreSQL (requires psycopg2)
+def _connect_postgresql(url):
+    try:
+        import psycopg2
+    except ImportError:
+        raise ImportError('psycopg2 is required to write to PostgreSQL. Install psycopg2 or use SQLite.')
+    return psycopg2.connect(url)
+
+def _load_postgresql(conn, table, df, batch_size):
+    # COPY each batch into a temporary table and upsert from there
+    sql = _upsert_sql(table, 'oecd_staging', '%s')
+    with conn:
+        with conn.cursor() as cur:
+            cur.execute("CREATE TEMPORARY TABLE IF NOT EXISTS oecd_staging (LIKE " + table + " INCLUDING DEFAULTS) "
+                        "ON COMMIT DELETE ROWS")
+            for start in range(0, len(df), batch_size):
+                buffer = io.StringIO()
+                df.iloc[start:start + batch_size].to_csv(buffer, index=False, header=False, columns=COLUMNS)
+                buffer.seek(0)
+                cur.copy_expert("COPY oecd_staging (" + ', '.join(COLUMNS) + ") FROM STDIN WITH CSV", buffer)
+                cur.execute(sql)
+                cur.execute("TRUNCATE oecd_staging")
+
+# Databases: URL scheme -> (connect, load)
+SINKS = {
+    'sqlite': (_connect_sqlite, _load_sqlite),
+    'postgresql': (_connect_postgresql, _load_postgresql),
+    'postgres': (_connect_postgresql, _load_postgresql),
+}
+
+def _scheme(url):
+    # Scheme of url (scheme://...), sqlite for file names (also Windows paths like C:\Data\OECD.db)
+    scheme = url.split('://', 1)[0] if '://' in url else 'sqlite'
+    if scheme not in SINKS:
+        raise ValueError('Unknown database ' + scheme + '. Choose one of ' + ', '.join(SINKS))
+    return scheme
+
+def connect(url):
+    # Connect to database, e.g. sqlite:///Data/OECD.db or postgresql://user@host/db (file name for SQLite)
+    return SINKS[_scheme(url)][0](url)
+
+def create_table(conn, table='oecd_observations'):
+    # Create table and indexes if they do not exist
+    cur = conn.cursor()
+    for sql in _create_sql(table):
+        cur.execute(sql)
+    conn.commit()
+
+def loaded_editions(conn, dataset, table='oecd_observations'):
+    # Editions of dataset in the database
+    cur = conn.cursor()
+    cur.execute("SELECT DISTINCT edition FROM " + table + " WHERE dataset = " +
+                ('?' if isinstance(conn, sqlite3.Connection) else '%s'), (dataset,))
+    return set(row[0] for row in cur.fetchall())
+
+def write_sql(url, MEI_new=None, blocks={}, table='oecd_observations', new_only=True, batch_size=100000):
+    # Load vintages and non-vintage data into database
+
+    # =============== INPUT
+    # url: database, see connect
+    # MEI_new: dict of DataFrames with editions as keys (output of merge_MEI_Vintage), saved as dataset MEI
+    # blocks: dict with datasets as keys (e.g. BTS_COS, MEI_FIN, FX) and DataFrames without vintages as values, saved
+    #         with edition 0 (all rows are upserted)
+    # table: name of table
+    # new_only: True to write only editions of MEI_new that are not in the database yet, False to upsert all
+    # batch_size: rows per batch
+
+    # =============== OUTPUT
+    # Number of rows written
+
+    # Long table of one edition (or block) at a time, loaded in batches of batch_size rows with one transaction
+    # per edition, so that memory does not grow with the number of editions
+    scheme = _scheme(url)
+    conn = SINKS[scheme][0](url)
+    written = 0
+    try:
+        create_table(conn, table)
+        parts = []
+        if MEI_new is not None:
+            editions = list(MEI_new)
+            if new_only:
+                loaded = loaded_editions(conn, 'MEI', table)
+                editions = [e for e in editions if int(e) not in loaded]
+            parts += [('MEI', e, MEI_new[e]) for e in editions]
+        parts += [(dataset, 0, df) for dataset, df in blocks.items()]
+        for dataset, edition, df in parts:
+            df = long_table(df, dataset, edition)
+            SINKS[scheme][1](conn, table, df, batch_size)
+            written += len(df)
+    finally:
+        conn.close()
+    return written
@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+"""
+Functions to assemble real time panels from the vintages of the MEI Archive, e.g. monthly and quarterly series
+side by side in every edition, and the pseudo real time panels available at each forecast origin. Please consult
+documentation of individual functions below for further information.
+"""
+import OECDData as OECD
+from OECDCodes import lazy_import
+
+pd = lazy_import('pandas')
+np = lazy_import('numpy')
+
+def month_number(periods):
+    # Number of months since year 0 of each period in YYYY-MM (2000-01) or YYYY-QQ (2000-Q1) format.
+    # Quarters are placed on the last month of the quarter.
+    out = np.empty(len(periods), dtype=int)
+    for i, item in enumerate(periods):
+        if 'Q' in item:
+            out[i] = int(item[0:4]) * 12 + 3 * int(item[-1]) - 1
+        else:
+            out[i] = int(item[0:4]) * 12 + int(item[5:7]) - 1
+    return out
+
+def month_label(numbers):
+    # Inverse of month_number for monthly periods
+    return ['%04d-%02d' % (n // 12, n % 12 + 1) for n in numbers]
+
+def mixed_frequency_panel(MEI_M, MEI_Q):
+    # Monthly and quarterly vintages side by side on a common monthly calendar. Quarterly observations are placed
+    # on the last month of each quarter. Each monthly edition uses the latest quarterly edition published in or
+    # before its month. Without monthly variables, the editions are the quarterly editions.
+
+    # =============== INPUT
+    # MEI_M: list of dicts with editions as keys and DataFrames as values (monthly variables, e.g. MEI_ALL)
+    # MEI_Q: list of dicts with editions as keys and DataFrames as values (quarterly variables, e.g. GDP)
+
+    # =============== OUTPUT
+    # values: array of shape (editions, months, series)
+    # editions: monthly editions
+    # periods: months in YYYY-MM format
+    # series: monthly series followed by quarterly series
+
+    values_m, editions_m, periods_m, series_m = OECD.vintage_panel(MEI_M)
+    values_q, editions_q, periods_q, series_q = OECD.vintage_panel(MEI_Q)
+    if len(editions_m) == 0 and len(editions_q) == 0:
+        raise ValueError('No vintages: MEI_M and MEI_Q have no editions')
+    if len(series_m) == 0:
+        # Quarterly variables only
+        editions_m = editions_q
+        values_m = np.empty((len(editions_q), len(periods_m), 0))
+
+    # Common monthly calendar
+    months_m = month_number(periods_m)
+    months_q = month_number(periods_q)
+    months = np.union1d(months_m, months_q)
+    rows_m = np.searchsorted(months, months_m)
+    rows_q = np.searchsorted(months, months_q)
+
+    # Latest quarterly edition for each monthly edition (-1 if none published yet)
+    q_id = np.searchsorted(np.asarray(editions_q, dtype=int), np.asarray(editions_m, dtype=int), side='right') - 1
+
+    values = np.full((len(editions_m), len(months), len(series_m) + len(series_q)), np.nan)
+    values[:, rows_m, :len(series_m)] = values_m
+    has_q = q_id >= 0
+    values[np.flatnonzero(has_q)[:, None], rows_q[None, :], len(series_m):] = values_q[q_id[has_q]]
+    return values, editions_m, month_label(months), series_m + series_q
+
+def panel_to_dict(values, editions, periods, series, transform=[]):
+    # Dict with editions as keys and DataFrames as values (as merge_MEI_Vintage), dropping periods without
+    # observations in an edition
+
+    # =============== INPUT
+    # values, editions, periods, series: see OECDData.vintage_panel
+    # transform: transformation code added as first row (Transform), one code per series or the same code for
+    #            all series, [] for none
+
+    allVintages = dict.fromkeys(editions)
+    for e in range(len(editions)):
+        rows = ~np.isnan(values[e]).all(axis=1)
+        df = pd.DataFrame(values[e][rows], index=pd.Index(np.asarray(periods)[rows], name=0), columns=series)
+        if transform != []:
+            codes = transform if isinstance(transform, list) else [transform] * len(series)
+            trans = pd.DataFrame([codes], columns=series, index=['Transform'])
+            df = pd.concat([trans, df])
+        allVintages[editions[e]] = df
+    return allVintages
+
+def origin_editions(editions, origins):
+    # Position of the latest edition published at each forecast origin (-1 if no edition is published yet)
+
+    # =============== INPUT
+    # editions: sorted list of editions in YYYYMM format
+    # origins: list of forecast origins in YYYY-MM (2000-01) or YYYYMM format
+
+    origins = np.array([int(str(item).replace('-', '')) for item in origins], dtype=int)
+    return np.searchsorted(np.asarray(editions, dtype=int), origins, side='right') - 1
+
+def real_time_panels(values, editions, periods, series, origins, trim=True):
+    # Pseudo real time panel available at each forecast origin: the latest edition published at the origin with
+    # its ragged edge (series published up to different periods). Panels are views into values, so that origins
+    # using the same edition share memory and nothing is copied.
+
+    # =============== INPUT
+    # values, editions, periods, series: vintage block, see OECDData.vintage_panel or mixed_frequency_panel
+    # origins: list of forecast origins in YYYY-MM (2000-01) or YYYYMM format
+    # trim: True to end each panel at the last period with an observation in its edition
+
+    # =============== OUTPUT
+    # dict with origins as keys and DataFrames (periods x series) as values, None if no edition is published
+    # at an origin. DataFrames are read only views: copy them before changing values.
+
+    position = origin_editions(editions, origins)
+    if trim:
+        # Number of periods up to the last observation in each edition
+        has_obs = ~np.isnan(values).all(axis=2)
+        length = np.where(has_obs.any(axis=1), values.shape[1] - np.argmax(has_obs[:, ::-1], axis=1), 0)
+    else:
+        length = np.full(len(editions), values.shape[1])
+    index = pd.Index(periods, name=0)
+    columns = pd.Index(series)
+
+    block = values.view()
+    block.flags.writeable = False
+    panels = {}
+    frames = {}
+    for origin, e in zip(origins, position):
+        if e < 0:
+            panels[origin] = None
+            continue
+        # Origins with the same edition get the same DataFrame
+        if e not in frames:
+            frames[e] = pd.DataFrame(block[e, :length[e]], index=index[:length[e]], columns=columns, copy=False)
+        panels[origin] = frames[e]
+    return panels
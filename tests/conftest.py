@@ -0,0 +1,35 @@
+import os
+import sys
+
+# Modules of the package are in the folder above
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+import OECDCodes
+import OECDScheduler
+import OECDAttributes
+import OECDAvailability
+import fakes
+
+
+@pytest.fixture
+def transport(monkeypatch):
+    # Send requests to a fake transport: transport(handler) with handler(url, headers) returning fakes.Response
+    monkeypatch.setattr(OECDScheduler, 'scheduler', OECDScheduler.Scheduler(rate=1000, burst=1000, max_per_host=100))
+
+    def install(handler):
+        fake = fakes.Transport(handler)
+        monkeypatch.setattr(OECDCodes, 'rq', fake)
+        return fake
+
+    return install
+
+
+@pytest.fixture(autouse=True)
+def clean_caches():
+    # Data structures, attribute codes and availability index are kept per process
+    yield
+    OECDCodes._structures.clear()
+    OECDAttributes._lookups.clear()
+    OECDAttributes._series.clear()
+    OECDAvailability._index.clear()
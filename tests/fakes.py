@@ -0,0 +1,95 @@
+# Fake sdmx-json responses and transport for OECDCodes.rq, so that tests run without network access
+import json
+
+
+class ConnectionLost(Exception):
+    pass
+
+
+class Response:
+    # The parts of requests.Response used by OECDCodes.request
+    def __init__(self, content=b'', status_code=200, headers=None, fail_after=None):
+        self.content = content if isinstance(content, bytes) else json.dumps(content).encode()
+        self.status_code = status_code
+        self.headers = dict(headers or {})
+        self.fail_after = fail_after
+        self.closed = False
+
+    def json(self):
+        return json.loads(self.content)
+
+    def iter_content(self, chunk_size=1 << 20):
+        # Connection drops after fail_after bytes
+        end = len(self.content) if self.fail_after is None else self.fail_after
+        for i in range(0, end, chunk_size):
+            yield self.content[i:min(i + chunk_size, end)]
+        if end < len(self.content):
+            raise ConnectionLost('connection lost')
+
+    def close(self):
+        self.closed = True
+
+
+class Transport:
+    # Replacement of requests: handler(url, headers) returns the response of each request
+    RequestException = ConnectionLost
+
+    def __init__(self, handler):
+        self.handler = handler
+        self.calls = []
+
+    def get(self, url, params=None, headers=None, stream=False):
+        self.calls.append((url, dict(headers or {})))
+        return self.handler(url, dict(headers or {}))
+
+
+def series_json(series_dims, series, dates, series_attributes=None, observation_attributes=None):
+    # sdmx-json response: series_dims is a list of (id, codes), series a dict {(key positions): {t: value}}
+    out = {}
+    for key, obs in series.items():
+        out[':'.join(str(k) for k in key)] = {'attributes': [0] * len(series_attributes or []),
+                                              'observations': {str(t): [v, 0] if observation_attributes else [v]
+                                                               for t, v in obs.items()}}
+    return {'dataSets': [{'series': out}],
+            'structure': {'dimensions': {'series': [{'id': name, 'values': [{'id': str(c)} for c in codes]}
+                                                    for name, codes in series_dims],
+                                         'observation': [{'id': 'TIME_PERIOD',
+                                                          'values': [{'id': d} for d in dates]}]},
+                          'attributes': {'series': series_attributes or [],
+                                         'observation': observation_attributes or []}}}
+
+
+def archive(countries, variables, editions, dates, value=None, frequency='M'):
+    # MEI_ARCHIVE response. Edition YYYYMM publishes periods up to two months before it, with value(c, v, e, t)
+    # (default 100 * country + 10 * variable + edition + t / 100), None for a missing observation
+    if value is None:
+        value = lambda c, v, e, t: 100 * c + 10 * v + e + t / 100
+    series = {}
+    for c in range(len(countries)):
+        for v in range(len(variables)):
+            for e, edition in enumerate(editions):
+                obs = {}
+                for t, date in enumerate(dates):
+                    month = int(date[0:4]) * 12 + (3 * int(date[-1]) if 'Q' in date else int(date[5:7]))
+                    if month <= int(edition[0:4]) * 12 + int(edition[4:6]) - 2:
+                        obs[t] = value(c, v, e, t)
+                if len(obs) > 0:
+                    series[(c, v, e, 0)] = obs
+    units = [{'id': 'UNIT', 'values': [{'id': 'IDX', 'name': 'Index'}]},
+             {'id': 'POWERCODE', 'values': [{'id': '0', 'name': 'Units'}]}]
+    return series_json([('LOCATION', countries), ('VAR', variables), ('EDI', editions), ('FREQUENCY', [frequency])],
+                       series, dates, series_attributes=units)
+
+
+def structure(codelists):
+    # SDMX-ML data structure: codelists is a dict {id: [(value, description)]}
+    lists = ''
+    for name, codes in codelists.items():
+        lists += ('<structure:CodeList id="%s"><structure:Name>%s</structure:Name>'
+                  '<structure:Description>%s</structure:Description>' % (name, name, name))
+        lists += ''.join('<structure:Code value="%s"><structure:Description>%s</structure:Description>'
+                         '</structure:Code>' % item for item in codes)
+        lists += '</structure:CodeList>'
+    return ('<message:Structure xmlns:message="http://www.SDMX.org/resources/SDMXML/schemas/v2_0/message" '
+            'xmlns:structure="http://www.SDMX.org/resources/SDMXML/schemas/v2_0/structure">'
+            '<message:CodeLists>' + lists + '</message:CodeLists></message:Structure>').encode()
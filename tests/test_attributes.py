@@ -0,0 +1,49 @@
+import OECDAttributes
+import OECDAttributes as A
+import OECDData
+import fakes
+
+UNITS = [{'id': 'UNIT', 'values': [{'id': 'USD', 'name': 'US Dollar'}, {'id': 'IDX', 'name': 'Index'}]},
+         {'id': 'POWERCODE', 'values': [{'id': '6', 'name': 'Millions'}, {'id': '0', 'name': 'Units'}]}]
+STATUS = [{'id': 'OBS_STATUS', 'values': [{'id': 'E', 'name': 'Estimated'}]}]
+
+
+def response():
+    # AUS in millions of US dollars, CAN as index (second values of UNIT and POWERCODE)
+    out = fakes.series_json([('VAR', ['601']), ('LOCATION', ['AUS', 'CAN']), ('FREQUENCY', ['M'])],
+                            {(0, 0, 0): {0: 1.5, 1: 2.0}, (0, 1, 0): {0: 3.0}}, ['2000-01', '2000-02'],
+                            series_attributes=UNITS, observation_attributes=STATUS)
+    out['dataSets'][0]['series']['0:1:0']['attributes'] = [1, 1]
+    out['dataSets'][0]['series']['0:0:0']['observations']['1'] = [2.0, None]
+    return out
+
+
+def test_encode_keeps_codes_across_requests():
+    assert A.encode('X', 'UNIT', [{'id': 'USD'}, {'id': 'IDX'}]).tolist() == [0, 1, -1]
+    assert A.encode('X', 'UNIT', [{'id': 'EUR'}, {'id': 'USD'}]).tolist() == [2, 0, -1]
+    assert A.labels('X', 'UNIT') == ['USD', 'IDX', 'EUR']
+
+
+def test_decode():
+    names, codes = A.decode(response(), 'MEI_FIN')
+    assert names == ['UNIT', 'POWERCODE', 'OBS_STATUS']
+    assert codes.tolist() == [[0, 0, 0], [0, 0, -1], [1, 1, 0]]
+
+
+def test_attributes_of_downloaded_series_and_scale(transport, tmp_path):
+    transport(lambda url, headers: fakes.Response(response()))
+    df_all, meta_all = OECDData.get_series_MEI_FIN(['AUS', 'CAN'], '601', 'M', '2000-01', '2000-02', attributes=True)
+    df, meta = df_all['601'], meta_all['601']
+    scaled = OECDAttributes.scale(df, meta)
+    assert scaled.loc['2000-01', 'AUS_601'] == 1.5e6
+    assert scaled.loc['2000-01', 'CAN_601'] == 3.0
+    series = A.get_series_attributes('MEI_FIN')
+    assert series.loc['AUS_601', 'UNIT'] == 'USD'
+    assert series.loc['CAN_601', 'POWERCODE'] == '0'
+
+    # Saved attributes are found without downloading again
+    A.save_attributes('MEI_FIN', str(tmp_path))
+    A._lookups.clear()
+    A._series.clear()
+    assert A.get_series_attributes('MEI_FIN', ['AUS_601'], cache_dir=str(tmp_path)).loc['AUS_601', 'UNIT'] == 'USD'
+    assert A.get_series_attributes('MEI_FIN', ['NZL_601'])['UNIT'].isna().all()
@@ -0,0 +1,41 @@
+import numpy as np
+import OECDAvailability
+import OECDData
+import fakes
+
+EDITIONS = ['202001', '202002', '202003']
+DATES = ['2019-10', '2019-11', '2019-12', '2020-01']
+
+
+def test_record_from_observations(transport):
+    # Periods are not in chronological order in the response
+    dates = ['2020-01', '2019-10', '2019-12', '2019-11']
+    response = fakes.archive(['AUS', 'CAN'], [401], EDITIONS, dates)
+    transport(lambda url, headers: fakes.Response(response))
+    OECDData.get_series_all_releases_MEIArchive(['AUS', 'CAN'], 401, 'M', '2019-10', '2020-01', '2020-01', '2020-04')
+    entries = OECDAvailability.available('MEI_ARCHIVE')
+    assert len(entries) == 6
+    assert ('AUS', '401', '202001', 'M', '2019-10', '2019-11') in entries
+    assert ('CAN', '401', '202003', 'M', '2019-10', '2020-01') in entries
+
+
+def test_record_series_keys_only():
+    response = fakes.archive(['AUS'], [401], EDITIONS, DATES)
+    OECDAvailability.record('MEI_ARCHIVE', response, ['AUS'], [401], EDITIONS, 'M', '2019-10', '2020-01')
+    assert OECDAvailability.available('MEI_ARCHIVE')[0] == ('AUS', '401', '202001', 'M', None, None)
+
+    # Known periods are kept when the same series keys are recorded again
+    dims, t = np.array([[0, 0, 0, 0]]), np.array([1])
+    OECDAvailability.record('MEI_ARCHIVE', response, ['AUS'], [401], EDITIONS, 'M', '2019-10', '2020-01',
+                            observations=(dims, t))
+    OECDAvailability.record('MEI_ARCHIVE', response, ['AUS'], [401], EDITIONS, 'M', '2019-10', '2020-01')
+    assert OECDAvailability.available('MEI_ARCHIVE')[0] == ('AUS', '401', '202001', 'M', '2019-11', '2019-11')
+
+
+def test_plan_leaves_out_countries_without_data(transport):
+    transport(lambda url, headers: fakes.Response(fakes.archive(['AUS'], [401], EDITIONS, DATES)))
+    OECDData.get_series_all_releases_MEIArchive(['AUS', 'CAN'], 401, 'M', '2019-10', '2020-01', '2020-01', '2020-04')
+    planned = OECDAvailability.plan('MEI_ARCHIVE', ['AUS', 'CAN', 'FRA'], [401], 'M', '2019-10', '2020-01',
+                                    EDITIONS)
+    # CAN was requested and has no data, FRA was never requested
+    assert planned == {'401': ['AUS', 'FRA']}
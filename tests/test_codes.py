@@ -0,0 +1,82 @@
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+import OECDCodes
+import fakes
+
+
+def test_import_does_not_load_heavy_dependencies():
+    code = ('import sys, OECDData; '
+            'print(sorted(m for m in ["pandas", "numpy", "requests", "lxml"] if m in sys.modules))')
+    out = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True,
+                         cwd=os.path.dirname(os.path.abspath(OECDCodes.__file__)))
+    assert out.stdout.strip() == '[]'
+
+
+def test_lazy_import():
+    module = OECDCodes.lazy_import('json')
+    assert module.dumps([1]) == '[1]'
+    proxy = OECDCodes._LazyModule('colorsys')
+    assert proxy._module is None
+    assert proxy.rgb_to_hsv(0, 0, 0) == (0, 0, 0)
+    assert proxy._module is not None
+
+
+def test_join_codes():
+    assert OECDCodes.join_codes(['AUS', 'CAN']) == ('AUS+CAN', 2)
+    assert OECDCodes.join_codes(401) == ('401', 1)
+
+
+def test_get_data_url():
+    url = OECDCodes.get_data_url('MEI_FIN', ['IRLT', ['AUS', 'CAN'], 'M'], '2000-01', '2001-01')
+    assert url == OECDCodes.url_data + 'MEI_FIN/IRLT.AUS+CAN.M/all?startTime=2000-01&endTime=2001-01'
+
+
+def test_get_edition_dates():
+    # Final edition is not included
+    assert OECDCodes.get_edition_dates('2000-01', '2020-01', '2020-03') == ['202001', '202002']
+    assert OECDCodes.get_edition_dates('2000-Q1', '2020-Q1', '2020-Q3', 'Q') == ['202003', '202006']
+    editions = OECDCodes.get_edition_dates('2000-Q1', '2020-Q1', '2020-Q2', 'Q', quarter_end=False)
+    assert editions == ['202001', '202002', '202003', '202004', '202005']
+    assert OECDCodes.get_edition_dates('1990-01', [], '1999-03')[0] == '199902'
+
+
+def test_to_quarter():
+    assert OECDCodes.to_quarter('2000-02') == '2000-Q1'
+    assert OECDCodes.to_quarter('2000-12') == '2000-Q4'
+
+
+def test_get_structure_downloads_once(transport):
+    content = fakes.structure({'CL_MEI_ARCHIVE_VAR': [('401', 'CPI'), ('502', 'Unemployment')],
+                               'CL_MEI_ARCHIVE_LOCATION': [('AUS', 'Australia'), ('CAN', 'Canada')]})
+
+    def handler(url, headers):
+        # Slow download, so that the other threads wait for it
+        time.sleep(0.05)
+        return fakes.Response(content)
+
+    fake = transport(handler)
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(lambda _: OECDCodes.get_country_codes_MEIArchive(), range(8)))
+    assert len(fake.calls) == 1
+    assert OECDCodes.get_var_codes_MEIArchive() == ([401, 502], ['CPI', 'Unemployment'])
+    assert OECDCodes.get_country_codes_MEIArchive() == ['AUS', 'CAN']
+    assert len(fake.calls) == 1
+
+
+def test_prefetch_structures_returns_failures(transport):
+    content = fakes.structure({'CL_MEI_FIN_SUBJECT': [('IRLT', 'Long-term interest rate')]})
+
+    def handler(url, headers):
+        if url.endswith('MEI_BTS_COS'):
+            return fakes.Response(b'', status_code=400)
+        return fakes.Response(content)
+
+    fake = transport(handler)
+    failed = OECDCodes.prefetch_structures(['MEI_FIN', 'MEI_BTS_COS', 'MEI_FIN'])
+    assert list(failed) == ['MEI_BTS_COS']
+    assert isinstance(failed['MEI_BTS_COS'], OECDCodes.RequestError)
+    assert [url for url, headers in fake.calls].count(OECDCodes.url_structure + 'MEI_FIN') == 1
+    assert OECDCodes.get_var_codes_MEI_FIN() == (['IRLT'], ['Long-term interest rate'])
@@ -0,0 +1,82 @@
+import warnings
+import numpy as np
+import pytest
+import OECDData
+from OECDCodes import NoResultsError, MissingSeriesWarning
+import fakes
+
+EDITIONS = ['202001', '202002', '202003']
+DATES = ['2019-10', '2019-11', '2019-12', '2020-01']
+
+
+def test_first_release_keeps_first_published_value():
+    # Editions are not in chronological order in the response
+    dims = np.array([[0, 0, 1, 0], [0, 0, 0, 0], [0, 0, 1, 0]])
+    t = np.array([0, 0, 1])
+    values = np.array([2.0, 1.0, 3.0])
+    codes = np.zeros((3, 1), dtype=int)
+    dims, t, values, codes = OECDData.first_release(dims, t, values, ['202002', '202001'], codes)
+    assert t.tolist() == [0, 1]
+    assert values.tolist() == [2.0, 3.0]
+
+
+def test_first_release_without_observations():
+    empty = np.empty((0, 4), dtype=int)
+    out = OECDData.first_release(empty, np.empty(0, dtype=int), np.empty(0), ['202001'], np.empty((0, 1)))
+    assert [len(item) for item in out] == [0, 0, 0, 0]
+
+
+def test_get_series_first_release(transport):
+    transport(lambda url, headers: fakes.Response(fakes.archive(['AUS', 'CAN'], [401], EDITIONS, DATES)))
+    df, meta = OECDData.get_series_first_release_MEIArchive(['AUS', 'CAN'], 401, 'M', '2019-10', '2020-01',
+                                                           '2020-01', '2020-04')
+    assert list(df.columns) == ['AUS', 'CAN']
+    # 2019-10 and 2019-11 are first published in edition 202001 (value 100 * c + e + t / 100)
+    assert df['CAN'].tolist()[:3] == [100.0, 100.01, 101.02]
+    assert df['AUS'].iloc[3] == 2.03
+
+
+def test_get_series_first_release_all_missing(transport):
+    # Regression: all observations null used to fail with an IndexError
+    response = fakes.archive(['AUS'], [401], EDITIONS, DATES, value=lambda c, v, e, t: None)
+    transport(lambda url, headers: fakes.Response(response))
+    with pytest.raises(NoResultsError):
+        OECDData.get_series_first_release_MEIArchive(['AUS'], 401, 'M', '2019-10', '2020-01', '2020-01', '2020-04')
+
+
+def test_get_series_first_release_missing_country(transport):
+    transport(lambda url, headers: fakes.Response(fakes.archive(['AUS'], [401], EDITIONS, DATES)))
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter('always')
+        OECDData.get_series_first_release_MEIArchive(['AUS', 'CAN'], 401, 'M', '2019-10', '2020-01',
+                                                     '2020-01', '2020-04')
+    assert [str(item.message)[-3:] for item in caught if item.category is MissingSeriesWarning] == ['CAN']
+
+
+def test_get_series_all_releases(transport):
+    transport(lambda url, headers: fakes.Response(fakes.archive(['AUS'], [401], EDITIONS, DATES)))
+    df_all = OECDData.get_series_all_releases_MEIArchive(['AUS'], 401, 'M', '2019-10', '2020-01',
+                                                         '2020-01', '2020-04')
+    assert list(df_all) == [202001, 202002, 202003]
+    assert list(df_all[202003].index) == ['2019-10', '2019-11', '2019-12', '2020-01']
+    assert df_all[202002].loc['2019-12', 'AUS_401'] == 1.02
+
+
+def test_no_results(transport):
+    transport(lambda url, headers: fakes.Response(b'', status_code=404))
+    with pytest.raises(NoResultsError):
+        OECDData.get_series_all_releases_MEIArchive(['AUS'], 401, 'M', '2019-10', '2020-01', '2020-01', '2020-04')
+
+
+def test_quarterly_first_release_from_monthly_editions(transport):
+    # Quarter is first published two months after its end (Q1 in the May edition), not in a quarter-end edition
+    def handler(url, headers):
+        editions = url.split('/')[-2].split('.')[2].split('+')
+        return fakes.Response(fakes.archive(['AUS'], [401], editions, ['2020-Q1', '2020-Q2'], frequency='Q'))
+
+    fake = transport(handler)
+    df, meta = OECDData.get_series_first_release_MEIArchive(['AUS'], 401, 'Q', '2020-Q1', '2020-Q2', '2020-Q2',
+                                                           '2020-Q4')
+    assert fake.calls[0][0].split('/')[-2].split('.')[2] == '+'.join('2020%02d' % m for m in range(4, 12))
+    # Value 100 * c + 10 * v + e + t / 100 with e the position of the edition (202005 and 202008)
+    assert df['AUS'].tolist() == [1.0, 4.01]
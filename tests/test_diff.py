@@ -0,0 +1,65 @@
+import numpy as np
+import pandas as pd
+import OECDDiff
+import OECDExport
+
+INDEX = ['2000-01', '2000-02', '2001-01']
+
+
+def frame(values):
+    return pd.DataFrame(values, index=pd.Index(INDEX[:len(next(iter(values.values())))], name=0))
+
+
+def test_block_hashes_change_only_in_changed_block():
+    old = frame({'AUS_401': [1.0, 2.0, 3.0]})
+    new = frame({'AUS_401': [1.0, 2.0, 3.5]})
+    a, b = OECDDiff.block_hashes(old), OECDDiff.block_hashes(new)
+    assert a['AUS_401']['2000'] == b['AUS_401']['2000']
+    assert OECDDiff.diff_hashes(a, b) == ([], [], {'AUS_401': ['2001']})
+
+
+def test_diff_frames():
+    old = frame({'AUS_401': [1.0, 2.0, np.nan], 'CAN_401': [1.0, 2.0, 3.0]})
+    new = frame({'AUS_401': [1.0, 2.5, 3.0], 'CAN_401': [1.0, np.nan, 3.0]})
+    changed = OECDDiff.diff_hashes(OECDDiff.block_hashes(old), OECDDiff.block_hashes(new))[2]
+    new_periods, revised, deleted = OECDDiff.diff_frames(old, new, changed)
+    assert new_periods == {'AUS_401': {'2001-01': 3.0}}
+    assert revised == {'AUS_401': {'2000-02': [2.0, 2.5]}}
+    assert deleted == {'CAN_401': ['2000-02']}
+
+
+def save(path, editions, Data):
+    return OECDExport.write_vintages(editions, Data, path, n_jobs=1)
+
+
+def test_diff_editions_reads_only_what_changed(tmp_path, monkeypatch):
+    path = str(tmp_path)
+    Data = frame({'AUS_IRLT': [5.0, 5.0, 5.0]})
+    editions = {200101: frame({'AUS_401': [1.0, 2.0]}), 200102: frame({'AUS_401': [1.0, 2.0, 3.0]})}
+    save(path, editions, Data)
+    changes = OECDDiff.diff_editions(path)
+    assert changes['new_periods'] == {'AUS_401': {'2001-01': 3.0}}
+    assert changes['shared'] is None
+
+    # Next run: new edition, old editions are not written again and their saved hashes are used
+    editions[200103] = frame({'AUS_401': [1.0, 2.0, 3.0]})
+    Data = frame({'AUS_IRLT': [5.0, 5.5, 5.0]})
+    assert len(save(path, editions, Data)) == 2
+    reads = []
+    read_vintage = OECDExport.read_vintage
+    monkeypatch.setattr(OECDExport, 'read_vintage', lambda *args, **kwargs: reads.append(args[1]) or
+                        read_vintage(*args, **kwargs))
+    changes = OECDDiff.diff_editions(path)
+    assert reads == ['200103']
+    assert changes['changed_series'] == []
+    # Change of the shared block is found once, in the shared change set
+    assert changes['shared']['revised'] == {'AUS_IRLT': {'2000-02': [5.0, 5.5]}}
+
+    table = OECDDiff.changes_table(changes)
+    assert table[['series', 'change', 'block']].values.tolist() == [['AUS_IRLT', 'revised', 'shared']]
+    summary = OECDDiff.update_feed(changes, str(tmp_path / 'feed.jsonl'))
+    assert summary['shared']['revised'] == 1
+
+    # Shared block unchanged in the next save: no shared changes
+    save(path, editions, Data)
+    assert OECDDiff.diff_shared(path) is None
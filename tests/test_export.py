@@ -0,0 +1,81 @@
+import os
+import importlib.util
+import numpy as np
+import pandas as pd
+import pytest
+import OECDExport
+
+
+def vintages():
+    index = pd.Index(['2000-01', '2000-02', '2000-03'], name=0)
+    return {200003: pd.DataFrame({'AUS_401': [1.0, 2.0, np.nan]}, index=index),
+            200004: pd.DataFrame({'AUS_401': [1.0, 2.5, 3.0]}, index=index)}
+
+
+def block():
+    return pd.DataFrame({'AUS_IRLT': [5.0, 5.1, 5.2]}, index=pd.Index(['2000-01', '2000-02', '2000-03'], name=0))
+
+
+def test_write_and_read_vintage(tmp_path):
+    files = OECDExport.write_vintages(vintages(), block(), str(tmp_path), n_jobs=1)
+    assert len(files) == 3
+    df = OECDExport.read_vintage(str(tmp_path), 200004)
+    assert list(df.columns) == ['AUS_401', 'AUS_IRLT']
+    assert df.loc['2000-02', 'AUS_401'] == 2.5
+    assert list(OECDExport.read_vintage(str(tmp_path), 200004, shared=False).columns) == ['AUS_401']
+
+
+def test_unchanged_editions_are_not_written_again(tmp_path):
+    OECDExport.write_vintages(vintages(), block(), str(tmp_path), n_jobs=1)
+    assert OECDExport.write_vintages(vintages(), block(), str(tmp_path), n_jobs=1) == []
+
+    MEI_new = vintages()
+    MEI_new[200004].iloc[2, 0] = 3.5
+    files = OECDExport.write_vintages(MEI_new, block(), str(tmp_path), n_jobs=1)
+    assert [os.path.basename(item) for item in files] == ['200004.csv']
+
+
+def test_changed_shared_block_keeps_previous_version(tmp_path):
+    OECDExport.write_vintages(vintages(), block(), str(tmp_path), n_jobs=1)
+    Data = block()
+    Data.iloc[0, 0] = 4.0
+    files = OECDExport.write_vintages(vintages(), Data, str(tmp_path), n_jobs=1)
+    assert [os.path.basename(item) for item in files] == ['OECD_shared.csv']
+    manifest = OECDExport.read_manifest(os.path.join(str(tmp_path), 'Historical_OECD'))
+    assert manifest['shared_previous'] is not None
+    previous = pd.read_csv(os.path.join(str(tmp_path), 'OECD_shared_previous.csv'), index_col=0)
+    assert previous.iloc[0, 0] == 5.0
+
+    # Previous version is removed once the block did not change
+    OECDExport.write_vintages(vintages(), Data, str(tmp_path), n_jobs=1)
+    assert not os.path.exists(os.path.join(str(tmp_path), 'OECD_shared_previous.csv'))
+    manifest = OECDExport.read_manifest(os.path.join(str(tmp_path), 'Historical_OECD'))
+    assert manifest['shared_previous'] is None
+    assert 'OECD_shared_previous' not in manifest['hashes']
+
+
+def test_failed_write_keeps_shared_block(tmp_path, monkeypatch):
+    OECDExport.write_vintages(vintages(), block(), str(tmp_path), n_jobs=1)
+
+    def fail(df, file):
+        raise OSError('disk full')
+
+    monkeypatch.setitem(OECDExport.FORMATS, 'csv', ('.csv', fail, OECDExport._read_csv))
+    Data = block()
+    Data.iloc[0, 0] = 4.0
+    with pytest.raises(OSError):
+        OECDExport.write_vintages(vintages(), Data, str(tmp_path), n_jobs=1)
+    assert sorted(os.listdir(str(tmp_path))) == ['Historical_OECD', 'OECD_shared.csv']
+    assert pd.read_csv(os.path.join(str(tmp_path), 'OECD_shared.csv'), index_col=0).iloc[0, 0] == 5.0
+
+
+@pytest.mark.skipif(importlib.util.find_spec('pyarrow') is not None, reason='pyarrow is installed')
+def test_missing_engine_fails_before_writing(tmp_path):
+    with pytest.raises(ImportError, match='pyarrow'):
+        OECDExport.write_vintages(vintages(), block(), str(tmp_path), fmt='parquet')
+    assert not os.path.exists(os.path.join(str(tmp_path), 'Historical_OECD'))
+
+
+def test_unknown_format():
+    with pytest.raises(ValueError):
+        OECDExport.check_format('xlsx')
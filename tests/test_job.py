@@ -0,0 +1,236 @@
+import warnings
+import pandas as pd
+import pytest
+import OECDJob
+import OECDData
+from OECDCodes import OECDError, MissingSeriesWarning
+import fakes
+
+JOB = '''
+path = "Data"
+frequency = "M"
+start_date = "2000-01"
+end_date = "2001-01"
+countries = ["AUS", "CAN"]
+
+[MEI]
+variables = [401, 502]
+transform = 5
+
+[MEI_FIN]
+variables = ["IRLT"]
+countries = ["AUS"]
+'''
+
+
+@pytest.fixture
+def job_file(tmp_path):
+    file = tmp_path / 'job.toml'
+    file.write_text(JOB)
+    return str(file)
+
+
+def test_load_job_defaults(job_file):
+    job = OECDJob.load_job(job_file)
+    assert job['MEI']['countries'] == ['AUS', 'CAN']
+    assert job['MEI']['start_date'] == '2000-01'
+    assert job['MEI_FIN']['countries'] == ['AUS']
+
+
+def test_build_stages(job_file):
+    job = OECDJob.load_job(job_file)
+    job['availability'] = 'cache'
+    stages = OECDJob.build_stages(job)
+    assert stages['merge_MEI'][1] == ['?fetch_MEI_401', '?fetch_MEI_502']
+    # Interest rates (fetch_MEI_FIN) are not in the index of the MEI Archive
+    assert stages['save_index'][1] == ['?fetch_MEI_401', '?fetch_MEI_502']
+    assert 'save_vintages' in stages
+    assert 'doc_MEI' not in stages
+
+
+def test_run_stages_passes_results_in_order():
+    stages = {'a': (lambda: 1, []), 'b': (lambda: 2, []), 'c': (lambda a, b: a * 10 + b, ['a', 'b'])}
+    batch = OECDJob.run_stages(stages, 2)
+    assert batch.ok
+    assert batch.results['c'] == 12
+
+
+def test_failed_stage_skips_dependents():
+    def fail():
+        raise OECDError('no connection')
+
+    stages = {'a': (fail, []), 'b': (lambda a: a, ['a']), 'c': (lambda b: b, ['b']), 'd': (lambda: 4, [])}
+    batch = OECDJob.run_stages(stages, 2)
+    assert not batch.ok
+    assert list(batch.failures) == ['a']
+    assert sorted(batch.skipped) == ['b', 'c']
+    assert batch.results == {'d': 4}
+    with pytest.raises(OECDError):
+        batch.raise_for_failures()
+
+
+def test_unknown_and_circular_dependencies():
+    with pytest.raises(ValueError):
+        OECDJob.run_stages({'a': (lambda x: x, ['x'])}, 1)
+    with pytest.raises(ValueError):
+        OECDJob.run_stages({'a': (lambda b: b, ['b']), 'b': (lambda a: a, ['a'])}, 1)
+
+
+def test_checkpointed(tmp_path):
+    calls = []
+    stage = OECDJob.checkpointed(lambda: calls.append(1) or len(calls), 'fetch', {'x': 1}, str(tmp_path))
+    assert stage() == 1
+    assert stage() == 1
+    assert len(calls) == 1
+    restarted = OECDJob.checkpointed(lambda: calls.append(1) or len(calls), 'fetch', {'x': 1}, str(tmp_path),
+                                     restart=True)
+    assert restarted() == 2
+
+
+def test_build_stages_quarterly_only(tmp_path):
+    file = tmp_path / 'job.toml'
+    file.write_text(JOB.replace('variables = [401, 502]', 'quarterly_variables = [101]'))
+    job = OECDJob.load_job(str(file))
+    job['availability'] = str(tmp_path / 'cache')
+    job['documentation'] = str(tmp_path / 'Doc')
+    stages = OECDJob.build_stages(job)
+    assert stages['merge_MEI'][1] == ['?fetch_MEI_Q_101']
+    assert 'index_MEI_Q' in stages and 'index_MEI' not in stages
+    assert 'doc_MEI' not in stages
+
+
+def test_optional_dependency_that_failed():
+    def fail():
+        raise OECDError('no connection')
+
+    stages = {'a': (fail, []), 'b': (lambda: 2, []), 'merge': (lambda a, b: [a, b], ['?a', 'b']),
+              'save': (lambda merged: merged, ['merge'])}
+    batch = OECDJob.run_stages(stages, 2)
+    assert batch.results['save'] == [None, 2]
+    assert batch.partial == {'merge': ['a']}
+    assert batch.skipped == []
+    assert 'Partial: merge (without a)' in batch.summary()
+
+
+def test_missing_series_are_recorded_per_stage():
+    def fetch(country):
+        warnings.warn('No results for requested variable no. 401 for country ' + country, MissingSeriesWarning)
+        return country
+
+    stages = {'fetch_' + c: (lambda c=c: fetch(c), []) for c in ['AUS', 'CAN']}
+    batch = OECDJob.run_stages(stages, 2)
+    assert batch.ok
+    assert batch.missing == {'fetch_AUS': ['No results for requested variable no. 401 for country AUS'],
+                             'fetch_CAN': ['No results for requested variable no. 401 for country CAN']}
+
+
+def test_merge_leaves_out_missing_variables():
+    df = pd.DataFrame({'AUS': [1.0]}, index=['2000-01'])
+    assert list(OECDData.merge({'IRLT': df, 'IR3TIB': None}).columns) == ['AUS']
+    assert OECDData.merge({'IRLT': None}) is None
+
+
+def test_fx_block_is_saved_to_sql(tmp_path):
+    file = tmp_path / 'job.toml'
+    file.write_text('sql = "sqlite:///' + str(tmp_path / 'OECD.db') + '"\n' + JOB +
+                    '\n[FX]\ncountries = ["AUS"]\n')
+    stages = OECDJob.build_stages(OECDJob.load_job(str(file)))
+    assert stages['save_FX'][1] == ['merge_FX']
+    save_sql, dependencies = stages['save_sql']
+    assert dependencies == ['!merge_MEI', '?merge_MEI_FIN', '?merge_FX']
+
+    FX = pd.DataFrame({'AUS': [1.5]}, index=['2000-01'])
+    assert save_sql(None, None, FX) == 1
+
+
+def test_complete_dependency_that_ran_partial():
+    def fail():
+        raise OECDError('no connection')
+
+    stages = {'a': (fail, []), 'b': (lambda: 2, []), 'merge': (lambda a, b: [a, b], ['?a', 'b']),
+              'report': (lambda merged: merged, ['merge']), 'save': (lambda merged: merged, ['!merge']),
+              'publish': (lambda saved: saved, ['save'])}
+    batch = OECDJob.run_stages(stages, 2)
+    assert batch.results['report'] == [None, 2]
+    assert sorted(batch.skipped) == ['publish', 'save']
+
+
+def archive(fail, value=None):
+    # MEI Archive responses for the countries, variables and editions in the URL, 400 for variables and editions
+    # in fail
+    def handler(url, headers):
+        keys = url.split('/')[-2].split('.')
+        if len(set(keys[1].split('+') + keys[2].split('+')) & set(fail)) > 0:
+            return fakes.Response(b'', status_code=400)
+        return fakes.Response(fakes.archive(keys[0].split('+'), keys[1].split('+'), keys[2].split('+'),
+                                            ['2019-10', '2019-11', '2019-12', '2020-01'], value))
+
+    return handler
+
+
+SAVE_JOB = '''
+path = "{tmp}/Data"
+attribute_cache = "{tmp}/cache"
+frequency = "M"
+start_date = "2019-10"
+end_date = "2020-01"
+countries = ["AUS"]
+processes = 1
+
+[MEI]
+variables = [401, 502]
+start_edition = "2020-01"
+end_edition = "2020-04"
+'''
+
+
+def save_job(tmp_path, text=SAVE_JOB):
+    file = tmp_path / 'job.toml'
+    file.write_text(text.format(tmp=tmp_path.as_posix()))
+    return str(file)
+
+
+def test_failed_download_does_not_overwrite_saved_vintages(transport, tmp_path):
+    file = save_job(tmp_path)
+    saved = tmp_path / 'Data' / 'Historical_OECD' / '202003.csv'
+    transport(archive([]))
+    assert OECDJob.run_stages(OECDJob.build_stages(OECDJob.load_job(file)), 2).ok
+    before = saved.read_text()
+    assert 'AUS_502' in before
+
+    transport(archive(['502']))
+    batch = OECDJob.run_stages(OECDJob.build_stages(OECDJob.load_job(file)), 2)
+    assert batch.partial['merge_MEI'] == ['fetch_MEI_502']
+    assert 'save_vintages' in batch.skipped
+    assert saved.read_text() == before
+
+
+def test_partial_download_is_not_checkpointed(transport, tmp_path):
+    text = SAVE_JOB.replace('processes = 1', 'processes = 1\ncheckpoint = "{tmp}/checkpoints"') + 'edition_chunk = 1\n'
+    file = save_job(tmp_path, text.replace('[401, 502]', '[401]'))
+    transport(archive(['202002']))
+    batch = OECDJob.run_stages(OECDJob.build_stages(OECDJob.load_job(file)), 2)
+    assert batch.incomplete == ['fetch_MEI_401']
+    assert 'save_vintages' in batch.skipped
+    assert list(batch.results['fetch_MEI_401']) == [202001, 202003]
+
+    # Failed chunk is fetched again on the next run
+    fake = transport(archive([]))
+    batch = OECDJob.run_stages(OECDJob.build_stages(OECDJob.load_job(file)), 2)
+    assert batch.ok and batch.incomplete == []
+    assert list(batch.results['fetch_MEI_401']) == [202001, 202002, 202003]
+    assert len(fake.calls) == 3
+
+
+def test_change_set_is_emitted_once_per_edition(transport, tmp_path):
+    file = save_job(tmp_path, SAVE_JOB.replace('processes = 1', 'processes = 1\nchanges = "json"'))
+    feed = tmp_path / 'Data' / 'Historical_OECD' / 'changes' / 'feed.jsonl'
+    transport(archive([]))
+    for run in range(3):
+        assert OECDJob.run_stages(OECDJob.build_stages(OECDJob.load_job(file)), 2).ok
+    assert len(feed.read_text().splitlines()) == 1
+
+    # Revision of the latest edition
+    transport(archive([], lambda c, v, e, t: 1.0 if e < 2 else 2.0))
+    assert OECDJob.run_stages(OECDJob.build_stages(OECDJob.load_job(file)), 2).ok
+    assert len(feed.read_text().splitlines()) == 2
@@ -0,0 +1,76 @@
+import requests
+import OECDCodes
+import OECDProfile
+import fakes
+
+JOB = '''
+path = "{prod}/Data"
+availability = "{prod}/cache"
+sql = "sqlite:///{prod}/OECD.db"
+frequency = "M"
+start_date = "2019-10"
+end_date = "2020-01"
+countries = ["AUS"]
+
+[MEI]
+variables = [401]
+start_edition = "2020-01"
+end_edition = "2020-04"
+'''
+DATES = ['2019-10', '2019-11', '2019-12', '2020-01']
+
+
+def archive(url, headers):
+    # Response for the countries and editions in the URL
+    keys = url.split('/')[-2].split('.')
+    return fakes.Response(fakes.archive(keys[0].split('+'), keys[1].split('+'), keys[2].split('+'), DATES))
+
+
+def job_file(tmp_path):
+    file = tmp_path / 'job.toml'
+    file.write_text(JOB.format(prod=(tmp_path / 'prod').as_posix()))
+    return str(file)
+
+
+def test_cassette_round_trip(tmp_path):
+    cassette = OECDProfile.Cassette(str(tmp_path / 'cassette'))
+    cassette.save('https://host/a', fakes.Response(b'abc', headers={'Retry-After': '1', 'Set-Cookie': 'x'}))
+    response = OECDProfile.Cassette(str(tmp_path / 'cassette')).load('https://host/a')
+    assert (response.status_code, response.headers, response.content) == (200, {'Retry-After': '1'}, b'abc')
+
+
+def test_missing_response_fails_request(tmp_path):
+    with OECDProfile.transport(OECDProfile._Player(OECDProfile.Cassette(str(tmp_path)))):
+        try:
+            OECDCodes.request('https://host/a', 'test')
+        except OECDCodes.OECDError as e:
+            error = e
+    assert isinstance(error, OECDProfile.MissingResponseError)
+    assert not error.retryable
+
+
+def test_record_and_replay(transport, monkeypatch, tmp_path):
+    # transport: scheduler without rate limits, requests are answered by the fake requests.get
+    fake = fakes.Transport(archive)
+    monkeypatch.setattr(requests, 'get', fake.get)
+    monkeypatch.chdir(tmp_path)
+    batch = OECDProfile.record(job_file(tmp_path), str(tmp_path / 'cassette'))
+    assert batch.ok
+    # Output, caches and database of the job are not touched
+    assert not (tmp_path / 'prod').exists()
+    assert not (tmp_path / '.oecd_cache').exists()
+    assert any('serieskeysonly' in url for url, headers in fake.calls)
+
+    summary = OECDProfile.replay(job_file(tmp_path), str(tmp_path / 'cassette'), str(tmp_path / 'run'),
+                                 memory=False, lines=[])
+    assert summary['failed'] == {}
+    assert 'fetch_MEI_401' in summary['stages']
+    assert not (tmp_path / '.oecd_cache').exists()
+
+
+def test_replay_without_recording(tmp_path):
+    summary = OECDProfile.replay(job_file(tmp_path), str(tmp_path / 'cassette'), str(tmp_path / 'run'),
+                                 memory=False, lines=[])
+    # Index is left out and the fetch fails, instead of all stages being skipped after the index
+    assert 'index_MEI' not in summary['failed']
+    assert 'No recorded response' in summary['failed']['fetch_MEI_401']
@@ -0,0 +1,44 @@
+import numpy as np
+import pandas as pd
+import pytest
+import OECDRates
+
+
+def monthly():
+    index = ['Transform'] + ['2000-%02d' % m for m in range(1, 8)]
+    return pd.DataFrame({'AUS_CCUS': [5, 1, 2, 3, 4, np.nan, 6, 7], 'EA19_CCUS': [5, 2, 2, 2, 4, 4, 4, 4]},
+                        index=index)
+
+
+def test_resample_end_of_period_and_average():
+    df = OECDRates.read_rates(monthly())
+    last = OECDRates.resample(df, 'Q', 'last')
+    # Third quarter has only one month and is dropped
+    assert list(last.index) == ['2000-Q1', '2000-Q2']
+    assert last['AUS_CCUS'].tolist() == [3.0, 6.0]
+    mean = OECDRates.resample(df, 'Q', 'mean', complete=False)
+    assert mean['AUS_CCUS'].tolist() == [2.0, 5.0, 7.0]
+    assert OECDRates.resample(df, 'Q', 'first')['AUS_CCUS'].tolist() == [1.0, 4.0]
+    with pytest.raises(ValueError):
+        OECDRates.resample(df, 'Q', 'median')
+
+
+def test_cross_rates():
+    df = OECDRates.read_rates(monthly())
+    out = OECDRates.cross_rates(df, 'EA19')
+    assert list(out.columns) == ['AUS_CCEA19', 'USA_CCEA19']
+    assert out['AUS_CCEA19'].iloc[0] == 0.5
+    assert out['USA_CCEA19'].iloc[0] == 0.5
+    with pytest.raises(ValueError):
+        OECDRates.cross_rates(df, 'GBR')
+
+
+def test_get_rate_panel_cache(tmp_path):
+    file = str(tmp_path / 'OECD_FX.csv')
+    monthly().to_csv(file)
+    cache_dir = str(tmp_path / 'cache')
+    panel = OECDRates.get_rate_panel(file, 'Q', cache_dir=cache_dir)
+    assert len(list((tmp_path / 'cache').iterdir())) == 1
+    assert OECDRates.get_rate_panel(file, 'Q', cache_dir=cache_dir).equals(panel)
+    monthly_panel = OECDRates.get_rate_panel(file, 'M', cache_dir=None)
+    assert monthly_panel.index[0] == '2000-01'
@@ -0,0 +1,36 @@
+import numpy as np
+import pandas as pd
+import OECDReport
+
+
+def editions(n):
+    # Edition e publishes periods up to month e, as the MEI Archive does every month
+    periods = ['2000-%02d' % m for m in range(1, n + 1)]
+    return {200001 + e: pd.DataFrame({'AUS_401': np.arange(e + 1.0), 'CAN_401': np.arange(e + 1.0)},
+                                     index=pd.Index(periods[:e + 1], name=0)) for e in range(n)}
+
+
+def test_valid_range():
+    values = np.full((1, 4, 2), np.nan)
+    values[0, 1:3, 0] = 1.0
+    first, last = OECDReport.valid_range(values)
+    assert first.tolist() == [[1, -1]]
+    assert last.tolist() == [[2, -1]]
+
+
+def test_only_new_pages_are_rendered(tmp_path, monkeypatch):
+    rendered = []
+    render_table = OECDReport.render_table
+    monkeypatch.setattr(OECDReport, 'render_table', lambda f, *args: rendered.append(args[-2]) or render_table(f, *args))
+    args = ([401], ['CPI'], [7])
+    page_dir = str(tmp_path / 'pages')
+
+    OECDReport.write_vintage_documentation([editions(3)], *args, str(tmp_path / 'a.tex'), 'date', page_dir=page_dir)
+    assert len(rendered) == 3
+    # Next month: one new edition with a new period, earlier pages are unchanged
+    rendered.clear()
+    OECDReport.write_vintage_documentation([editions(4)], *args, str(tmp_path / 'b.tex'), 'date', page_dir=page_dir)
+    assert rendered == ['Edition: 200004']
+    text = (tmp_path / 'b.tex').read_text()
+    assert text.count('\\begin{table}') == 4
+    assert 'to 2000-04' in text
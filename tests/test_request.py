@@ -0,0 +1,90 @@
+import warnings
+import pytest
+import OECDCodes
+import OECDData
+from OECDCodes import RequestError, PartialDownloadWarning
+import fakes
+
+URL = OECDCodes.url_data + 'MEI_ARCHIVE/AUS.401.202001.M/all'
+CONTENT = bytes(range(100))
+
+
+def test_resume_after_connection_lost(transport, tmp_path):
+    responses = []
+
+    def handler(url, headers):
+        if len(responses) == 0:
+            responses.append(fakes.Response(CONTENT, headers={'Accept-Ranges': 'bytes'}, fail_after=40))
+        else:
+            start = int(headers['Range'][len('bytes='):-1])
+            responses.append(fakes.Response(CONTENT[start:], status_code=206,
+                                            headers={'Content-Range': 'bytes %d-99/100' % start}))
+        return responses[-1]
+
+    fake = transport(handler)
+    file = tmp_path / 'response.json'
+    OECDCodes.request(URL, 'test', file=str(file), chunk_size=16)
+    assert file.read_bytes() == CONTENT
+    # Rest is requested uncompressed from the last byte written
+    assert fake.calls[1][1] == {'Accept-Encoding': 'identity', 'Range': 'bytes=40-'}
+    assert all(response.closed for response in responses)
+
+
+def test_range_that_does_not_continue_is_downloaded_again(transport, tmp_path):
+    responses = []
+
+    def handler(url, headers):
+        if len(responses) == 0:
+            responses.append(fakes.Response(CONTENT, headers={'Accept-Ranges': 'bytes'}, fail_after=40))
+        elif 'Range' in headers:
+            # Server ignores the requested start
+            responses.append(fakes.Response(CONTENT, status_code=206, headers={'Content-Range': 'bytes 0-99/100'}))
+        else:
+            responses.append(fakes.Response(CONTENT))
+        return responses[-1]
+
+    fake = transport(handler)
+    file = tmp_path / 'response.json'
+    OECDCodes.request(URL, 'test', file=str(file), chunk_size=16)
+    assert file.read_bytes() == CONTENT
+    assert [headers.get('Range') for url, headers in fake.calls] == [None, 'bytes=40-', None]
+    assert all(response.closed for response in responses)
+
+
+def test_failed_responses_are_closed(transport):
+    responses = []
+
+    def handler(url, headers):
+        responses.append(fakes.Response(b'', status_code=500 if len(responses) == 0 else 200))
+        return responses[-1]
+
+    transport(handler)
+    assert OECDCodes.request(URL, 'test', retries=1) is responses[1]
+    assert responses[0].closed
+
+
+def test_failed_edition_chunk_keeps_other_chunks(transport):
+    editions = ['202001', '202002', '202003']
+    dates = ['2019-10', '2019-11', '2019-12', '2020-01']
+
+    def handler(url, headers):
+        edition = url.split('/')[-2].split('.')[2]
+        if edition == '202002':
+            return fakes.Response(b'', status_code=400)
+        return fakes.Response(fakes.archive(['AUS'], [401], [edition], dates))
+
+    fake = transport(handler)
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter('always')
+        df_all = OECDData.get_series_all_releases_MEIArchive(['AUS'], 401, 'M', '2019-10', '2020-01', '2020-01',
+                                                             '2020-04', edition_chunk=1)
+    assert list(df_all) == [202001, 202003]
+    # Newest editions are requested first
+    assert [url.split('/')[-2].split('.')[2] for url, headers in fake.calls] == ['202003', '202002', '202001']
+    missing = [str(item.message) for item in caught if item.category is PartialDownloadWarning]
+    assert len(missing) == 1 and missing[0].startswith('Editions 202002 of variable no. 401')
+
+    transport(lambda url, headers: fakes.Response(b'', status_code=400))
+    with pytest.raises(RequestError):
+        OECDData.get_series_all_releases_MEIArchive(['AUS'], 401, 'M', '2019-10', '2020-01', '2020-01', '2020-04',
+                                                    edition_chunk=1)
@@ -0,0 +1,87 @@
+import threading
+import time
+from email.utils import formatdate
+import OECDScheduler
+
+URL = 'https://stats.oecd.org/sdmx-json/data/MEI_FIN'
+
+
+def test_parse_retry_after():
+    assert OECDScheduler.parse_retry_after('5') == 5.0
+    assert OECDScheduler.parse_retry_after('-3') == 0.0
+    assert 55 < OECDScheduler.parse_retry_after(formatdate(time.time() + 60, usegmt=True)) <= 60
+    assert OECDScheduler.parse_retry_after(formatdate(time.time() - 60, usegmt=True)) == 0.0
+    assert OECDScheduler.parse_retry_after('soon') is None
+    assert OECDScheduler.parse_retry_after(None) is None
+
+
+def test_slot_lower_priority_number_goes_first():
+    scheduler = OECDScheduler.Scheduler(rate=1000, burst=1000, max_per_host=1)
+    order = []
+
+    def send(priority):
+        with scheduler.slot(URL, priority):
+            order.append(priority)
+
+    with scheduler.slot(URL):
+        threads = [threading.Thread(target=send, args=(p,)) for p in [2, 0, 1]]
+        for thread in threads:
+            thread.start()
+        # Wait until all requests are queued behind the running one
+        while len(scheduler._host('stats.oecd.org').queue) < 3:
+            time.sleep(0.001)
+    for thread in threads:
+        thread.join()
+    assert order == [0, 1, 2]
+
+
+def test_slot_limits_concurrent_requests():
+    scheduler = OECDScheduler.Scheduler(rate=1000, burst=1000, max_per_host=2)
+    lock = threading.Lock()
+    running = [0, 0]
+
+    def send():
+        with scheduler.slot(URL):
+            with lock:
+                running[0] += 1
+                running[1] = max(running)
+            time.sleep(0.02)
+            with lock:
+                running[0] -= 1
+
+    threads = [threading.Thread(target=send) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert running == [0, 2]
+
+
+def test_feedback_halves_rate_and_pauses():
+    scheduler = OECDScheduler.Scheduler(rate=2.0, min_rate=0.5)
+    assert scheduler.feedback(URL, 429, '30') == 30.0
+    state = scheduler._host('stats.oecd.org')
+    assert state.rate == 1.0
+    assert state.paused_until > time.monotonic() + 29
+    scheduler.feedback(URL, 503)
+    scheduler.feedback(URL, 503)
+    assert state.rate == 0.5
+    # Rate grows back after successful responses, up to rate
+    assert scheduler.feedback(URL, 200) is None
+    assert state.rate == 0.7
+    for _ in range(20):
+        scheduler.feedback(URL, 200)
+    assert state.rate == 2.0
+
+
+def test_priority_of_thread():
+    assert OECDScheduler.current_priority() == 0
+    with OECDScheduler.priority(-1):
+        assert OECDScheduler.current_priority() == -1
+    assert OECDScheduler.current_priority() == 0
+
+
+def test_configure_keeps_settings(monkeypatch):
+    monkeypatch.setattr(OECDScheduler, 'scheduler', OECDScheduler.Scheduler(rate=2.0, min_rate=0.5))
+    scheduler = OECDScheduler.configure(max_per_host=1)
+    assert (scheduler.max_rate, scheduler.max_per_host, scheduler.min_rate) == (2.0, 1, 0.5)
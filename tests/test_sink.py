@@ -0,0 +1,63 @@
+import sqlite3
+import numpy as np
+import pandas as pd
+import OECDSink
+
+PERIODS = ['2000-01', '2000-02']
+
+
+def vintage(value):
+    df = pd.DataFrame({'AUS_401': [value, np.nan], 'CAN_401': [value, value + 1]}, index=PERIODS)
+    return pd.concat([pd.DataFrame([[5, 5]], columns=df.columns, index=['Transform']), df])
+
+
+def rows(file, dataset):
+    with sqlite3.connect(file) as conn:
+        return conn.execute('SELECT edition, country, variable, period, value FROM oecd_observations WHERE '
+                            'dataset = ? ORDER BY edition, country, period', (dataset,)).fetchall()
+
+
+def test_long_table():
+    df = OECDSink.long_table({'200001': vintage(1.0), '200002': None}, 'MEI')
+    # Transform row and missing observations are left out
+    assert len(df) == 3
+    assert df.iloc[0].tolist() == ['MEI', 200001, 'AUS', '401', '2000-01', 1.0]
+    assert df['variable'].unique().tolist() == ['401']
+
+    FX = pd.DataFrame({'AUS': [1.5, 1.6]}, index=PERIODS)
+    df = OECDSink.long_table(FX, 'FX')
+    assert df['edition'].tolist() == [0, 0]
+    assert df[['country', 'variable']].values.tolist() == [['AUS', ''], ['AUS', '']]
+
+
+def test_write_sql_new_editions_only(tmp_path):
+    url = 'sqlite:///' + str(tmp_path / 'OECD.db')
+    FX = pd.DataFrame({'AUS': [1.5, 1.6]}, index=PERIODS)
+    assert OECDSink.write_sql(url, {'200001': vintage(1.0)}, {'FX': FX}) == 5
+    assert rows(str(tmp_path / 'OECD.db'), 'FX') == [(0, 'AUS', '', '2000-01', 1.5), (0, 'AUS', '', '2000-02', 1.6)]
+
+    # Edition 200001 is in the database already, FX rows are upserted
+    FX.iloc[1, 0] = 1.7
+    assert OECDSink.write_sql(url, {'200001': vintage(9.0), '200002': vintage(2.0)}, {'FX': FX}) == 5
+    MEI = rows(str(tmp_path / 'OECD.db'), 'MEI')
+    assert [row[0] for row in MEI] == [200001] * 3 + [200002] * 3
+    assert MEI[0][-1] == 1.0
+    assert rows(str(tmp_path / 'OECD.db'), 'FX')[1][-1] == 1.7
+
+
+def test_write_sql_loads_one_edition_at_a_time(tmp_path, monkeypatch):
+    loads = []
+    load = OECDSink.SINKS['sqlite'][1]
+    monkeypatch.setitem(OECDSink.SINKS, 'sqlite', (OECDSink.SINKS['sqlite'][0],
+                                                   lambda conn, table, df, size: loads.append(len(df)) or
+                                                   load(conn, table, df, size)))
+    MEI_new = {'200001': vintage(1.0), '200002': vintage(2.0)}
+    assert OECDSink.write_sql(str(tmp_path / 'OECD.db'), MEI_new, batch_size=2) == 6
+    assert loads == [3, 3]
+
+
+def test_scheme():
+    assert OECDSink._scheme('postgresql://user@host/db') == 'postgresql'
+    assert OECDSink._scheme('sqlite:///Data/OECD.db') == 'sqlite'
+    # Windows path
+    assert OECDSink._scheme('C:\\Data\\OECD.db') == 'sqlite'
@@ -0,0 +1,67 @@
+import numpy as np
+import pandas as pd
+import pytest
+import OECDVintage
+
+
+def monthly():
+    index = pd.Index(['2000-01', '2000-02', '2000-03', '2000-04'], name=0)
+    return [{200003: pd.DataFrame({'AUS_401': [1.0, 2.0, np.nan, np.nan]}, index=index),
+             200005: pd.DataFrame({'AUS_401': [1.0, 2.0, 3.0, 4.0]}, index=index)}]
+
+
+def quarterly():
+    return [{200004: pd.DataFrame({'AUS_101': [10.0]}, index=pd.Index(['2000-Q1'], name=0))}]
+
+
+def test_mixed_frequency_panel():
+    values, editions, periods, series = OECDVintage.mixed_frequency_panel(monthly(), quarterly())
+    assert editions == [200003, 200005]
+    assert periods == ['2000-01', '2000-02', '2000-03', '2000-04']
+    assert series == ['AUS_401', 'AUS_101']
+    # Quarterly edition 200004 is published after monthly edition 200003
+    assert np.isnan(values[0, :, 1]).all()
+    assert values[1, 2, 1] == 10.0
+
+
+def test_quarterly_only_panel():
+    values, editions, periods, series = OECDVintage.mixed_frequency_panel([], quarterly())
+    assert editions == [200004]
+    assert periods == ['2000-03']
+    assert values[0, 0, 0] == 10.0
+    panel = OECDVintage.panel_to_dict(values, editions, periods, series, transform=5)
+    assert panel[200004].loc['2000-03', 'AUS_101'] == 10.0
+
+
+def test_empty_panel():
+    with pytest.raises(ValueError):
+        OECDVintage.mixed_frequency_panel([], [])
+
+
+def test_panel_to_dict_drops_empty_periods():
+    values, editions, periods, series = OECDVintage.mixed_frequency_panel(monthly(), [])
+    panel = OECDVintage.panel_to_dict(values, editions, periods, series, transform=5)
+    assert list(panel[200003].index) == ['Transform', '2000-01', '2000-02']
+
+
+def test_origin_editions():
+    position = OECDVintage.origin_editions([200003, 200005], ['2000-02', '200003', '2000-04', '2000-07'])
+    assert position.tolist() == [-1, 0, 0, 1]
+
+
+def test_real_time_panels():
+    values, editions, periods, series = OECDVintage.mixed_frequency_panel(monthly(), [])
+    panels = OECDVintage.real_time_panels(values, editions, periods, series, ['2000-02', '2000-03', '2000-04',
+                                                                             '2000-05'])
+    assert panels['2000-02'] is None
+    # Panel ends at the last observation of its edition
+    assert list(panels['2000-03'].index) == ['2000-01', '2000-02']
+    assert list(panels['2000-05'].index) == periods
+    # Origins with the same edition share one read only view of values
+    assert panels['2000-04'] is panels['2000-03']
+    assert np.shares_memory(panels['2000-05'].to_numpy(), values)
+    with pytest.raises(ValueError):
+        panels['2000-05'].to_numpy()[0, 0] = 0.0
+
+    untrimmed = OECDVintage.real_time_panels(values, editions, periods, series, ['2000-03'], trim=False)
+    assert len(untrimmed['2000-03']) == len(periods)